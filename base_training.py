@@ -29,7 +29,7 @@ from tensorflow_addons.optimizers import AdamW
 
 from models.discriminator import DiscriminatorNetwork
 from models.srfr import SRFR
-from repositories.casia import CasiaWebface
+from repositories.casia import create_casia_webface
 from services.losses import Loss
 from use_cases.train.train_model_joint_learn import TrainModelJointLearnUseCase
 from utils.input_data import parseConfigsFile
@@ -211,20 +211,12 @@ class BaseTraining:
     def _get_datasets(self, batch_size):
         self.logger.info(" -------- Importing Datasets --------")
 
-        casia_dataset = CasiaWebface(self._CACHE_PATH)
-        synthetic_train = casia_dataset.get_full_dataset()
-        synthetic_train = casia_dataset.augment_dataset(synthetic_train)
-        synthetic_train = casia_dataset.normalize_dataset(synthetic_train)
-
-        synthetic_train = synthetic_train.cache(str(self._CACHE_PATH.joinpath("train")))
-        synthetic_dataset_len = casia_dataset.get_train_dataset_len()
-        synthetic_train = (
-            synthetic_train.shuffle(buffer_size=2_048)
-            .batch(batch_size, drop_remainder=True)
-            .prefetch(1)
+        casia_dataset = create_casia_webface(self._CACHE_PATH)
+        synthetic_train = self._distribute_dataset(
+            partial(self._get_train_dataset, casia_dataset, batch_size)
         )
-        synthetic_train = self.strategy.experimental_distribute_dataset(synthetic_train)
 
+        synthetic_dataset_len = casia_dataset.get_train_dataset_len()
         num_classes = casia_dataset.get_number_of_classes()
 
         return (
@@ -233,6 +225,48 @@ class BaseTraining:
             num_classes,
         )
 
+    def _distribute_dataset(self, dataset_fn):
+        """Distributes the dataset built by `dataset_fn(input_context=None)`.
+
+        In "per_worker" mode each worker builds its own pipeline over its share\
+ of the shards, batched with the per replica batch size. In "global" mode a\
+ single pipeline is built and split across the replicas.
+        """
+        if parseConfigsFile(["input_pipeline"])["distribution"] == "per_worker":
+            return self.strategy.experimental_distribute_datasets_from_function(
+                dataset_fn
+            )
+        return self.strategy.experimental_distribute_dataset(dataset_fn())
+
+    @staticmethod
+    def _get_train_dataset(casia_dataset, batch_size, input_context=None):
+        cache_name = "train"
+        if input_context is not None:
+            batch_size = input_context.get_per_replica_batch_size(batch_size)
+            cache_name = f"train_{input_context.input_pipeline_id}"
+
+        if casia_dataset.use_identity_sampler():
+            # The sampler yields whole P x K batches, which a shuffle or a
+            # cache would break up or freeze.
+            synthetic_train = casia_dataset.get_identity_sampled_dataset(
+                batch_size, input_context
+            )
+        else:
+            synthetic_train = casia_dataset.get_full_dataset(input_context)
+            synthetic_train = casia_dataset.cache_dataset(
+                synthetic_train,
+                cache_name,
+                casia_dataset.get_dataset_files("full"),
+                input_context,
+            )
+        synthetic_train = casia_dataset.augment_dataset(synthetic_train)
+        synthetic_train = casia_dataset.normalize_dataset(synthetic_train)
+
+        if not casia_dataset.use_identity_sampler():
+            synthetic_train = synthetic_train.shuffle(buffer_size=2_048)
+        synthetic_train = synthetic_train.batch(batch_size, drop_remainder=True)
+        return synthetic_train.prefetch(1)
+
     @staticmethod
     def _instantiate_learning_rate(
         learning_rate: float, learning_rate_decay_steps: int
@@ -0,0 +1,62 @@
+"""Compares the augmentation modes of the repositories: concatenating a flipped\
+ copy of the dataset against randomly flipping samples in the same pass.
+
+For each mode it reports the epoch time, the samples per epoch and the number\
+ of records read and decoded from the TFRecords.
+"""
+import sys, os  # isort:skip
+
+sys.path.append(os.path.abspath("."))  # isort:skip
+
+import logging
+from functools import partial
+
+import tensorflow as tf
+
+from benchmarks.utils import measure_throughput
+from repositories.casia import CasiaWebface
+from utils.config import thaw
+
+logging.basicConfig(filename="augmentation_benchmark.txt", level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+AUTOTUNE = tf.data.experimental.AUTOTUNE
+
+NUM_SHARDS = 4
+BATCH_SIZE = 32
+MODES = ("concatenate", "random", "random_batch")
+
+
+def _count_record(counter, *args):
+    counter.assign_add(1)
+    return args
+
+
+def main():
+    casia = CasiaWebface(None, remove_overlaps=False)
+    shards = casia._list_shards(casia.DATASET_PATH)[:NUM_SHARDS]
+
+    for mode in MODES:
+        # The settings are frozen, so the benchmark swaps in a modified copy.
+        settings = thaw(casia._input_pipeline_settings)
+        settings["augmentation"]["mode"] = mode
+        casia._input_pipeline_settings = settings
+        records_read = tf.Variable(0, dtype=tf.int64)
+
+        dataset = casia._load_shards(shards).map(
+            partial(_count_record, records_read), num_parallel_calls=AUTOTUNE
+        )
+        dataset = casia.augment_dataset(dataset)
+        dataset = casia.normalize_dataset(dataset).batch(BATCH_SIZE)
+
+        result = measure_throughput(dataset, batch_size=BATCH_SIZE, warmup_batches=0)
+        message = (
+            f"{mode}: {result['seconds']:.1f} s/epoch,"
+            f" {result['images']} samples/epoch,"
+            f" {int(records_read.numpy())} records read"
+        )
+        LOGGER.info(f" {message}.")
+        print(message)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Compares the per-record and the batched decoding paths of the CASIA-Webface\
+ repository, in images per second.
+"""
+import sys, os  # isort:skip
+
+sys.path.append(os.path.abspath("."))  # isort:skip
+
+import logging
+
+import tensorflow as tf
+
+from benchmarks.utils import measure_throughput
+from repositories.casia import CasiaWebface
+
+logging.basicConfig(filename="decoding_benchmark.txt", level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+AUTOTUNE = tf.data.experimental.AUTOTUNE
+
+NUM_RECORDS = 50_000
+DECODE_BATCH_SIZES = (32, 128, 256, 1024)
+
+
+def _load_records():
+    # The dataset directory also holds the dataset index and the manifest.
+    paths = [
+        str(path) for path in CasiaWebface._list_shards(CasiaWebface.DATASET_PATH)
+    ]
+    return tf.data.TFRecordDataset(paths).take(NUM_RECORDS)
+
+
+def main():
+    casia = CasiaWebface(None, remove_overlaps=False)
+
+    dataset = _load_records().map(
+        casia._decoding_function, num_parallel_calls=AUTOTUNE
+    )
+    results = {"per_record": measure_throughput(dataset)}
+
+    for decode_batch_size in DECODE_BATCH_SIZES:
+        dataset = (
+            _load_records()
+            .batch(decode_batch_size, drop_remainder=True)
+            .map(casia._batch_decoding_function, num_parallel_calls=AUTOTUNE)
+        )
+        results[f"batched_{decode_batch_size}"] = measure_throughput(
+            dataset, batch_size=decode_batch_size, warmup_batches=1
+        )
+
+    for mode, result in results.items():
+        LOGGER.info(f" {mode}: {result['images_per_second']:.1f} images/sec.")
+        print(f"{mode}: {result['images_per_second']:.1f} images/sec")
+
+
+if __name__ == "__main__":
+    main()
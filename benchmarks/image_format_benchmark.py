@@ -0,0 +1,73 @@
+"""Compares the image formats supported by the converters and repositories:\
+ size on disk against decode throughput and CPU time, for PNG, JPEG and raw\
+ uint8 tensors.
+
+The images are taken from the CASIA-Webface shards, so the numbers reflect\
+ aligned faces in both resolutions.
+"""
+import sys, os  # isort:skip
+
+sys.path.append(os.path.abspath("."))  # isort:skip
+
+import logging
+import time
+from functools import partial
+
+import tensorflow as tf
+
+from benchmarks.utils import measure_throughput
+from repositories.casia import CasiaWebface
+
+logging.basicConfig(filename="image_format_benchmark.txt", level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+AUTOTUNE = tf.data.experimental.AUTOTUNE
+
+NUM_IMAGES = 10_000
+ENCODERS = {
+    "png": lambda image: tf.image.encode_png(image).numpy(),
+    "jpeg": lambda image: tf.image.encode_jpeg(image, quality=95).numpy(),
+    # The converters write the bare bytes of the uint8 tensor.
+    "raw": lambda image: image.numpy().tobytes(),
+}
+DECODERS = {
+    "png": tf.io.decode_png,
+    "jpeg": partial(tf.io.decode_jpeg, channels=3),
+    "raw": partial(tf.io.decode_raw, out_type=tf.uint8),
+}
+
+
+def _load_images(casia):
+    images = {"low_resolution": [], "high_resolution": []}
+    for image_lr, image_hr, _ in casia.get_full_dataset().take(NUM_IMAGES):
+        images["low_resolution"].append(image_lr)
+        images["high_resolution"].append(image_hr)
+    return images
+
+
+def main():
+    casia = CasiaWebface(None, remove_overlaps=False)
+    images = _load_images(casia)
+
+    for resolution, resolution_images in images.items():
+        for image_format, encoder in ENCODERS.items():
+            encoded_images = [encoder(image) for image in resolution_images]
+            bytes_per_image = sum(map(len, encoded_images)) / len(encoded_images)
+
+            dataset = tf.data.Dataset.from_tensor_slices(encoded_images).map(
+                DECODERS[image_format], num_parallel_calls=AUTOTUNE
+            )
+            cpu_start = time.process_time()
+            result = measure_throughput(dataset, warmup_batches=0)
+            cpu_seconds = time.process_time() - cpu_start
+
+            message = (
+                f"{resolution} {image_format}: {bytes_per_image:.0f} bytes/image,"
+                f" {result['images_per_second']:.1f} images/sec,"
+                f" {1e6 * cpu_seconds / result['images']:.1f} CPU us/image"
+            )
+            LOGGER.info(f" {message}.")
+            print(message)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Compares normalizing the CASIA-Webface images on the host, in tf.data,\
+ against shipping uint8 batches and normalizing them on the device.
+
+For each mode it reports the images per second delivered to the device, with\
+ the normalization included, and the bytes of each batch.
+"""
+import sys, os  # isort:skip
+
+sys.path.append(os.path.abspath("."))  # isort:skip
+
+import logging
+
+import tensorflow as tf
+
+from benchmarks.utils import measure_throughput
+from repositories.casia import CasiaWebface
+from utils.common import normalize_uint8_tensor
+from utils.config import thaw
+
+logging.basicConfig(filename="normalization_benchmark.txt", level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+AUTOTUNE = tf.data.experimental.AUTOTUNE
+
+NUM_BATCHES = 200
+BATCH_SIZE = 64
+MODES = ("host", "device")
+DEVICE = "/gpu:0" if tf.config.list_physical_devices("GPU") else "/cpu:0"
+
+
+@tf.function
+def _consume(image_lr, image_hr, class_id):
+    with tf.device(DEVICE):
+        image_lr = normalize_uint8_tensor(image_lr)
+        image_hr = normalize_uint8_tensor(image_hr)
+        return tf.reduce_sum(image_lr) + tf.reduce_sum(image_hr)
+
+
+def _get_batch_bytes(dataset) -> int:
+    image_lr, image_hr, class_id = next(iter(dataset))
+    return sum(
+        tensor.shape.num_elements() * tensor.dtype.size
+        for tensor in (image_lr, image_hr, class_id)
+    )
+
+
+def main():
+    casia = CasiaWebface(None, remove_overlaps=False)
+
+    for mode in MODES:
+        # The settings are frozen, so the benchmark swaps in a modified copy.
+        settings = thaw(casia._input_pipeline_settings)
+        settings["normalization"] = mode
+        casia._input_pipeline_settings = settings
+
+        dataset = casia.normalize_dataset(casia.get_train_dataset())
+        dataset = dataset.batch(BATCH_SIZE, drop_remainder=True).apply(
+            tf.data.experimental.prefetch_to_device(DEVICE)
+        )
+
+        result = measure_throughput(
+            dataset, NUM_BATCHES, batch_size=BATCH_SIZE, consume=_consume
+        )
+        message = (
+            f"{mode}: {result['images_per_second']:.1f} images/sec,"
+            f" {_get_batch_bytes(dataset) / 2 ** 20:.2f} MiB/batch"
+        )
+        LOGGER.info(f" {message}.")
+        print(message)
+
+
+if __name__ == "__main__":
+    main()
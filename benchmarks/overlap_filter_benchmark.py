@@ -0,0 +1,64 @@
+"""Compares the linear `reduce_any` overlap filter against the hash set filter\
+ used by the repositories, with the real overlapping identities lists.
+"""
+import sys, os  # isort:skip
+
+sys.path.append(os.path.abspath("."))  # isort:skip
+
+import logging
+from pathlib import Path
+
+import tensorflow as tf
+
+from benchmarks.utils import measure_throughput
+from repositories.repository import BaseRepository
+
+logging.basicConfig(filename="overlap_filter_benchmark.txt", level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+
+NUM_RECORDS = 1_000_000
+DATASETS = ("CASIA", "VGGFace2_LR")
+
+
+def _load_class_ids(dataset_name: str):
+    path = Path.cwd().joinpath("data", "class_pairs", dataset_name, "concatenated.txt")
+    with path.open("r") as _file:
+        return [line.split(",")[0] for line in _file.read().splitlines()]
+
+
+def _create_dataset(class_ids, overlaps):
+    # Includes the overlapping identities, so that both branches of the filter
+    # are exercised.
+    class_ids = tf.constant(list(class_ids) + list(overlaps), dtype=tf.string)
+    return tf.data.Dataset.from_tensor_slices(class_ids).repeat().take(NUM_RECORDS)
+
+
+def main():
+    repository = BaseRepository()
+
+    for dataset_name in DATASETS:
+        overlaps = repository._get_overlapping_identities(dataset_name)
+        class_ids = _load_class_ids(dataset_name)
+        overlaps_table = BaseRepository._get_overlaps_table(overlaps)
+
+        linear_scan = _create_dataset(class_ids, overlaps).filter(
+            lambda class_id: tf.math.logical_not(
+                tf.math.reduce_any(tf.math.equal(class_id, overlaps))
+            )
+        )
+        hash_set = _create_dataset(class_ids, overlaps).filter(
+            lambda class_id: tf.math.equal(overlaps_table.lookup(class_id), 0)
+        )
+
+        for mode, dataset in (("reduce_any", linear_scan), ("hash_set", hash_set)):
+            result = measure_throughput(dataset.batch(1_024), batch_size=1_024)
+            message = (
+                f"{dataset_name} ({len(overlaps)} overlaps) - {mode}:"
+                f" {result['images_per_second']:.1f} records/sec"
+            )
+            LOGGER.info(f" {message}.")
+            print(message)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Measures how fast each repository's input pipeline can feed the model, stage\
+ by stage: read, parse, decode, filter, class lookup, augment, normalize and\
+ batch.
+
+Each stage is timed as the pipeline prefix that ends with it, for every set of\
+ tf.data options in OPTION_SETS, and the time of a stage is the difference with\
+ the prefix it extends. The results are written as JSON to output/benchmarks,\
+ with the commit and the machine, so that runs can be compared.
+
+Usage: python benchmarks/pipeline_benchmark.py [--repositories casia lfw]
+"""
+import sys, os  # isort:skip
+
+sys.path.append(os.path.abspath("."))  # isort:skip
+
+import argparse
+import json
+import logging
+import platform
+import subprocess
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+import tensorflow as tf
+
+from benchmarks.utils import measure_in_graph_throughput
+from repositories.casia import CasiaWebface
+from repositories.lfw import LFW
+from repositories.vggface2 import VggFace2
+
+logging.basicConfig(filename="pipeline_benchmark.txt", level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+AUTOTUNE = tf.data.experimental.AUTOTUNE
+
+OUTPUT_PATH = Path.cwd().joinpath("output", "benchmarks")
+
+# Each entry sets attributes of tf.data.Options, by dotted name.
+OPTION_SETS = {
+    "default": {},
+    "no_autotune": {"experimental_optimization.autotune": False},
+    "map_parallelization": {"experimental_optimization.map_parallelization": True},
+    "private_threadpool_8": {"experimental_threading.private_threadpool_size": 8},
+    "non_deterministic": {"experimental_deterministic": False},
+}
+
+# A stage transforms the dataset of its base stage, or builds the source dataset
+# when base is None. images is the number of images in each element.
+Stage = namedtuple("Stage", ["name", "base", "transform", "images"])
+
+
+def _decode_stages(repository, serialized_features, batch_decoding_function):
+    decode_batch_size = (
+        repository._input_pipeline_settings["decode_batch_size"] or 256
+    )
+
+    def _parse(dataset):
+        return (
+            dataset.batch(decode_batch_size)
+            .map(
+                lambda records: tf.io.parse_example(records, serialized_features),
+                num_parallel_calls=AUTOTUNE,
+            )
+            .unbatch()
+        )
+
+    def _decode(dataset):
+        return (
+            dataset.batch(decode_batch_size)
+            .map(batch_decoding_function, num_parallel_calls=AUTOTUNE)
+            .unbatch()
+        )
+
+    def _filter(dataset):
+        if not repository._overlaps or repository._stored_labels:
+            return dataset
+        return dataset.filter(repository._filter_overlaps)
+
+    return [
+        Stage("parse", "read", _parse, 1),
+        Stage("decode", "read", _decode, 1),
+        Stage("filter", "decode", _filter, 1),
+    ]
+
+
+def _batch_stage(batch_size, images_per_element=1):
+    return Stage(
+        "batch",
+        "normalize",
+        lambda dataset: dataset.batch(batch_size, drop_remainder=True),
+        batch_size * images_per_element,
+    )
+
+
+def _casia_stages(batch_size):
+    casia = CasiaWebface(None)
+    casia._build_lookup_tables()
+    return [
+        Stage("read", None, lambda _: casia._read_shards(casia._train_shards), 1),
+        *_decode_stages(
+            casia, casia._serialized_features, casia._batch_decoding_function
+        ),
+        Stage("class_lookup", "filter", casia._convert_tfrecords, 1),
+        Stage("augment", "class_lookup", casia.augment_dataset, 1),
+        Stage("normalize", "augment", casia.normalize_dataset, 1),
+        _batch_stage(batch_size),
+    ]
+
+
+def _vggface2_stages(batch_size):
+    vggface2 = VggFace2()
+    vggface2._build_lookup_tables()
+    return [
+        Stage(
+            "read",
+            None,
+            lambda _: tf.data.TFRecordDataset(vggface2._dataset_paths["train"]),
+            1,
+        ),
+        *_decode_stages(
+            vggface2,
+            vggface2._serialized_features,
+            vggface2._batch_decoding_function,
+        ),
+        Stage("class_lookup", "filter", vggface2._convert_tfrecords, 1),
+        Stage("augment", "class_lookup", vggface2.augment_dataset, 1),
+        Stage("normalize", "augment", vggface2.normalize_dataset, 1),
+        _batch_stage(batch_size),
+    ]
+
+
+def _lfw_stages(batch_size):
+    lfw = LFW()
+    images_path = str(lfw.DATASET_PATH.joinpath("images", "left", "*"))
+    return [
+        Stage(
+            "read",
+            None,
+            lambda _: tf.data.Dataset.list_files(images_path, shuffle=False).map(
+                tf.io.read_file, num_parallel_calls=AUTOTUNE
+            ),
+            1,
+        ),
+        Stage(
+            "decode",
+            "read",
+            lambda dataset: dataset.map(
+                lfw._decode_image, num_parallel_calls=AUTOTUNE
+            ),
+            1,
+        ),
+        # Each sample is zipped with its flipped copy.
+        Stage("augment", "decode", lfw.augment_dataset, 2),
+        Stage("normalize", "augment", lfw.normalize_dataset, 2),
+        _batch_stage(batch_size, 2),
+    ]
+
+
+REPOSITORIES = {
+    "casia": _casia_stages,
+    "vggface2": _vggface2_stages,
+    "lfw": _lfw_stages,
+}
+
+
+def _get_options(option_set):
+    options = tf.data.Options()
+    for name, value in option_set.items():
+        target = options
+        *parents, attribute = name.split(".")
+        for parent in parents:
+            target = getattr(target, parent)
+        setattr(target, attribute, value)
+    return options
+
+
+def _run_stages(stages, option_set, num_images):
+    datasets = {}
+    results = {}
+    for stage in stages:
+        base = datasets.get(stage.base)
+        datasets[stage.name] = stage.transform(base)
+
+        result = measure_in_graph_throughput(
+            datasets[stage.name].with_options(_get_options(option_set)),
+            max(1, num_images // stage.images),
+            images_per_element=stage.images,
+        )
+        us_per_image = 1e6 / result["images_per_second"]
+        base_us_per_image = results[stage.base]["us_per_image"] if stage.base else 0
+        results[stage.name] = {
+            "images_per_second": result["images_per_second"],
+            "us_per_image": us_per_image,
+            "stage_us_per_image": us_per_image - base_us_per_image,
+            "cpu_percent": result["cpu_percent"],
+        }
+        LOGGER.info(f" {stage.name}: {results[stage.name]}")
+    return results
+
+
+def _get_commit():
+    try:
+        return (
+            subprocess.check_output(["git", "rev-parse", "HEAD"])
+            .decode("utf-8")
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--repositories", nargs="+", choices=REPOSITORIES, default=list(REPOSITORIES)
+    )
+    parser.add_argument("--options", nargs="+", choices=OPTION_SETS)
+    parser.add_argument("--num-images", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    arguments = parser.parse_args()
+
+    report = {
+        "commit": _get_commit(),
+        "machine": {
+            "node": platform.node(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "gpus": len(tf.config.list_physical_devices("GPU")),
+            "tensorflow": tf.__version__,
+        },
+        "num_images": arguments.num_images,
+        "batch_size": arguments.batch_size,
+        "results": {},
+    }
+    for name in arguments.repositories:
+        report["results"][name] = {}
+        try:
+            stages = REPOSITORIES[name](arguments.batch_size)
+        except (OSError, tf.errors.OpError) as error:
+            LOGGER.warning(f" Skipping {name}: {error}")
+            report["results"][name] = {"error": str(error)}
+            continue
+
+        for options_name in arguments.options or list(OPTION_SETS):
+            LOGGER.info(f" Running {name} with {options_name} options.")
+            results = _run_stages(
+                stages, OPTION_SETS[options_name], arguments.num_images
+            )
+            report["results"][name][options_name] = results
+            print(
+                f"{name} {options_name}:"
+                f" {results['batch']['images_per_second']:.1f} images/sec, "
+                + ", ".join(
+                    f"{stage} {result['stage_us_per_image']:.1f} us"
+                    for stage, result in results.items()
+                )
+            )
+
+    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+    output_file = OUTPUT_PATH.joinpath(
+        f"pipeline_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    with output_file.open("w") as obj:
+        json.dump(report, obj, indent=2)
+    print(f"Results written to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Compares the flip test-time augmentation of the validation done with two\
+ forward passes, one on the images and one on their flipped copies, against a\
+ single forward pass on both stacked in one batch.
+
+For each available device and batch size it reports the latency of a batch of\
+ pairs, with the embeddings summed on the device.
+"""
+import sys, os  # isort:skip
+
+sys.path.append(os.path.abspath("."))  # isort:skip
+
+import logging
+import time
+
+import tensorflow as tf
+
+from models.srfr import SRFR
+from utils.input_data import parseConfigsFile
+
+logging.basicConfig(filename="tta_benchmark.txt", level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+
+NUM_BATCHES = 20
+WARMUP_BATCHES = 3
+BATCH_SIZES = (8, 32)
+MODES = ("separate", "single_pass")
+NUM_CLASSES = 2
+
+
+def _create_model(network_settings, image_shape):
+    return SRFR(
+        num_filters=network_settings["num_filters"],
+        depth=50,
+        categories=network_settings["embedding_size"],
+        num_gc=network_settings["gc"],
+        num_blocks=network_settings["num_blocks"],
+        residual_scailing=network_settings["residual_scailing"],
+        training=True,
+        input_shape=image_shape,
+        num_classes_syn=NUM_CLASSES,
+    )
+
+
+def _get_predict_function(model, mode: str):
+    @tf.function
+    def _predict(images, images_augmented):
+        if mode == "single_pass":
+            _, embeddings = model(
+                tf.concat([images, images_augmented], axis=0), training=False
+            )
+            embeddings, embeddings_augmented = tf.split(embeddings, 2, axis=0)
+        else:
+            _, embeddings = model(images, training=False)
+            _, embeddings_augmented = model(images_augmented, training=False)
+        return embeddings + embeddings_augmented
+
+    return _predict
+
+
+def _measure_latency(predict, images, images_augmented) -> float:
+    for _ in range(WARMUP_BATCHES):
+        predict(images, images_augmented).numpy()
+
+    start = time.perf_counter()
+    for _ in range(NUM_BATCHES):
+        # .numpy() waits for the device to finish the batch.
+        predict(images, images_augmented).numpy()
+    return (time.perf_counter() - start) / NUM_BATCHES
+
+
+def main():
+    network_settings, preprocess_settings = parseConfigsFile(
+        ["network", "preprocess"]
+    )
+    image_shape = preprocess_settings["image_shape_low_resolution"]
+    devices = ["/cpu:0"]
+    if tf.config.list_physical_devices("GPU"):
+        devices.append("/gpu:0")
+
+    for device in devices:
+        with tf.device(device):
+            model = _create_model(network_settings, image_shape)
+            for batch_size in BATCH_SIZES:
+                images = tf.random.uniform([batch_size, *image_shape], -1.0, 1.0)
+                images_augmented = tf.image.flip_left_right(images)
+                latencies = {
+                    mode: _measure_latency(
+                        _get_predict_function(model, mode), images, images_augmented
+                    )
+                    for mode in MODES
+                }
+                speedup = latencies["separate"] / latencies["single_pass"]
+                message = (
+                    f"{device} batch {batch_size}: "
+                    + ", ".join(
+                        f"{mode} {latency * 1000:.1f} ms"
+                        for mode, latency in latencies.items()
+                    )
+                    + f", speedup {speedup:.2f}x"
+                )
+                LOGGER.info(f" {message}.")
+                print(message)
+
+
+if __name__ == "__main__":
+    main()
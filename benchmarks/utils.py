@@ -0,0 +1,95 @@
+"""Helpers shared by the input pipeline benchmarks."""
+import time
+from typing import Callable, Dict
+
+import numpy as np
+
+
+def measure_throughput(
+    dataset,
+    num_batches: int = None,
+    batch_size: int = 1,
+    warmup_batches: int = 10,
+    consume: Callable = None,
+) -> Dict:
+    """Iterates over a dataset and measures how many images it yields per\
+ second.
+
+    ### Parameters
+        dataset: Dataset to be iterated.
+        num_batches: Number of elements to be timed. If None, the whole dataset\
+ is iterated.
+        batch_size: Number of images in each element of the dataset.
+        warmup_batches: Number of elements consumed before the timing starts,\
+ so that buffers are filled and functions are traced.
+        consume: Optional function called with each element, e.g. to time the\
+ work done on the device as well.
+
+    ### Returns
+        Dict with the number of timed images, the elapsed seconds and the\
+ images per second.
+    """
+    iterator = iter(dataset)
+    for _ in range(warmup_batches):
+        element = next(iterator, None)
+        if consume is not None and element is not None:
+            consume(*element)
+
+    batches = 0
+    start = time.perf_counter()
+    for element in iterator:
+        if consume is not None:
+            consume(*element)
+        batches += 1
+        if num_batches and batches >= num_batches:
+            break
+    elapsed = time.perf_counter() - start
+
+    images = batches * batch_size
+    return {
+        "images": images,
+        "seconds": elapsed,
+        "images_per_second": images / elapsed if elapsed else 0.0,
+    }
+
+
+def measure_in_graph_throughput(
+    dataset,
+    num_elements: int,
+    images_per_element: int = 1,
+    warmup_elements: int = 10,
+) -> Dict:
+    """Consumes a dataset inside the tf.data runtime, with `Dataset.reduce`, and\
+ measures its throughput and CPU use. Unlike `measure_throughput`, there is no\
+ Python overhead per element, so single images can be timed as well as batches.
+
+    ### Parameters
+        dataset: Dataset to be consumed.
+        num_elements: Number of elements to be timed.
+        images_per_element: Number of images in each element of the dataset.
+        warmup_elements: Number of elements consumed before the timing starts,\
+ in a separate pass, so that functions are traced and files are cached.
+
+    ### Returns
+        Dict with the number of timed images, the elapsed seconds, the images\
+ per second and the CPU use, in percent of one core.
+    """
+
+    def _count(dataset):
+        return int(dataset.reduce(np.int64(0), lambda count, _: count + 1))
+
+    if warmup_elements:
+        _count(dataset.take(warmup_elements))
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    images = _count(dataset.take(num_elements)) * images_per_element
+    elapsed = time.perf_counter() - start
+    cpu_seconds = time.process_time() - cpu_start
+
+    return {
+        "images": images,
+        "seconds": elapsed,
+        "images_per_second": images / elapsed if elapsed else 0.0,
+        "cpu_percent": 100 * cpu_seconds / elapsed if elapsed else 0.0,
+    }
@@ -8,6 +8,7 @@ from tensorflow.keras.layers import (
     LeakyReLU,
 )
 from tensorflow.keras.mixed_precision import experimental as mixed_precision
+from utils.common import normalize_uint8_tensor
 
 policy = mixed_precision.Policy('mixed_float16')
 mixed_precision.set_policy(policy)
@@ -101,6 +102,7 @@ class DiscriminatorNetwork(Model):
         )
 
     def call(self, input_tensor):
+        input_tensor = normalize_uint8_tensor(input_tensor)
         x = self._conv_1(input_tensor)
         x = self._conv_2(x)
         x = self._batch_normalization(x)
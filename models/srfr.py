@@ -4,6 +4,8 @@ from tensorflow.keras.layers import Conv2D, Dense
 from tensorflow.keras.mixed_precision import experimental as mixed_precision
 from tensorflow_addons.activations import mish
 
+from utils.common import normalize_uint8_tensor
+
 from models.generator import GeneratorNetwork
 from models.resnet import ResNet
 
@@ -145,6 +147,9 @@ class SRFR(Model):
         training: bool = True,
         input_type: str = "syn",
     ):
+        input_tensor_01 = normalize_uint8_tensor(input_tensor_01)
+        if input_tensor_02 is not None:
+            input_tensor_02 = normalize_uint8_tensor(input_tensor_02)
         if training:
             return self._call_training(input_tensor_01, input_tensor_02)
 
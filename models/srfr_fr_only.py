@@ -1,6 +1,7 @@
 import tensorflow as tf
 from tensorflow.keras import Model
 from tensorflow.keras.mixed_precision import experimental as mixed_precision
+from utils.common import normalize_uint8_tensor
 
 from models.arcloss_layer import ArcLossLayer
 from models.resnet import ResNet
@@ -29,6 +30,7 @@ class SrfrFrOnly(Model):
         )
 
     def call(self, input_tensor, training: bool = True):
+        input_tensor = normalize_uint8_tensor(input_tensor)
         if training:
             return self._call_training(input_tensor)
 
@@ -1,4 +1,5 @@
 import tensorflow as tf
+from utils.common import normalize_uint8_tensor
 
 from models.srfr import SRFR
 
@@ -31,6 +32,9 @@ class SrfrSrOnly(SRFR):
         training: bool = True,
         input_type: str = "syn",
     ):
+        input_tensor_01 = normalize_uint8_tensor(input_tensor_01)
+        if input_tensor_02 is not None:
+            input_tensor_02 = normalize_uint8_tensor(input_tensor_02)
         if training:
             return self._call_training(input_tensor_01, input_tensor_02)
 
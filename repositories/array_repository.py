@@ -0,0 +1,232 @@
+import json
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import tensorflow as tf
+
+from utils.identity_sampler import IdentitySampler
+
+from repositories.repository import BaseRepository
+
+AUTOTUNE = tf.data.experimental.AUTOTUNE
+
+
+class ArrayRepository(BaseRepository):
+    """Repository backed by memory-mapped uint8 arrays, one per resolution, plus\
+ label arrays, as written by the `*_to_arrays.py` converters.
+
+    Samples are read by index, so shuffling is a global shuffle of indices and\
+ each batch is gathered from the memory-mapped files with no protobuf parsing\
+ or image decoding. The gather copies the batch out of the page cache, it is\
+ not a zero-copy read.
+    """
+
+    METADATA_FILE_NAME = "metadata.json"
+
+    def __init__(
+        self,
+        dataset_name: str,
+        dataset_path: Path,
+        remove_overlaps: bool = True,
+    ):
+        super().__init__()
+        self._dataset_name = dataset_name
+        self._dataset_path = Path(dataset_path)
+        self._remove_overlaps = remove_overlaps
+        self._dataset_shape = "iic"
+        self._logger = super().get_logger()
+
+        with self._dataset_path.joinpath(self.METADATA_FILE_NAME).open("r") as obj:
+            self._metadata = json.load(obj)
+
+        self._images_hr = self._load_array("images_high_resolution")
+        self._images_lr = None
+        if not self._generate_low_resolution:
+            self._images_lr = self._load_array("images_low_resolution")
+        self._labels = self._load_array("labels")
+
+        self._overlaps = (
+            self._get_overlapping_identities(dataset_name)
+            if remove_overlaps
+            else remove_overlaps
+        )
+        indices = np.arange(len(self._labels), dtype=np.int64)
+        if self._overlaps:
+            class_ids = self._load_array("class_ids")
+            indices = indices[~np.isin(class_ids, self._overlaps)]
+        self._train_indices, self._test_indices = self._split_indices(indices)
+        self._indices = indices
+
+    def _load_array(self, name: str) -> np.ndarray:
+        return np.load(str(self._dataset_path.joinpath(f"{name}.npy")), mmap_mode="r")
+
+    def _split_indices(self, indices: np.ndarray):
+        """Splits the sample indices in train and test with a seeded\
+ permutation, so that the split is the same across runs.
+        """
+        split_settings = self._input_pipeline_settings["split"]
+        permutation = np.random.RandomState(split_settings["seed"]).permutation(
+            indices
+        )
+        num_test_samples = int(round(split_settings["test_fraction"] * len(indices)))
+        return (
+            np.sort(permutation[num_test_samples:]),
+            np.sort(permutation[:num_test_samples]),
+        )
+
+    def _gather(self, indices: np.ndarray):
+        """Reads the samples of a batch, in the order of `indices`.
+
+        The files are read in sorted index order, as forward scans, and the\
+ samples are put back in the given order, so that the shuffle of the indices\
+ is kept.
+        """
+        order = np.argsort(indices, kind="stable")
+        sorted_indices = indices[order]
+        positions = np.empty_like(order)
+        positions[order] = np.arange(len(order))
+
+        if self._images_lr is None:
+            # The low resolution images are generated from the high resolution
+            # ones by the input pipeline.
+            images_lr = np.zeros((0,), dtype=np.uint8)
+        else:
+            images_lr = self._images_lr[sorted_indices][positions]
+        return (
+            images_lr,
+            self._images_hr[sorted_indices][positions],
+            self._labels[sorted_indices][positions].astype(np.int32),
+        )
+
+    def _load_indices(self, indices: np.ndarray, shuffle: bool):
+        dataset = tf.data.Dataset.from_tensor_slices(indices)
+        if shuffle:
+            # A global shuffle only costs one int64 per sample.
+            dataset = dataset.shuffle(len(indices), reshuffle_each_iteration=True)
+
+        return self._read_indices(
+            dataset.batch(self._input_pipeline_settings["decode_batch_size"] or 256)
+        )
+
+    def _read_indices(self, dataset):
+        image_shape_lr = self._preprocess_settigs["image_shape_low_resolution"]
+        image_shape_hr = self._preprocess_settigs["image_shape_high_resolution"]
+
+        def _read_batch(batch_indices):
+            images_lr, images_hr, labels = tf.numpy_function(
+                self._gather, [batch_indices], [tf.uint8, tf.uint8, tf.int32]
+            )
+            images_hr = tf.reshape(images_hr, [-1, *image_shape_hr])
+            if self._images_lr is None:
+                images_lr = self._generate_low_resolution_images(images_hr)
+            else:
+                images_lr = tf.reshape(images_lr, [-1, *image_shape_lr])
+            return images_lr, images_hr, tf.reshape(labels, [-1])
+
+        return dataset.map(_read_batch, num_parallel_calls=AUTOTUNE).unbatch()
+
+    @staticmethod
+    def _get_worker_indices(
+        indices: np.ndarray,
+        input_context: tf.distribute.InputContext = None,
+    ) -> np.ndarray:
+        if input_context is None:
+            return indices
+        return indices[
+            input_context.input_pipeline_id :: input_context.num_input_pipelines
+        ]
+
+    def get_train_dataset(self, input_context: tf.distribute.InputContext = None):
+        self._logger.info(f" Loading {self._dataset_name} arrays in train mode.")
+        return self._load_indices(
+            self._get_worker_indices(self._train_indices, input_context), shuffle=True
+        )
+
+    def get_identity_sampled_dataset(
+        self,
+        batch_size: int,
+        input_context: tf.distribute.InputContext = None,
+    ):
+        self._logger.info(
+            f" Loading {self._dataset_name} arrays in identity sampled mode."
+        )
+        train_indices = self._get_worker_indices(self._train_indices, input_context)
+        sampler_settings = self._input_pipeline_settings["sampler"]
+        seed = sampler_settings["seed"]
+        if seed is not None and input_context is not None:
+            # Workers must not draw the same batches.
+            seed += input_context.input_pipeline_id
+        sampler = IdentitySampler(
+            self._labels[train_indices],
+            super()._get_identities_per_batch(batch_size),
+            sampler_settings["samples_per_identity"],
+            seed,
+        )
+
+        def _sample_indices():
+            for positions in sampler:
+                yield train_indices[positions]
+
+        return self._read_indices(
+            tf.data.Dataset.from_generator(
+                _sample_indices, tf.int64, tf.TensorShape([batch_size])
+            )
+        )
+
+    def get_test_dataset(self, input_context: tf.distribute.InputContext = None):
+        self._logger.info(f" Loading {self._dataset_name} arrays in test mode.")
+        return self._load_indices(
+            self._get_worker_indices(self._test_indices, input_context), shuffle=False
+        )
+
+    def get_full_dataset(self, input_context: tf.distribute.InputContext = None):
+        return self._load_indices(
+            self._get_worker_indices(self._indices, input_context), shuffle=True
+        )
+
+    def get_train_dataset_len(self) -> int:
+        return super()._get_augmentation_factor() * len(self._train_indices)
+
+    def get_test_dataset_len(self) -> int:
+        return len(self._test_indices)
+
+    def get_full_dataset_len(self) -> int:
+        return len(self._indices)
+
+    def get_number_of_classes(self) -> int:
+        return self._metadata["number_of_classes"]
+
+    def get_dataset_shape(self):
+        return self._dataset_shape
+
+    def get_dataset_files(self, split: str) -> List[Path]:
+        return sorted(self._dataset_path.glob("*.npy"))
+
+    def cache_dataset(
+        self,
+        dataset,
+        name: str,
+        dataset_files: List[Path],
+        input_context: tf.distribute.InputContext = None,
+    ):
+        # The arrays are already decoded and memory-mapped, caching them again
+        # would only duplicate them on disk.
+        return dataset
+
+    def augment_dataset(self, dataset):
+        self._logger.info(f" Augmenting {self._dataset_name} dataset.")
+        return super().augment_dataset(dataset, self.get_dataset_shape())
+
+    def normalize_dataset(self, dataset):
+        if super()._normalizes_on_device():
+            return dataset
+        self._logger.info(f" Normalizing {self._dataset_name} dataset.")
+        return dataset.map(
+            lambda image_lr, image_hr, class_id: (
+                self.normalize_image(image_lr),
+                self.normalize_image(image_hr),
+                class_id,
+            ),
+            num_parallel_calls=AUTOTUNE,
+        )
@@ -1,7 +1,11 @@
 from pathlib import Path
+from typing import List
 
 import tensorflow as tf
+from utils.class_labels import load_class_pairs
+from utils.input_data import parseConfigsFile
 
+from repositories.casia_arrays import CasiaWebfaceArrays
 from repositories.repository import BaseRepository
 
 AUTOTUNE = tf.data.experimental.AUTOTUNE
@@ -17,54 +21,131 @@ class CasiaWebface(BaseRepository):
     ):
         super().__init__()
         self._remove_overlaps = remove_overlaps
+        self._cache_path = BASE_CACHE_PATH
 
         self._dataset_shape = "iic"
+
+        self._logger = super().get_logger()
+        super()._get_class_pairs("CASIA", "concatenated")
+        super()._set_overlaps("CASIA", remove_overlaps)
+
+        self._dataset_index = super()._load_dataset_index(self.DATASET_PATH)
         self._serialized_features = {
-            "class_id": tf.io.FixedLenFeature([], tf.string),
+            **super()._get_label_features(),
             "image_low_resolution": tf.io.FixedLenFeature([], tf.string),
             "image_high_resolution": tf.io.FixedLenFeature([], tf.string),
         }
+        if self._generate_low_resolution:
+            del self._serialized_features["image_low_resolution"]
+        self._split_mode = self._input_pipeline_settings["split"]["mode"]
+        shards = super()._list_shards(self.DATASET_PATH)
+        if self._split_mode == "shards":
+            self._train_shards, self._test_shards = super()._split_shards(shards)
+        else:
+            # The records split takes and skips records of all the shards.
+            self._train_shards, self._test_shards = shards, []
+        # The tf.data pipeline is only built when it is first used.
+        self._dataset = None
+        self._dataset_size = self._get_full_dataset_len()
 
-        self._logger = super().get_logger()
-        self._class_pairs = super()._get_class_pairs("CASIA", "concatenated")
-        super().set_class_pairs(self._class_pairs)
+    def _get_full_dataset_len(self) -> int:
+        if self._dataset_index is None:
+            return 446_883
+        return self._dataset_index.get_num_records(excluded_classes=self._overlaps)
+
+    def _get_split_len(self, shards) -> int:
+        if self._split_mode == "records":
+            train_len = int(0.9 * self._dataset_size)
+            if shards is self._train_shards:
+                return train_len
+            return self._dataset_size - train_len
 
-        self._dataset = self._initialize_dataset()
-        self._dataset_size = 446_883
+        if self._dataset_index is None:
+            raise ValueError(
+                "The shards split needs the dataset index to count the records"
+                " of each split. Write it with scripts_to_tfrecords/"
+                f"index_tfrecords.py {self.DATASET_PATH}, or set"
+                " input_pipeline.split.mode to records."
+            )
+        return self._dataset_index.get_num_records(
+            files=[shard.name for shard in shards],
+            excluded_classes=self._overlaps,
+        )
 
-    def get_train_dataset(self):
+    def get_train_dataset(self, input_context: tf.distribute.InputContext = None):
         self._logger.info(f" Loading CASIA-Webface in train mode.")
 
-        return self._dataset.take(int(0.9 * self._dataset_size))
+        if self._split_mode == "records":
+            return super()._shard_records(
+                self._get_dataset().take(int(0.9 * self._dataset_size)), input_context
+            )
+        return self._load_shards(self._train_shards, input_context)
+
+    def get_identity_sampled_dataset(
+        self,
+        batch_size: int,
+        input_context: tf.distribute.InputContext = None,
+    ):
+        self._logger.info(f" Loading CASIA-Webface in identity sampled mode.")
+
+        dataset = super()._load_identity_batches(
+            self._train_shards,
+            batch_size,
+            self._batch_decoding_function,
+            input_context,
+        )
+        return self._convert_tfrecords(dataset)
 
     def get_train_dataset_len(self) -> int:
-        if self._remove_overlaps:
-            return 804_384
-        return 0
+        augmentation_factor = super()._get_augmentation_factor()
+        if self._dataset_index is None and self._split_mode == "records":
+            # Sizes of the records split of the dataset without overlaps.
+            return 402_192 * augmentation_factor if self._remove_overlaps else 0
+        return augmentation_factor * self._get_split_len(self._train_shards)
 
     def get_test_dataset_len(self) -> int:
-        if self._remove_overlaps:
-            return 44_672
-        return 0
+        if self._dataset_index is None and self._split_mode == "records":
+            return 44_672 if self._remove_overlaps else 0
+        return self._get_split_len(self._test_shards)
 
-    def get_test_dataset(self):
+    def get_test_dataset(self, input_context: tf.distribute.InputContext = None):
         self._logger.info(f" Loading CASIA-Webface in test mode.")
 
-        return self._dataset.skip(int(0.9 * self._dataset_size))
+        if self._split_mode == "records":
+            return super()._shard_records(
+                self._get_dataset().skip(int(0.9 * self._dataset_size)), input_context
+            )
+        return self._load_shards(self._test_shards, input_context)
+
+    def _get_dataset(self):
+        if self._dataset is None:
+            self._dataset = self._initialize_dataset()
+        return self._dataset
 
     def _initialize_dataset(self):
         self._logger.info(f" Loading CASIA-Webface in concatenated mode.")
 
+        return self._load_shards(self.DATASET_PATH)
+
+    def _load_shards(
+        self,
+        dataset_paths,
+        input_context: tf.distribute.InputContext = None,
+    ):
         dataset = super().load_dataset_multiple_shards(
             "CASIA",
-            self.DATASET_PATH,
+            dataset_paths,
             self._decoding_function,
             self._remove_overlaps,
+            batch_decoding_function=self._batch_decoding_function,
+            input_context=input_context,
         )
 
         return self._convert_tfrecords(dataset)
 
     def _convert_tfrecords(self, dataset):
+        if self._stored_labels:
+            return dataset
         return dataset.map(
             super()._convert_class_ids,
             num_parallel_calls=AUTOTUNE,
@@ -72,21 +153,38 @@ class CasiaWebface(BaseRepository):
 
     def _get_number_of_classes(self):
         classes = set()
-        for _, _, class_id in self._dataset:
+        for _, _, class_id in self._get_dataset():
             classes.add(class_id.numpy())
 
         num_classes = len(classes)
         print(num_classes)
         return num_classes
 
-    def get_full_dataset(self):
-        return self._dataset
+    def get_full_dataset(self, input_context: tf.distribute.InputContext = None):
+        if input_context is None:
+            return self._get_dataset()
+        return self._load_shards(self.DATASET_PATH, input_context)
 
     def get_full_dataset_len(self) -> int:
         return self._dataset_size
 
+    def get_dataset_files(self, split: str) -> List[Path]:
+        """Shards read by the dataset of a split, "train", "test" or "full",\
+ to key its cache.
+        """
+        if split == "full" or self._split_mode == "records":
+            return super()._list_shards(self.DATASET_PATH)
+        return self._train_shards if split == "train" else self._test_shards
+
     def get_number_of_classes(self) -> int:
-        return 10_574
+        if self._dataset_index is None:
+            return 10_574
+        # The labels come from the class pairs file, also for the classes that
+        # were excluded from the shards, so the classifier must cover all of
+        # them rather than only the classes left in the shards.
+        if self._stored_labels:
+            return self._dataset_index.get_number_of_labels()
+        return max(load_class_pairs("CASIA").values()) + 1
 
     def get_dataset_size(self, dataset):
         return super()._get_dataset_size(dataset)
@@ -100,16 +198,6 @@ class CasiaWebface(BaseRepository):
             serialized_example,
             self._serialized_features,
         )
-        image_lr = super()._decode_raw_image(
-            deserialized_example["image_low_resolution"]
-        )
-        # image_lr.set_shape(image_shape)
-        image_lr = tf.reshape(
-            image_lr,
-            tf.stack(
-                [*super().get_preprocess_settings()["image_shape_low_resolution"]]
-            ),
-        )
         image_hr = super()._decode_raw_image(
             deserialized_example["image_high_resolution"]
         )
@@ -119,16 +207,64 @@ class CasiaWebface(BaseRepository):
                 [*super().get_preprocess_settings()["image_shape_high_resolution"]]
             ),
         )
+        if self._generate_low_resolution:
+            image_lr = super()._generate_low_resolution_images(image_hr)
+        else:
+            image_lr = super()._decode_raw_image(
+                deserialized_example["image_low_resolution"]
+            )
+            # image_lr.set_shape(image_shape)
+            image_lr = tf.reshape(
+                image_lr,
+                tf.stack(
+                    [*super().get_preprocess_settings()["image_shape_low_resolution"]]
+                ),
+            )
 
-        class_id = super()._decode_string(deserialized_example["class_id"])
+        class_id = super()._decode_label(deserialized_example)
         self._dataset_shape = "iic"
         return image_lr, image_hr, class_id
 
+    @tf.function
+    def _batch_decoding_function(self, serialized_examples):
+        deserialized_examples = tf.io.parse_example(
+            serialized_examples,
+            self._serialized_features,
+        )
+        image_hr = super()._decode_raw_images_batch(
+            deserialized_examples["image_high_resolution"],
+            super().get_preprocess_settings()["image_shape_high_resolution"],
+        )
+        if self._generate_low_resolution:
+            image_lr = super()._generate_low_resolution_images(image_hr)
+        else:
+            image_lr = super()._decode_raw_images_batch(
+                deserialized_examples["image_low_resolution"],
+                super().get_preprocess_settings()["image_shape_low_resolution"],
+            )
+
+        class_id = super()._decode_label(deserialized_examples)
+        return image_lr, image_hr, class_id
+
+    def cache_dataset(
+        self,
+        dataset,
+        name: str,
+        dataset_files: List[Path],
+        input_context: tf.distribute.InputContext = None,
+    ):
+        self._logger.info(" Caching CASIA-Webface dataset.")
+        return super().cache_dataset(
+            dataset, self._cache_path, name, dataset_files, input_context
+        )
+
     def augment_dataset(self, dataset):
         self._logger.info(" Augmenting CASIA-Webface dataset.")
         return super().augment_dataset(dataset, self.get_dataset_shape())
 
     def normalize_dataset(self, dataset):
+        if super()._normalizes_on_device():
+            return dataset
         self._logger.info(" Normalizing CASIA-Webface dataset.")
         return dataset.map(
             lambda image_lr, image_hr, class_id: (
@@ -138,3 +274,18 @@ class CasiaWebface(BaseRepository):
             ),
             num_parallel_calls=AUTOTUNE,
         )
+
+
+def create_casia_webface(BASE_CACHE_PATH: Path, remove_overlaps: bool = True):
+    """Creates the CASIA-Webface repository for the backend set in config.yaml.
+
+    ### Parameters
+        BASE_CACHE_PATH: Directory for the dataset caches.
+        remove_overlaps: If True, overlapping identities are removed.
+
+    ### Returns
+        A CasiaWebface or a CasiaWebfaceArrays repository.
+    """
+    if parseConfigsFile(["dataset"])["casia"]["backend"] == "arrays":
+        return CasiaWebfaceArrays(BASE_CACHE_PATH, remove_overlaps)
+    return CasiaWebface(BASE_CACHE_PATH, remove_overlaps)
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+from utils.input_data import parseConfigsFile
+
+from repositories.array_repository import ArrayRepository
+
+
+class CasiaWebfaceArrays(ArrayRepository):
+    """CASIA-Webface stored as memory-mapped arrays by\
+ `scripts_to_tfrecords/casia_to_arrays.py`, with the same API as\
+ `CasiaWebface`.
+    """
+
+    def __init__(
+        self,
+        BASE_CACHE_PATH: Path,
+        remove_overlaps: bool = True,
+    ):
+        dataset_path = parseConfigsFile(["dataset"])["casia"]["arrays_path"]
+        super().__init__("CASIA", Path(dataset_path), remove_overlaps)
+        self._cache_path = BASE_CACHE_PATH
@@ -1,9 +1,12 @@
+import hashlib
 import json
 from pathlib import Path
+from typing import List
 
 import numpy as np
 import tensorflow as tf
 from utils.input_data import parseConfigsFile
+from utils.pairs import deduplicate_pairs
 
 from repositories.repository import BaseRepository
 
@@ -13,6 +16,9 @@ AUTOTUNE = tf.data.experimental.AUTOTUNE
 class LFW(BaseRepository):
     DATASET_PATH_LR = Path.cwd().joinpath("data", "datasets", "LFW_LR")
     DATASET_PATH_HR = Path.cwd().joinpath("data", "datasets", "LFW_HR")
+    # Decoded and resized pairs written by `pack`, so that validation jobs
+    # don't decode the JPEGs again.
+    PACKED_FILE_NAME = "packed_pairs.npy"
 
     def __init__(self, resolution: str = "lr"):
         super().__init__()
@@ -32,28 +38,197 @@ class LFW(BaseRepository):
 
         self._number_of_classes = 5750
         self._logger = super().get_logger()
+        self._packed_pairs = None
 
     def get_dataset(self):
         self._logger.info(" Loading LFW_LR in test mode.")
 
-        left_pairs = self._get_dataset_pair(
-            self.DATASET_PATH.joinpath("images", "left", "*")
+        num_pairs = len(self._load_is_same_list())
+        left_positions = np.arange(num_pairs)
+        return (
+            self._get_images(left_positions),
+            self._get_images(left_positions + num_pairs),
+            self._load_is_same_list(),
         )
-        right_pairs = self._get_dataset_pair(
-            self.DATASET_PATH.joinpath("images", "right", "*")
+
+    def get_unique_dataset(self):
+        """Loads each distinct image of the pairs once, for the verification\
+ to embed it once and expand the embeddings to the pairs by index.
+
+        ### Returns
+            (images, left_indices, right_indices, is_same_list) - the dataset\
+ of unique images, with their flipped copies, and the position in it of the\
+ left and right image of each pair.
+        """
+        self._logger.info(" Loading the unique images of LFW_LR in test mode.")
+
+        packed_pairs = self._load_packed_pairs()
+        if packed_pairs is not None:
+            left_keys, right_keys = packed_pairs["left_key"], packed_pairs["right_key"]
+        else:
+            left_keys, right_keys = (
+                self._get_image_keys(self._get_image_paths(side))
+                for side in ("left", "right")
+            )
+
+        positions, left_indices, right_indices = deduplicate_pairs(
+            left_keys, right_keys
+        )
+        self._logger.info(
+            f" {len(positions)} unique images in {len(left_indices)} LFW pairs."
+        )
+        return (
+            self._get_images(positions),
+            left_indices,
+            right_indices,
+            self._load_is_same_list(),
         )
 
+    def _get_images(self, positions: np.ndarray):
+        """Dataset of the images at the given positions of the left images\
+ followed by the right images, with their flipped copies.
+        """
+        packed_pairs = self._load_packed_pairs()
+        if packed_pairs is not None:
+            dataset = self._read_packed_images(packed_pairs, positions)
+        else:
+            paths = self._get_image_paths("left") + self._get_image_paths("right")
+            dataset = tf.data.Dataset.from_tensor_slices(
+                [str(paths[position]) for position in positions]
+            ).map(self._decode_image_from_path, num_parallel_calls=AUTOTUNE)
+
+        dataset = self.augment_dataset(dataset)
+        return self.normalize_dataset(dataset)
+
+    def _get_image_paths(self, side: str) -> List[Path]:
+        # Sorted, as listed by tf.data.Dataset.list_files(shuffle=False).
+        return sorted(self.DATASET_PATH.joinpath("images", side).glob("*"))
+
+    @staticmethod
+    def _get_image_keys(paths: List[Path]) -> np.ndarray:
+        """Digests of the encoded images, equal for copies of the same image."""
+        return np.array(
+            [hashlib.sha1(path.read_bytes()).digest() for path in paths],
+            dtype="S20",
+        )
+
+    def _load_is_same_list(self) -> np.ndarray:
+        packed_pairs = self._load_packed_pairs()
+        if packed_pairs is not None:
+            return np.array(packed_pairs["is_same"])
+
         with self.DATASET_PATH.joinpath("is_same_list.json").open("r") as obj:
             is_same_list = json.load(obj)
+        return np.array(is_same_list, dtype=np.int16).astype(np.bool)
+
+    def _get_packed_dtype(self) -> np.dtype:
+        image_shape = (*self.image_shape, 3)
+        return np.dtype(
+            [
+                ("left", np.float32, image_shape),
+                ("right", np.float32, image_shape),
+                ("left_key", "S20"),
+                ("right_key", "S20"),
+                ("is_same", np.bool_),
+            ]
+        )
 
-        is_same_list = np.array(is_same_list, dtype=np.int16).astype(np.bool)
+    def pack(self) -> Path:
+        """Decodes and resizes every pair once and writes them, with the\
+ digests of the encoded images and the is_same list, to a single\
+ memory-mapped file next to the images.
+
+        ### Returns
+            Path of the packed file.
+        """
+        self._logger.info(f" Packing LFW pairs from {self.DATASET_PATH}.")
+        is_same_list = self._load_is_same_list()
+
+        path = self.DATASET_PATH.joinpath(self.PACKED_FILE_NAME)
+        temporary_path = path.with_suffix(".tmp.npy")
+        pairs = np.lib.format.open_memmap(
+            str(temporary_path),
+            mode="w+",
+            dtype=self._get_packed_dtype(),
+            shape=(len(is_same_list),),
+        )
+        pairs["is_same"] = is_same_list
+        for side in ("left", "right"):
+            paths = self._get_image_paths(side)
+            if len(paths) != len(pairs):
+                raise ValueError(
+                    f"Found {len(paths)} {side} images for {len(pairs)} LFW pairs."
+                )
+            pairs[f"{side}_key"] = self._get_image_keys(paths)
+
+            dataset = (
+                tf.data.Dataset.from_tensor_slices([str(path) for path in paths])
+                .map(self._decode_image_from_path, num_parallel_calls=AUTOTUNE)
+                .batch(256)
+            )
+            start = 0
+            for batch in dataset:
+                pairs[side][start : start + len(batch)] = batch.numpy()
+                start += len(batch)
+        pairs.flush()
+        del pairs
+        # Readers only see complete files.
+        temporary_path.replace(path)
+        self._packed_pairs = None
+        return path
+
+    def _load_packed_pairs(self):
+        if self._packed_pairs is not None:
+            return self._packed_pairs
+
+        path = self.DATASET_PATH.joinpath(self.PACKED_FILE_NAME)
+        if not path.is_file():
+            self._logger.warning(
+                f" Packed LFW pairs not found in {path}, decoding the images."
+            )
+            return None
+
+        pairs = np.load(str(path), mmap_mode="r")
+        if pairs.dtype != self._get_packed_dtype():
+            self._logger.warning(
+                f" Packed LFW pairs in {path} have another layout, decoding the"
+                " images."
+            )
+            return None
+        self._packed_pairs = pairs
+        return pairs
+
+    @staticmethod
+    def _read_packed_images(pairs: np.ndarray, positions: np.ndarray):
+        left_images, right_images = pairs["left"], pairs["right"]
+        image_shape = left_images.shape[1:]
+
+        def _gather(batch_positions):
+            images = np.empty((len(batch_positions), *image_shape), dtype=np.float32)
+            is_left = batch_positions < len(pairs)
+            images[is_left] = left_images[batch_positions[is_left]]
+            images[~is_left] = right_images[batch_positions[~is_left] - len(pairs)]
+            return images
+
+        def _read_batch(batch_positions):
+            images = tf.numpy_function(_gather, [batch_positions], tf.float32)
+            return tf.reshape(images, [-1, *image_shape])
+
+        return (
+            tf.data.Dataset.from_tensor_slices(np.asarray(positions, dtype=np.int64))
+            .batch(256)
+            .map(_read_batch, num_parallel_calls=AUTOTUNE)
+            .unbatch()
+        )
 
-        return left_pairs, right_pairs, is_same_list
+    def _decode_image_from_path(self, image_path):
+        return self._decode_image(tf.io.read_file(image_path))
 
-    def _get_dataset_pair(self, path: Path):
-        dataset = tf.data.Dataset.list_files(str(path), shuffle=False)
-        dataset = dataset.map(self._decode_image_from_path, num_parallel_calls=AUTOTUNE)
-        dataset = self.augment_dataset(dataset)
+    def _decode_image(self, image):
+        image = tf.image.decode_jpeg(image, channels=3)
+        return tf.image.resize(image, self.image_shape)
+
+    def normalize_dataset(self, dataset):
         return dataset.map(
             lambda image, augmented_image: (
                 self.normalize_image(image),
@@ -62,11 +237,6 @@ class LFW(BaseRepository):
             num_parallel_calls=AUTOTUNE,
         )
 
-    def _decode_image_from_path(self, image_path):
-        image = tf.io.read_file(image_path)
-        image = tf.image.decode_jpeg(image, channels=3)
-        return tf.image.resize(image, self.image_shape)
-
     def get_number_of_classes(self) -> int:
         return self._number_of_classes
 
@@ -1,14 +1,29 @@
+import hashlib
+import json
 import logging
 import os
+import shutil
 from functools import partial
 from pathlib import Path
-from typing import List, Union
+from typing import List, Tuple, Union
 
 import numpy as np
 import tensorflow as tf
+from utils.class_labels import get_class_pairs_path, load_overlapping_identities
+from utils.config import thaw
+from utils.dataset_index import DatasetIndex
+from utils.identity_sampler import TFRecordIdentitySampler
 from utils.input_data import parseConfigsFile
 
 AUTOTUNE = tf.data.experimental.AUTOTUNE
+# Preprocess settings that change the decoded records, and so their caches.
+_DECODING_PREPROCESS_KEYS = (
+    "image_shape_high_resolution",
+    "image_shape_low_resolution",
+    "low_resolution_source",
+    "image_format",
+    "stored_labels",
+)
 
 
 class BaseRepository:
@@ -16,7 +31,18 @@ class BaseRepository:
 
     def __init__(self):
         self._logger = logging.getLogger(__name__)
-        self._preprocess_settigs = parseConfigsFile(["preprocess"])
+        self._preprocess_settigs, self._input_pipeline_settings = parseConfigsFile(
+            ["preprocess", "input_pipeline"]
+        )
+        self._generate_low_resolution = (
+            self._preprocess_settigs["low_resolution_source"] == "generated"
+        )
+        self._class_pairs_path = None
+        self._class_pairs = None
+        self._overlaps = False
+        self._overlaps_table = None
+        self._dataset_index = None
+        self._stored_labels = False
 
     @staticmethod
     @tf.function
@@ -38,6 +64,12 @@ class BaseRepository:
         image = tf.subtract(tf.dtypes.cast(image, dtype=tf.float32), 127.5)
         return tf.divide(image, 128)
 
+    def _normalizes_on_device(self) -> bool:
+        """Whether the images are left as uint8, to be normalized by the models\
+ on the device, so that the host ships 4x smaller batches.
+        """
+        return self._input_pipeline_settings["normalization"] == "device"
+
     @staticmethod
     @tf.function
     def _augment_image_iics(image_lr, image_hr, class_id, sample_id):
@@ -161,7 +193,108 @@ class BaseRepository:
         """
         return tf.image.flip_left_right(image)
 
+    @staticmethod
+    def _random_flip(dataset_shape: str, *args):
+        """Flips all the images of a sample with probability 0.5, adding\
+ '-augmented' at the end of the sample id of flipped samples.
+
+        ### Parameters
+            dataset_shape: Shape of the dataset, e.g. 'iic', where each 'i' is\
+ an image, 'c' a class id and 's' a sample id.
+            args: The sample, in the order given by dataset_shape.
+
+        ### Returns
+            The sample, with the same shape.
+        """
+        flip = tf.math.less(tf.random.uniform([]), 0.5)
+        args = list(args)
+        for position, element in enumerate(dataset_shape):
+            if element == "i":
+                args[position] = tf.where(
+                    flip, tf.image.flip_left_right(args[position]), args[position]
+                )
+            elif element == "s":
+                args[position] = tf.where(
+                    flip,
+                    tf.strings.join((args[position], "augmented"), separator="-"),
+                    args[position],
+                )
+        return tuple(args)
+
+    @staticmethod
+    def _random_flip_batch(dataset_shape: str, *args):
+        """Vectorized version of `_random_flip`, flipping each sample of a batch\
+ with probability 0.5.
+
+        ### Parameters
+            dataset_shape: Shape of the dataset, e.g. 'iic'.
+            args: The batch, in the order given by dataset_shape.
+
+        ### Returns
+            The batch, with the same shape.
+        """
+        flip = tf.math.less(tf.random.uniform(tf.shape(args[0])[:1]), 0.5)
+        args = list(args)
+        for position, element in enumerate(dataset_shape):
+            if element == "i":
+                args[position] = tf.where(
+                    tf.reshape(flip, [-1, 1, 1, 1]),
+                    tf.reverse(args[position], axis=[2]),
+                    args[position],
+                )
+            elif element == "s":
+                args[position] = tf.where(
+                    flip,
+                    tf.strings.join((args[position], "augmented"), separator="-"),
+                    args[position],
+                )
+        return tuple(args)
+
+    def _get_augmentation_factor(self) -> int:
+        """Number of samples in the augmented dataset for each original sample."""
+        if self._input_pipeline_settings["augmentation"]["mode"] == "concatenate":
+            return 2
+        return 1
+
+    def augment_batched_dataset(self, dataset, dataset_shape):
+        """Randomly flips the samples of an already batched dataset.
+
+        ### Parameters
+            dataset: Batched dataset to be augmented.
+            dataset_shape: Shape of the dataset, e.g. 'iic'.
+
+        ### Returns
+            The augmented dataset.
+        """
+        return dataset.map(
+            partial(self._random_flip_batch, dataset_shape),
+            num_parallel_calls=AUTOTUNE,
+        )
+
     def augment_dataset(self, dataset, dataset_shape):
+        """Augments a dataset according to the `augmentation` settings: either\
+ concatenating a flipped copy of the dataset, or randomly flipping samples in\
+ the same pass.
+
+        ### Parameters
+            dataset: Dataset to be augmented.
+            dataset_shape: Shape of the dataset, one of 'iics', 'iic', 'ics' and\
+ 'ic'.
+
+        ### Returns
+            The augmented dataset.
+        """
+        augmentation_settings = self._input_pipeline_settings["augmentation"]
+        if augmentation_settings["mode"] == "random":
+            return dataset.map(
+                partial(self._random_flip, dataset_shape),
+                num_parallel_calls=AUTOTUNE,
+            )
+        if augmentation_settings["mode"] == "random_batch":
+            return self.augment_batched_dataset(
+                dataset.batch(augmentation_settings["batch_size"]), dataset_shape
+            ).unbatch()
+
         if dataset_shape == "iics":
             augmented_dataset = dataset.map(
                 self._augment_image_iics,
@@ -203,27 +336,91 @@ class BaseRepository:
         return class_list, new_class_id
 
     def _get_class_pairs(self, dataset_name: str, file_name: str):
+        """Locates the class pairs file of a dataset. The lookup table is only\
+ built when a dataset is first loaded, by `_build_lookup_tables`.
+
+        ### Parameters
+            dataset_name: Name of the dataset.
+            file_name: Name of the class pairs file, without extension.
+
+        ### Returns
+            Path of the class pairs file, or None if it doesn't exist.
+        """
         self._logger.info(f" Getting class pairs.")
 
-        path = Path.cwd().joinpath(
-            "data", "class_pairs", f"{dataset_name}", f"{file_name}.txt"
-        )
+        path = get_class_pairs_path(dataset_name, file_name)
         if not path.is_file():
             self._logger.warning(f" File not found for {dataset_name}.")
             return None
 
-        return tf.lookup.StaticHashTable(
-            tf.lookup.TextFileInitializer(
-                str(path), tf.string, 0, tf.int32, 1, delimiter=","
-            ),
-            -1,
-        )
+        self._class_pairs_path = path
+        return path
+
+    def _build_lookup_tables(self) -> None:
+        """Builds the class pairs and overlaps tables on first use. It must be\
+ called eagerly, before the functions using the tables are traced.
+        """
+        if (
+            self._class_pairs is None
+            and self._class_pairs_path is not None
+            and not self._stored_labels
+        ):
+            self._class_pairs = tf.lookup.StaticHashTable(
+                tf.lookup.TextFileInitializer(
+                    str(self._class_pairs_path),
+                    tf.string,
+                    0,
+                    tf.int32,
+                    1,
+                    delimiter=",",
+                ),
+                -1,
+            )
+        if self._overlaps and self._overlaps_table is None and not self._stored_labels:
+            self._overlaps_table = self._get_overlaps_table(self._overlaps)
 
-    @staticmethod
     @tf.function
-    def _decode_raw_image(image):
+    def _decode_raw_image(self, image):
+        image_format = self._preprocess_settigs["image_format"]
+        if image_format == "raw":
+            return tf.io.decode_raw(image, tf.uint8)
+        if image_format == "jpeg":
+            return tf.io.decode_jpeg(image, channels=3)
         return tf.io.decode_png(image)
 
+    def _generate_low_resolution_images(self, images_hr):
+        """Downscales high resolution images to the low resolution shape with\
+ area interpolation, the equivalent of the converters' cv2.INTER_AREA.
+
+        ### Parameters
+            images_hr: uint8 image, or batch of images, in high resolution.
+
+        ### Returns
+            The uint8 low resolution images.
+        """
+        images_lr = tf.image.resize(
+            images_hr,
+            self._preprocess_settigs["image_shape_low_resolution"][:2],
+            method=tf.image.ResizeMethod.AREA,
+        )
+        return tf.cast(tf.math.round(images_lr), tf.uint8)
+
+    def _decode_raw_images_batch(self, images, image_shape):
+        image_format = self._preprocess_settigs["image_format"]
+        if image_format == "raw":
+            # Raw images have a fixed size, so the whole batch is decoded at once.
+            images = tf.io.decode_raw(images, tf.uint8)
+        else:
+            images = tf.map_fn(
+                partial(tf.io.decode_jpeg, channels=3)
+                if image_format == "jpeg"
+                else tf.io.decode_png,
+                images,
+                dtype=tf.uint8,
+                back_prop=False,
+            )
+        return tf.reshape(images, tf.stack([-1, *image_shape]))
+
     @staticmethod
     @tf.function
     def _decode_image_shape(height, width, depth):
@@ -274,26 +471,84 @@ class BaseRepository:
         else:
             class_id = args[-1]
 
-        # When class_id is in self._overlaps, returns False so that ds.filter()
-        # will filter this id out.
-        return tf.cond(
-            tf.math.reduce_any(tf.math.equal(class_id, self._overlaps)),
-            lambda: False,
-            lambda: True,
+        # Overlapping identities are looked up as 1, so that ds.filter() will
+        # filter them out.
+        return tf.math.equal(self._overlaps_table.lookup(class_id), 0)
+
+    @staticmethod
+    def _get_overlaps_table(overlaps: tuple):
+        """Creates a hash set with the overlapping identities, mapping each one\
+ of them to 1 and any other identity to 0.
+
+        ### Parameters
+            overlaps: Tuple with the overlapping identities.
+
+        ### Returns
+            A StaticHashTable from identity to int32.
+        """
+        return tf.lookup.StaticHashTable(
+            tf.lookup.KeyValueTensorInitializer(
+                tf.constant(overlaps, dtype=tf.string),
+                tf.ones([len(overlaps)], dtype=tf.int32),
+            ),
+            0,
         )
 
+    def _set_overlaps(self, dataset_name: str, remove_overlaps: bool) -> None:
+        overlaps = (
+            self._get_overlapping_identities(dataset_name)
+            if remove_overlaps
+            else remove_overlaps
+        )
+        if overlaps != self._overlaps:
+            self._overlaps = overlaps
+            self._overlaps_table = None
+
     def _load_from_tfrecords(
         self,
         dataset_paths: Union[str, List[str]],
         decoding_function,
+        batch_decoding_function=None,
+        input_context: tf.distribute.InputContext = None,
     ):
         self._logger.info(f" Loading from {dataset_paths}.")
         dataset = tf.data.TFRecordDataset(dataset_paths)
-        dataset = dataset.map(
-            decoding_function,
-            num_parallel_calls=AUTOTUNE,
+        dataset = self._shard_records(dataset, input_context)
+        return self._decode_tfrecords(
+            dataset, decoding_function, batch_decoding_function
         )
-        if self._overlaps:
+
+    def _decode_tfrecords(
+        self,
+        dataset,
+        decoding_function,
+        batch_decoding_function=None,
+    ):
+        """Decodes serialized records, parsing them in batches with\
+ `batch_decoding_function` when it is given and `decode_batch_size` is set.
+
+        ### Parameters
+            dataset: Dataset of serialized tf.train.Example records.
+            decoding_function: Function that decodes a single record.
+            batch_decoding_function: Function that decodes a batch of records.
+
+        ### Returns
+            The decoded dataset, one sample per element.
+        """
+        self._build_lookup_tables()
+        decode_batch_size = self._input_pipeline_settings["decode_batch_size"]
+        if batch_decoding_function is not None and decode_batch_size:
+            dataset = (
+                dataset.batch(decode_batch_size)
+                .map(batch_decoding_function, num_parallel_calls=AUTOTUNE)
+                .unbatch()
+            )
+        else:
+            dataset = dataset.map(
+                decoding_function,
+                num_parallel_calls=AUTOTUNE,
+            )
+        if self._overlaps and not self._stored_labels:
             dataset = dataset.filter(self._filter_overlaps)
 
         return dataset
@@ -307,14 +562,157 @@ class BaseRepository:
         ### Returns
             Tuple with the identities to be cleaned.
         """
-        overlapping = set()
-        path = Path.cwd().joinpath("data", "overlapping_identities", dataset_name)
-        for file_path in path.glob("*"):
-            with file_path.open("r") as _file:
-                for line in _file.readlines():
-                    overlapping.add(line.replace("\n", ""))
+        return load_overlapping_identities(dataset_name)
+
+    def _load_dataset_index(self, directory: Path):
+        """Loads the index written by the converters next to the shards.
+
+        ### Parameters
+            directory: Directory holding the TFRecord shards.
+
+        ### Returns
+            The DatasetIndex, or None if the directory has no index.
+        """
+        dataset_index = DatasetIndex.load(directory)
+        if dataset_index is None:
+            self._logger.warning(f" Dataset index not found in {directory}.")
+            return dataset_index
+
+        self._stored_labels = dataset_index.get_metadata("labels") is not None
+        if self._stored_labels and self._overlaps:
+            excluded_classes = set(dataset_index.get_metadata("excluded_classes", ()))
+            if not set(self._overlaps) <= excluded_classes:
+                self._logger.warning(
+                    f" The shards in {directory} were written with other"
+                    " overlapping identities, which will not be filtered."
+                )
+        return dataset_index
+
+    def _get_label_features(self) -> dict:
+        """Features holding the class of each record: the int64 label written by\
+ the converters, if the index says so, or the class id string otherwise.
+        """
+        if self._stored_labels:
+            return {"label": tf.io.FixedLenFeature([], tf.int64)}
+        return {"class_id": tf.io.FixedLenFeature([], tf.string)}
 
-        return tuple(overlapping)
+    def _decode_label(self, deserialized_example):
+        """Class of decoded records: the int32 label if it was stored, to skip\
+ the class pairs lookup, or the class id string to be looked up.
+        """
+        if self._stored_labels:
+            return tf.cast(deserialized_example["label"], tf.int32)
+        return self._decode_string(deserialized_example["class_id"])
+
+    @staticmethod
+    def _get_worker_shards(
+        shards: List[Path],
+        input_context: tf.distribute.InputContext = None,
+    ) -> Tuple[List[Path], bool]:
+        """Assigns the shards to the input pipeline of the current worker, so\
+ that each worker only reads its own files.
+
+        ### Parameters
+            shards: Paths of all the shards to be read.
+            input_context: InputContext given by\
+ `distribute_datasets_from_function`, or None for a single pipeline.
+
+        ### Returns
+            (shards, shard_records) - the shards of this pipeline, and whether\
+ the records still have to be sharded because there are fewer shards than\
+ pipelines.
+        """
+        if input_context is None or input_context.num_input_pipelines == 1:
+            return shards, False
+        if len(shards) < input_context.num_input_pipelines:
+            return shards, True
+        return (
+            shards[
+                input_context.input_pipeline_id :: input_context.num_input_pipelines
+            ],
+            False,
+        )
+
+    @staticmethod
+    def _shard_records(dataset, input_context: tf.distribute.InputContext = None):
+        """Keeps only the records of the input pipeline of the current worker.\
+ Every pipeline still reads all the files, so shard the files with\
+ `_get_worker_shards` whenever possible.
+        """
+        if input_context is None or input_context.num_input_pipelines == 1:
+            return dataset
+        return dataset.shard(
+            input_context.num_input_pipelines, input_context.input_pipeline_id
+        )
+
+    def use_identity_sampler(self) -> bool:
+        return self._input_pipeline_settings["sampler"]["enabled"]
+
+    def _get_identities_per_batch(self, batch_size: int) -> int:
+        samples_per_identity = self._input_pipeline_settings["sampler"][
+            "samples_per_identity"
+        ]
+        if batch_size % samples_per_identity:
+            raise ValueError(
+                f"Batch size {batch_size} is not a multiple of"
+                f" samples_per_identity {samples_per_identity}."
+            )
+        return batch_size // samples_per_identity
+
+    def _load_identity_batches(
+        self,
+        shards: List[Path],
+        batch_size: int,
+        batch_decoding_function,
+        input_context: tf.distribute.InputContext = None,
+    ):
+        """Loads the records of the given shards in batches of P identities\
+ times K samples, read through the dataset index.
+
+        ### Parameters
+            shards: Paths of the shards to be sampled.
+            batch_size: Size of the P x K batches, a multiple of K.
+            batch_decoding_function: Function that decodes a batch of records.
+            input_context: InputContext of the current worker. Each worker\
+ samples its own shards, or all of them if there are fewer shards than workers.
+
+        ### Returns
+            The decoded dataset, one sample per element, where each run of\
+ `batch_size` samples is one P x K batch.
+        """
+        if self._dataset_index is None:
+            raise ValueError("The identity sampler needs the dataset index.")
+        self._build_lookup_tables()
+
+        sampler_settings = self._input_pipeline_settings["sampler"]
+        seed = sampler_settings["seed"]
+        shards, _ = self._get_worker_shards(shards, input_context)
+        if seed is not None and input_context is not None:
+            # Workers sampling the same shards must not draw the same batches.
+            seed += input_context.input_pipeline_id
+
+        sampler = TFRecordIdentitySampler.from_index(
+            self._dataset_index,
+            self._get_identities_per_batch(batch_size),
+            sampler_settings["samples_per_identity"],
+            files=[shard.name for shard in shards],
+            excluded_classes=self._overlaps or (),
+            seed=seed,
+        )
+
+        def _read_records(positions):
+            records = tf.numpy_function(sampler.read_records, [positions], tf.string)
+            records.set_shape([batch_size])
+            return records
+
+        return (
+            tf.data.Dataset.from_generator(
+                sampler.__iter__, tf.int64, tf.TensorShape([batch_size])
+            )
+            .map(_read_records, num_parallel_calls=AUTOTUNE)
+            .map(batch_decoding_function, num_parallel_calls=AUTOTUNE)
+            .unbatch()
+        )
 
     def _get_dataset_size(
         self,
@@ -334,32 +732,92 @@ class BaseRepository:
     def load_dataset_multiple_shards(
         self,
         dataset_name: str,
-        dataset_paths: List[str],
+        dataset_paths: Union[Path, List[Path]],
         decoding_function,
         remove_overlaps: bool = False,
+        batch_decoding_function=None,
+        input_context: tf.distribute.InputContext = None,
     ):
-        _load_tfrecords = partial(
-            self._load_from_tfrecords, decoding_function=decoding_function
+        self._set_overlaps(dataset_name, remove_overlaps)
+
+        shards = self._list_shards(dataset_paths)
+        shards, shard_records = self._get_worker_shards(shards, input_context)
+        records_context = input_context if shard_records else None
+        self._logger.info(f" Loading from {dataset_paths} with parallel interleave.")
+        dataset = self._read_shards(shards)
+        dataset = self._shard_records(dataset, records_context)
+        return self._decode_tfrecords(
+            dataset, decoding_function, batch_decoding_function
         )
-        self._overlaps = (
-            self._get_overlapping_identities(dataset_name)
-            if remove_overlaps
-            else remove_overlaps
+
+    def _read_shards(self, shards: List[Path]):
+        """Reads the serialized records of the shards, in shuffled order and\
+ interleaved as set in the `interleave` settings. With a cycle_length of 1, the\
+ shards are read one after the other.
+
+        ### Parameters
+            shards: Paths of the shards to be read.
+
+        ### Returns
+            Dataset of serialized records.
+        """
+        paths = self._shuffle_multiple_shards(shards)
+        interleave_settings = self._input_pipeline_settings["interleave"]
+        return paths.interleave(
+            partial(
+                tf.data.TFRecordDataset,
+                buffer_size=interleave_settings["buffer_size"],
+            ),
+            cycle_length=interleave_settings["cycle_length"],
+            block_length=interleave_settings["block_length"],
+            num_parallel_calls=AUTOTUNE,
+            deterministic=interleave_settings["deterministic"],
         )
 
-        paths = self._shuffle_multiple_shards(dataset_paths)
-        # return paths.interleave(
-        #    _load_tfrecords, deterministic=False, num_parallel_calls=AUTOTUNE
-        # )
-        return _load_tfrecords(paths)
-        # return paths.shuffle(buffer_size=9000)
+    @staticmethod
+    def _list_shards(dataset_paths: Union[Path, List[Path]]) -> List[Path]:
+        if isinstance(dataset_paths, Path):
+            return sorted(dataset_paths.glob("*.tfrecords"))
+        return sorted(Path(path) for path in dataset_paths)
 
     @staticmethod
-    def _shuffle_multiple_shards(dataset_paths: List[str]):
-        paths = np.array(list(map(lambda x: str(x), dataset_paths.glob("*"))))
+    def _shuffle_multiple_shards(shards: List[Path]):
+        paths = np.array([str(shard) for shard in shards])
         np.random.shuffle(paths)
         return tf.data.Dataset.from_tensor_slices(paths)
 
+    def _split_shards(self, shards: List[Path]) -> Tuple[List[Path], List[Path]]:
+        """Assigns whole shards to the train and test splits.
+
+        The assignment only depends on the shard names and on the split\
+ settings, so it is the same across runs.
+
+        ### Parameters
+            shards: Paths of all the shards of the dataset.
+
+        ### Returns
+            (train_shards, test_shards) - lists of shard paths, with at least\
+ one shard each.
+        """
+        if len(shards) < 2:
+            raise ValueError(
+                f"The shards split needs at least 2 shards, there are {len(shards)}."
+                " Set input_pipeline.split.mode to records."
+            )
+        split_settings = self._input_pipeline_settings["split"]
+        shards = sorted(shards)
+        permutation = np.random.RandomState(split_settings["seed"]).permutation(
+            len(shards)
+        )
+        num_test_shards = min(
+            max(1, int(round(split_settings["test_fraction"] * len(shards)))),
+            len(shards) - 1,
+        )
+
+        test_shards = sorted(shards[i] for i in permutation[:num_test_shards])
+        train_shards = sorted(shards[i] for i in permutation[num_test_shards:])
+        return train_shards, test_shards
+
     def load_dataset(
         self,
         dataset_name: str,
@@ -368,6 +826,8 @@ class BaseRepository:
         mode: str,
         remove_overlaps: bool = False,
         sample_ids: bool = False,
+        batch_decoding_function=None,
+        input_context: tf.distribute.InputContext = None,
     ):
         """Loads the dataset from disk, returning a TF Tensor with shape\
      (image, class_id, sample).
@@ -389,6 +849,11 @@ class BaseRepository:
             sample_ids: If True, return a Tensor containing the sample_id for each\
      sample in the dataset. Necessary in case of loading a test dataset that will\
      be augmented.
+            batch_decoding_function: Optional function that decodes a batch of\
+     serialized records at once, used when `decode_batch_size` is set.
+            input_context: InputContext of the current worker, to read only the\
+     worker's files, or its records if there are fewer files than workers. Not\
+     used in 'both' mode.
 
         ### Returns
             If mode='both', returns two tuples, one for train and one for test, with\
@@ -398,28 +863,152 @@ class BaseRepository:
      dataset_length) - dataset Tensor, number of classes and dataset length.
         """
         self._sample_ids = sample_ids
-        self._overlaps = (
-            self._get_overlapping_identities(dataset_name)
-            if remove_overlaps
-            else remove_overlaps
+        self._set_overlaps(dataset_name, remove_overlaps)
+        dataset_files = self._list_shards(
+            [dataset_paths] if isinstance(dataset_paths, str) else dataset_paths
         )
 
         if mode == "both":
             train_dataset = self._load_from_tfrecords(
                 dataset_paths[0],
                 decoding_function,
+                batch_decoding_function,
             )
             test_dataset = self._load_from_tfrecords(
                 dataset_paths[1],
                 decoding_function,
+                batch_decoding_function,
             )
             return train_dataset, test_dataset
 
+        if input_context is None:
+            return self._load_from_tfrecords(
+                dataset_paths,
+                decoding_function,
+                batch_decoding_function,
+            )
+
+        dataset_files, shard_records = self._get_worker_shards(
+            dataset_files, input_context
+        )
         return self._load_from_tfrecords(
-            dataset_paths,
+            [str(path) for path in dataset_files],
             decoding_function,
+            batch_decoding_function,
+            input_context if shard_records else None,
         )
 
+    def _get_cache_key(
+        self,
+        name: str,
+        dataset_files: List[Path],
+        input_context: tf.distribute.InputContext = None,
+    ) -> str:
+        """Hashes everything that defines the content of a decoded dataset: the\
+ dataset files, the input pipeline of the worker and its files, the preprocess\
+ settings the records are decoded with, the split settings, the overlapping\
+ identities and the class pairs file. The settings only used by the\
+ converters, e.g. the shard size, are left out, since a converted dataset\
+ changes its files anyway.
+
+        ### Parameters
+            name: Name of the cached dataset, e.g. 'train' or 'test'.
+            dataset_files: Files the cached dataset is read from.
+            input_context: InputContext of the worker, whose pipeline only\
+ reads its share of the files or records.
+
+        ### Returns
+            Hexadecimal digest identifying the cached dataset.
+        """
+        dataset_files = sorted(Path(path) for path in dataset_files)
+        pipeline = None
+        if input_context is not None:
+            worker_files, _ = self._get_worker_shards(dataset_files, input_context)
+            pipeline = {
+                "num_input_pipelines": input_context.num_input_pipelines,
+                "input_pipeline_id": input_context.input_pipeline_id,
+                "files": [str(path.resolve()) for path in worker_files],
+            }
+
+        files = []
+        for path in dataset_files:
+            stat = path.stat()
+            files.append([str(path.resolve()), stat.st_size, stat.st_mtime_ns])
+
+        class_pairs = None
+        if self._class_pairs_path is not None:
+            class_pairs = hashlib.sha256(
+                self._class_pairs_path.read_bytes()
+            ).hexdigest()
+
+        sources = {
+            "name": name,
+            "repository": type(self).__name__,
+            "files": files,
+            "pipeline": pipeline,
+            "preprocess": {
+                key: self._preprocess_settigs[key]
+                for key in _DECODING_PREPROCESS_KEYS
+            },
+            "split": self._input_pipeline_settings["split"],
+            "overlaps": sorted(self._overlaps) if self._overlaps else [],
+            "class_pairs": class_pairs,
+        }
+        return hashlib.sha256(
+            json.dumps(sources, sort_keys=True, default=thaw).encode("utf-8")
+        ).hexdigest()[:16]
+
+    def cache_dataset(
+        self,
+        dataset,
+        cache_path: Path,
+        name: str,
+        dataset_files: List[Path],
+        input_context: tf.distribute.InputContext = None,
+    ):
+        """Caches a decoded dataset on disk, so that it is read and decoded from\
+ TFRecords only once and reused across epochs, trials and runs.
+
+        The cache lives in `cache_path/name-<key>`, where key is given by\
+ `_get_cache_key`. When any of its inputs changes, a new cache is written.\
+ The caches with the same name and other keys are logged, and only removed if\
+ input_pipeline.prune_stale_caches is set, since they may belong to another\
+ worker or config.
+
+        ### Parameters
+            dataset: Decoded dataset to be cached.
+            cache_path: Directory holding the caches.
+            name: Name of the cached dataset, e.g. 'train' or 'test'.
+            dataset_files: Files the dataset is read from, given by the\
+ `get_dataset_files` of the repository.
+            input_context: InputContext of the worker the dataset was built\
+ for, or None for a single pipeline.
+
+        ### Returns
+            The cached dataset.
+        """
+        key = self._get_cache_key(name, dataset_files, input_context)
+        cache_dir = cache_path.joinpath(f"{name}-{key}")
+        prune = self._input_pipeline_settings["prune_stale_caches"]
+        for stale_dir in cache_path.glob(f"{name}-*"):
+            if stale_dir == cache_dir:
+                continue
+            if prune:
+                self._logger.info(f" Removing stale cache {stale_dir}.")
+                shutil.rmtree(stale_dir, ignore_errors=True)
+            else:
+                self._logger.info(f" Keeping cache {stale_dir}, not used by this run.")
+
+        cache_file = cache_dir.joinpath("cache")
+        if cache_dir.is_dir() and not cache_dir.joinpath("cache.index").is_file():
+            # A previous run stopped before finishing the cache.
+            self._logger.info(f" Removing incomplete cache {cache_dir}.")
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._logger.info(f" Caching dataset {name} in {cache_dir}.")
+        return dataset.cache(str(cache_file))
+
     def get_preprocess_settings(self):
         return self._preprocess_settigs
 
@@ -1,4 +1,5 @@
-from typing import Tuple, Union
+from pathlib import Path
+from typing import List, Tuple, Union
 
 import tensorflow as tf
 from utils.input_data import parseConfigsFile
@@ -13,9 +14,11 @@ class VggFace2(BaseRepository):
         self,
         remove_overlaps: bool = True,
         sample_ids: bool = False,
+        BASE_CACHE_PATH: Path = Path.cwd().joinpath("temp"),
     ):
         super().__init__()
         self._remove_overlaps = remove_overlaps
+        self._cache_path = BASE_CACHE_PATH
         self._sample_ids = sample_ids
         if self._sample_ids:
             self._dataset_shape = "iics"
@@ -29,12 +32,6 @@ class VggFace2(BaseRepository):
             self._number_of_train_classes = 8631
             self._number_of_test_classes = 500
 
-        self._serialized_features = {
-            "class_id": tf.io.FixedLenFeature([], tf.string),
-            "sample_id": tf.io.FixedLenFeature([], tf.string),
-            "image_low_resolution": tf.io.FixedLenFeature([], tf.string),
-            "image_high_resolution": tf.io.FixedLenFeature([], tf.string),
-        }
         self._dataset_settings = parseConfigsFile(["dataset"])["vggface2_lr"]
         self._dataset_paths = {
             "train": self._dataset_settings["train_path"],
@@ -46,52 +43,118 @@ class VggFace2(BaseRepository):
         }
 
         self._logger = super().get_logger()
-        self._class_pairs = super()._get_class_pairs("VGGFace2_LR", "concatenated")
-        super().set_class_pairs(self._class_pairs)
+        super()._get_class_pairs("VGGFace2_LR", "concatenated")
+        super()._set_overlaps("VGGFace2_LR", remove_overlaps)
+        # The tf.data pipeline, and its size when there is no index, are only
+        # computed when they are first used.
         self._dataset = None
+        self._dataset_size = None
+        self._dataset_index = super()._load_dataset_index(
+            Path(self._dataset_settings["train_path"]).parent
+        )
+        self._serialized_features = {
+            **super()._get_label_features(),
+            "sample_id": tf.io.FixedLenFeature([], tf.string),
+            "image_low_resolution": tf.io.FixedLenFeature([], tf.string),
+            "image_high_resolution": tf.io.FixedLenFeature([], tf.string),
+        }
+        if self._generate_low_resolution:
+            del self._serialized_features["image_low_resolution"]
+
+        self._split_mode = self._input_pipeline_settings["split"]["mode"]
+
+    def _get_dataset(self):
+        if self._dataset is None:
+            self._get_concatenated_dataset()
+        return self._dataset
+
+    def get_full_dataset_len(self) -> int:
+        if self._dataset_size is None:
+            self._dataset_size = self._get_full_dataset_len()
+        return self._dataset_size
 
-        self._get_concatenated_dataset()
-        self._dataset_size = self.get_dataset_size(self._dataset)
+    def _get_full_dataset_len(self) -> int:
+        if self._dataset_index is None:
+            return self.get_dataset_size(self._get_dataset())
+        return self._dataset_index.get_num_records(
+            files=[Path(path).name for path in self._dataset_paths["both"]],
+            excluded_classes=self._overlaps,
+        )
 
     def _get_concatenated_dataset(self):
         self._logger.info(f" Loading VGGFace2_LR in concatenated mode.")
 
+        self._dataset = self._load_split("both")
+
+    def _load_split(
+        self,
+        mode: str,
+        input_context: tf.distribute.InputContext = None,
+    ):
         dataset = super().load_dataset(
             "VGGFace2_LR",
-            self._dataset_paths["both"],
+            self._dataset_paths[mode],
             self._decoding_function,
             "concatenated",
             remove_overlaps=self._remove_overlaps,
             sample_ids=self._sample_ids,
+            batch_decoding_function=self._batch_decoding_function,
+            input_context=input_context,
         )
 
-        self._dataset = self._convert_tfrecords(dataset)
+        return self._convert_tfrecords(dataset)
 
-    def get_train_dataset(self):
+    def get_train_dataset(self, input_context: tf.distribute.InputContext = None):
         self._logger.info(f" Loading VGGFace2_LR in train mode.")
 
-        return self._dataset.take(int(0.7 * self._dataset_size))
+        if self._split_mode == "records":
+            return super()._shard_records(
+                self._get_dataset().take(int(0.7 * self.get_full_dataset_len())),
+                input_context,
+            )
+        return self._load_split("train", input_context)
+
+    def get_identity_sampled_dataset(
+        self,
+        batch_size: int,
+        input_context: tf.distribute.InputContext = None,
+    ):
+        self._logger.info(f" Loading VGGFace2_LR in identity sampled mode.")
+
+        dataset = super()._load_identity_batches(
+            [Path(self._dataset_paths["train"])],
+            batch_size,
+            self._batch_decoding_function,
+            input_context,
+        )
+        return self._convert_tfrecords(dataset)
 
-    def get_test_dataset(self):
+    def get_test_dataset(self, input_context: tf.distribute.InputContext = None):
         self._logger.info(f" Loading VGGFace2_LR in test mode.")
 
-        return self._dataset.skip(int(0.7 * self._dataset_size))
+        if self._split_mode == "records":
+            return super()._shard_records(
+                self._get_dataset().skip(int(0.7 * self.get_full_dataset_len())),
+                input_context,
+            )
+        return self._load_split("test", input_context)
+
+    def get_dataset_files(self, split: str) -> List[Path]:
+        """Files read by the dataset of a split, "train", "test" or "full", to\
+ key its cache.
+        """
+        if split == "full" or self._split_mode == "records":
+            return [Path(path) for path in self._dataset_paths["both"]]
+        return [Path(self._dataset_paths[split])]
 
     def get_concatenated_datasets(self):
         self._logger.info(f" Loading VGGFace2_LR in concatenated mode.")
 
-        dataset = super().load_dataset(
-            "VGGFace2_LR",
-            self._dataset_paths["both"],
-            self._decoding_function,
-            "concatenated",
-            remove_overlaps=self._remove_overlaps,
-            sample_ids=self._sample_ids,
-        )
-
-        return self._convert_tfrecords(dataset)
+        return self._load_split("both")
 
     def _convert_tfrecords(self, dataset):
+        if self._stored_labels:
+            return dataset
         return dataset.map(
             super()._convert_class_ids_with_sample_id,
             num_parallel_calls=AUTOTUNE,
@@ -99,7 +162,7 @@ class VggFace2(BaseRepository):
 
     def _get_number_of_classes(self):
         classes = set()
-        for _, _, class_id in self._dataset:
+        for _, _, class_id in self._get_dataset():
             classes.add(class_id.numpy())
 
         num_classes = len(classes)
@@ -130,16 +193,6 @@ class VggFace2(BaseRepository):
             serialized_example,
             self._serialized_features,
         )
-        image_lr = super()._decode_raw_image(
-            deserialized_example["image_low_resolution"]
-        )
-        # image_lr.set_shape(image_shape)
-        image_lr = tf.reshape(
-            image_lr,
-            tf.stack(
-                [*super().get_preprocess_settings()["image_shape_low_resolution"]]
-            ),
-        )
         image_hr = super()._decode_raw_image(
             deserialized_example["image_high_resolution"]
         )
@@ -149,8 +202,21 @@ class VggFace2(BaseRepository):
                 [*super().get_preprocess_settings()["image_shape_high_resolution"]]
             ),
         )
+        if self._generate_low_resolution:
+            image_lr = super()._generate_low_resolution_images(image_hr)
+        else:
+            image_lr = super()._decode_raw_image(
+                deserialized_example["image_low_resolution"]
+            )
+            # image_lr.set_shape(image_shape)
+            image_lr = tf.reshape(
+                image_lr,
+                tf.stack(
+                    [*super().get_preprocess_settings()["image_shape_low_resolution"]]
+                ),
+            )
 
-        class_id = super()._decode_string(deserialized_example["class_id"])
+        class_id = super()._decode_label(deserialized_example)
         if self._sample_ids:
             self._dataset_shape = "iics"
             sample_id = self._decode_string(deserialized_example["sample_id"])
@@ -159,11 +225,50 @@ class VggFace2(BaseRepository):
         self._dataset_shape = "iic"
         return image_lr, image_hr, class_id
 
+    @tf.function
+    def _batch_decoding_function(self, serialized_examples):
+        deserialized_examples = tf.io.parse_example(
+            serialized_examples,
+            self._serialized_features,
+        )
+        image_hr = super()._decode_raw_images_batch(
+            deserialized_examples["image_high_resolution"],
+            super().get_preprocess_settings()["image_shape_high_resolution"],
+        )
+        if self._generate_low_resolution:
+            image_lr = super()._generate_low_resolution_images(image_hr)
+        else:
+            image_lr = super()._decode_raw_images_batch(
+                deserialized_examples["image_low_resolution"],
+                super().get_preprocess_settings()["image_shape_low_resolution"],
+            )
+
+        class_id = super()._decode_label(deserialized_examples)
+        if self._sample_ids:
+            sample_id = self._decode_string(deserialized_examples["sample_id"])
+            return image_lr, image_hr, class_id, sample_id
+
+        return image_lr, image_hr, class_id
+
+    def cache_dataset(
+        self,
+        dataset,
+        name: str,
+        dataset_files: List[Path],
+        input_context: tf.distribute.InputContext = None,
+    ):
+        self._logger.info(" Caching VggFace2_LR dataset.")
+        return super().cache_dataset(
+            dataset, self._cache_path, name, dataset_files, input_context
+        )
+
     def augment_dataset(self, dataset):
         self._logger.info(" Augmenting VggFace2_LR dataset.")
         return super().augment_dataset(dataset, self.get_dataset_shape())
 
     def normalize_dataset(self, dataset):
+        if super()._normalizes_on_device():
+            return dataset
         self._logger.info(" Normalizing VggFace2_LR dataset.")
         return dataset.map(
             lambda image_lr, image_hr, class_id: (
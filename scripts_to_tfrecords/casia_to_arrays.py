@@ -0,0 +1,93 @@
+"""Converts CASIA-Webface to memory-mapped uint8 arrays, read by\
+ `repositories.casia_arrays.CasiaWebfaceArrays`.
+"""
+import os
+import sys
+
+sys.path.append(os.path.abspath("."))
+
+import json
+import logging
+from pathlib import Path
+
+import cv2
+import numpy as np
+from tqdm import tqdm
+from utils.class_labels import load_class_pairs
+from utils.input_data import InputData, parseConfigsFile
+from utils.timing import TimingLogger
+
+logging.basicConfig(filename="casia_to_arrays.txt", level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+
+timing = TimingLogger()
+timing.start()
+
+LOGGER.info("--- Setting Functions ---")
+
+PREPROCESS_SETTINGS = parseConfigsFile(["preprocess"])
+SHAPE_LR = tuple(PREPROCESS_SETTINGS["image_shape_low_resolution"])
+SHAPE_HR = tuple(PREPROCESS_SETTINGS["image_shape_high_resolution"])
+STORE_LOW_RESOLUTION = PREPROCESS_SETTINGS["low_resolution_source"] == "stored"
+
+BASE_DATA_DIR = Path("/workspace/data/datasets/CASIA_LR")
+BASE_OUTPUT_PATH = Path("/workspace/data/datasets/CASIA_LR_Arrays")
+if not BASE_OUTPUT_PATH.is_dir():
+    BASE_OUTPUT_PATH.mkdir(parents=True)
+
+
+def _open_array(name, shape, dtype=np.uint8):
+    return np.lib.format.open_memmap(
+        str(BASE_OUTPUT_PATH.joinpath(f"{name}.npy")),
+        mode="w+",
+        dtype=dtype,
+        shape=shape,
+    )
+
+
+timing.start("arrays")
+
+data_dir = sorted(BASE_DATA_DIR.glob("*/*.jpg"))
+_NUM_IMAGES = len(data_dir)
+class_pairs = load_class_pairs("CASIA")
+
+images_hr = _open_array("images_high_resolution", (_NUM_IMAGES, *SHAPE_HR))
+images_lr = None
+if STORE_LOW_RESOLUTION:
+    images_lr = _open_array("images_low_resolution", (_NUM_IMAGES, *SHAPE_LR))
+labels = np.full(_NUM_IMAGES, -1, dtype=np.int32)
+class_ids = []
+
+for index, image_path in enumerate(tqdm(data_dir)):
+    class_id, _ = InputData.split_path(str(image_path))
+    image = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    images_hr[index] = image
+    if images_lr is not None:
+        images_lr[index] = cv2.resize(image, SHAPE_LR[:2], interpolation=cv2.INTER_AREA)
+    labels[index] = class_pairs.get(class_id, -1)
+    class_ids.append(class_id)
+
+images_hr.flush()
+if images_lr is not None:
+    images_lr.flush()
+np.save(str(BASE_OUTPUT_PATH.joinpath("labels.npy")), labels)
+np.save(
+    str(BASE_OUTPUT_PATH.joinpath("class_ids.npy")), np.array(class_ids, dtype=np.str_)
+)
+
+with BASE_OUTPUT_PATH.joinpath("metadata.json").open("w") as obj:
+    json.dump(
+        {
+            "num_samples": _NUM_IMAGES,
+            # The labels come from the class pairs file, so the classifier
+            # must cover its largest label.
+            "number_of_classes": max(class_pairs.values()) + 1,
+            "image_shape_low_resolution": list(SHAPE_LR),
+            "image_shape_high_resolution": list(SHAPE_HR),
+            "low_resolution_source": PREPROCESS_SETTINGS["low_resolution_source"],
+        },
+        obj,
+    )
+
+timing.end("arrays")
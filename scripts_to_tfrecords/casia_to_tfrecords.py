@@ -6,93 +6,94 @@ sys.path.append(os.path.abspath("."))
 import logging
 from pathlib import Path
 
-import cv2
-import tensorflow as tf
-from tqdm import tqdm
-from utils.input_data import InputData, parseConfigsFile
+from utils.class_labels import load_class_pairs, load_overlapping_identities
+from utils.config import get_config
+from utils.conversion_manifest import ConversionManifest
+from utils.dataset_index import DatasetIndex
+from utils.duplicate_index import get_duplicate_index
+from utils.image_conversion import FaceImageConverter
+from utils.image_sources import list_images, split_image_path
+from utils.shard_planner import get_plan_metadata
 from utils.timing import TimingLogger
 
 logging.basicConfig(filename="casia_to_tfrecords.txt", level=logging.INFO)
 LOGGER = logging.getLogger(__name__)
 
-timing = TimingLogger()
-timing.start()
-
-LOGGER.info("--- Setting Functions ---")
-
-SHAPE = tuple(parseConfigsFile(["preprocess"])["image_shape_low_resolution"][:2])
+# The conversion workers are spawned and import this module, so it doesn't
+# import TensorFlow: only the main process does, in main().
+PREPROCESS_SETTINGS = get_config().get_sections(["preprocess"])
+SHAPE = tuple(PREPROCESS_SETTINGS["image_shape_low_resolution"][:2])
+STORE_LOW_RESOLUTION = PREPROCESS_SETTINGS["low_resolution_source"] == "stored"
+IMAGE_FORMAT = PREPROCESS_SETTINGS["image_format"]
+STORE_LABELS = PREPROCESS_SETTINGS["stored_labels"]
+SHARD_BYTES = PREPROCESS_SETTINGS["shard_megabytes"] * 2 ** 20
+SKIP_DUPLICATES = PREPROCESS_SETTINGS["duplicates"] == "skip"
 
 DATASET_NAME = "CASIA_Webface"
+# Either the directory of the images or a zip or uncompressed tar archive of
+# it, .tar.gz and other compressed tar archives have to be decompressed first.
 BASE_DATA_DIR = Path("/workspace/data/datasets/CASIA_LR")
 BASE_OUTPUT_PATH = Path("/workspace/data/datasets/CASIA_LR_TFRecords")
-if not BASE_OUTPUT_PATH.is_dir():
-    BASE_OUTPUT_PATH.mkdir(parents=True)
 
 
-def _reduce_resolution(high_resolution_image):
-    low_resolution_image = cv2.cvtColor(
-        cv2.resize(high_resolution_image, SHAPE, interpolation=cv2.INTER_AREA),
-        cv2.COLOR_BGR2RGB,
+def main():
+    from utils.tfrecord_conversion import convert_to_tfrecords, estimate_record_sizes
+
+    timing = TimingLogger()
+    timing.start()
+    LOGGER.info("--- Converting CASIA-Webface ---")
+    if not BASE_OUTPUT_PATH.is_dir():
+        BASE_OUTPUT_PATH.mkdir(parents=True)
+
+    timing.start("train")
+
+    tasks = list_images(BASE_DATA_DIR)
+    dataset_index = DatasetIndex()
+    class_pairs = None
+    if STORE_LABELS:
+        class_pairs = load_class_pairs("CASIA")
+        overlaps = set(load_overlapping_identities("CASIA"))
+        tasks = [task for task in tasks if split_image_path(task)[0] not in overlaps]
+        dataset_index.set_metadata("labels", class_pairs)
+        dataset_index.set_metadata("excluded_classes", sorted(overlaps))
+
+    duplicate_index = get_duplicate_index(DATASET_NAME, PREPROCESS_SETTINGS)
+    converter = FaceImageConverter(
+        SHAPE,
+        STORE_LOW_RESOLUTION,
+        IMAGE_FORMAT,
+        interpolation="area",
+        class_pairs=class_pairs,
+        image_hashes=duplicate_index is not None,
     )
-    high_resolution_image = cv2.cvtColor(high_resolution_image, cv2.COLOR_BGR2RGB)
-    return (
-        tf.image.encode_png(low_resolution_image),
-        tf.image.encode_png(high_resolution_image),
+    record_sizes = estimate_record_sizes(tasks, converter)
+    # The images of the shards finished by a previous conversion stay in
+    # their shards, so that added images only make new shards.
+    groups = ConversionManifest.load(BASE_OUTPUT_PATH).plan_shards(
+        tasks, record_sizes, SHARD_BYTES
     )
-
-
-def _bytes_feature(value):
-    if isinstance(value, type(tf.constant(0))):
-        value = value.numpy()  # BytesList won't unpack a string from an EagerTensor.
-    try:
-        value = value.encode("utf-8")
-    except Exception:
-        pass
-    return tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
-
-
-def _int64_feature(value):
-    return tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
-
-
-def image_example(image_string_low_resolution, image_string_high_resolution, _class_id):
-    feature = {
-        "class_id": _bytes_feature(_class_id),
-        "image_low_resolution": _bytes_feature(image_string_low_resolution),
-        "image_high_resolution": _bytes_feature(image_string_high_resolution),
-    }
-    return tf.train.Example(features=tf.train.Features(feature=feature))
-
-
-def preprocess_image(image_path):
-    class_id, _ = InputData.split_path(str(image_path))
-    high_resolution_image = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
-    low_resolution, high_resolution_image = _reduce_resolution(high_resolution_image)
-    return image_example(low_resolution, high_resolution_image, class_id)
-
-
-timing.start("train")
-
-data_dir = list(BASE_DATA_DIR.glob("*/*.jpg"))
-
-_NUM_IMAGES = len(data_dir)
-
-index = 0
-n_images_shard = 8000
-n_shards = int(_NUM_IMAGES / n_images_shard) + (1 if _NUM_IMAGES % 800 != 0 else 0)
-
-for shard in tqdm(range(n_shards)):
-    tfrecords_shard_path = BASE_OUTPUT_PATH.joinpath(
-        f"{DATASET_NAME}_{shard:03d}-of-{(n_shards - 1):03d}.tfrecords"
+    n_shards = len(groups)
+    shards = [
+        (f"{DATASET_NAME}_{shard:03d}-of-{(n_shards - 1):03d}.tfrecords", group)
+        for shard, group in enumerate(groups)
+    ]
+    dataset_index.set_metadata(
+        "shard_plan", get_plan_metadata(groups, tasks, record_sizes, SHARD_BYTES)
+    )
+    convert_to_tfrecords(
+        shards,
+        converter,
+        BASE_OUTPUT_PATH,
+        dataset_index,
+        duplicate_index=duplicate_index,
+        skip_duplicates=SKIP_DUPLICATES,
     )
-    end = index + n_images_shard if _NUM_IMAGES > (index + n_images_shard) else -1
-    images_shard_list = data_dir[index:end]
+    dataset_index.save(BASE_OUTPUT_PATH)
+    if duplicate_index is not None:
+        duplicate_index.close()
 
-    with tf.io.TFRecordWriter(str(tfrecords_shard_path)) as writer:
-        for image in images_shard_list:
-            tf_example = preprocess_image(image)
-            writer.write(tf_example.SerializeToString())
+    timing.end("train")
 
-    index = end
 
-timing.end("train")
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,134 @@
 import os
 import sys
-import pathlib
-import tensorflow as tf
+
+sys.path.append(os.path.abspath("."))
+
+import logging
+from pathlib import Path
+
 import pandas as pd
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-import utils.timing
-
-tf.debugging.set_log_device_placement(True)
-
-metadata = pd.read_csv(
-    '/mnt/hdd_raid/datasets/DeepGlint/celebrity_lmk',
-    sep=' ',
-    names=['sample',
-           'class_id',
-           'left_eye_x',
-           'left_eye_y',
-           'right_eye_x',
-           'right_eye_y',
-           'nose_tip_x',
-           'nose_tip_y',
-           'mouth_left_x',
-           'mouth_left_y',
-           'mouth_right_x',
-           'mouth_right_y']
-)
-
-print('--- Loading Metadata ---')
-
-def update_keys(key): 
-    key = key.strip('celebrity/')
-    index = key.find('/')
-    return key[index+1:]
-
-def new_keys(key): 
-    key = key.strip('celebrity/')
-    index = key.find('/')
-    return 'm' + key[:index]
-
-metadata['class_name'] = metadata['sample'].map(new_keys)
-metadata['sample'] = metadata['sample'].map(update_keys)
-
-print('--- Setting Functions ---')
-
-def _bytes_feature(value):
-    if isinstance(value, type(tf.constant(0))):
-        value = value.numpy() # BytesList won't unpack a string from an EagerTensor.
-    return tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
-
-def _float_feature(value):
-    return tf.train.Feature(float_list=tf.train.FloatList(value=[value]))
-
-def _int64_feature(value):
-    return tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
-
-def image_example(image_string, image_shape, label, metadata):
-    metadata = metadata.loc[metadata['class_name'] == label[0]]
-    metadata = metadata.loc[metadata['sample'] == label[1]].values
-
-    feature = {
-        'height': _int64_feature(image_shape[0]),
-        'width': _int64_feature(image_shape[1]),
-        'depth': _int64_feature(image_shape[2]),
-        'class_id': _int64_feature(metadata[0, 1]),
-        'sample': _bytes_feature(label[1].encode('UTF-8')),
-        'left_eye_x': _float_feature(metadata[0, 2]),
-        'left_eye_y': _float_feature(metadata[0, 3]),
-        'right_eye_x': _float_feature(metadata[0, 4]),
-        'right_eye_y': _float_feature(metadata[0, 5]),
-        'nose_tip_x': _float_feature(metadata[0, 6]),
-        'nose_tip_y': _float_feature(metadata[0, 7]),
-        'mouth_left_x': _float_feature(metadata[0, 8]),
-        'mouth_left_y': _float_feature(metadata[0, 9]),
-        'mouth_right_x': _float_feature(metadata[0, 10]),
-        'mouth_right_y': _float_feature(metadata[0, 11]),
-        'image_raw': _bytes_feature(image_string),
-    }
-
-    return tf.train.Example(features=tf.train.Features(feature=feature))
-
-print('--- Loading Dataset ---')
-
-data_dir = pathlib.Path('/mnt/hdd_raid/datasets/DeepGlint/celebrity')
-
-partial = 1
-total = len(list(data_dir.glob('*/*.jpg')))
-
-with tf.io.TFRecordWriter(
-    '/mnt/hdd_raid/datasets/TFRecords/DeepGlint/Asian_Raw.tfrecords'
-    ) as writer:
-    for image in list(data_dir.glob('*/*.jpg')):
-        print('Test image: {}/{}'.format(partial, total))
-        label = image.parts[-2], image.parts[-1]
-        img = tf.io.read_file(str(image))
-        img_shape = tf.shape(tf.image.decode_jpeg(img)).numpy()
-        tf_example = image_example(img, img_shape, label, metadata)
-        writer.write(tf_example.SerializeToString())
-        partial += 1
+from utils.config import get_config
+from utils.conversion_manifest import ConversionManifest
+from utils.dataset_index import DatasetIndex
+from utils.duplicate_index import get_duplicate_index
+from utils.image_conversion import LandmarksImageConverter
+from utils.image_sources import get_image_parts, list_images
+from utils.shard_planner import get_plan_metadata
+from utils.timing import TimingLogger
+
+logging.basicConfig(filename="deepglint_to_tfrecords.txt", level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+
+# The conversion workers are spawned and import this module, so it doesn't
+# import TensorFlow: only the main process does, in main().
+METADATA_PATH = Path("/mnt/hdd_raid/datasets/DeepGlint/celebrity_lmk")
+# Either the directory of the images or a zip or uncompressed tar archive of
+# it, .tar.gz and other compressed tar archives have to be decompressed first.
+BASE_DATA_DIR = Path("/mnt/hdd_raid/datasets/DeepGlint/celebrity")
+BASE_OUTPUT_PATH = Path("/mnt/hdd_raid/datasets/TFRecords/DeepGlint")
+OUTPUT_NAME = "Asian_Raw"
+PREPROCESS_SETTINGS = get_config().get_sections(["preprocess"])
+SHARD_BYTES = PREPROCESS_SETTINGS["shard_megabytes"] * 2 ** 20
+SKIP_DUPLICATES = PREPROCESS_SETTINGS["duplicates"] == "skip"
+LANDMARKS = [
+    "left_eye_x",
+    "left_eye_y",
+    "right_eye_x",
+    "right_eye_y",
+    "nose_tip_x",
+    "nose_tip_y",
+    "mouth_left_x",
+    "mouth_left_y",
+    "mouth_right_x",
+    "mouth_right_y",
+]
+
+
+def update_keys(key):
+    key = key.strip("celebrity/")
+    index = key.find("/")
+    return key[index + 1 :]
+
+
+def new_keys(key):
+    key = key.strip("celebrity/")
+    index = key.find("/")
+    return "m" + key[:index]
+
+
+def _load_metadata():
+    """Loads the class and landmarks of each sample, keyed by (class_name,\
+ sample), once, instead of searching the table for every image.
+    """
+    metadata = pd.read_csv(
+        METADATA_PATH, sep=" ", names=["sample", "class_id", *LANDMARKS]
+    )
+    metadata["class_name"] = metadata["sample"].map(new_keys)
+    metadata["sample"] = metadata["sample"].map(update_keys)
+
+    samples = {}
+    for row in metadata.itertuples(index=False):
+        samples.setdefault(
+            (row.class_name, row.sample),
+            (row.class_id, [(name, getattr(row, name)) for name in LANDMARKS]),
+        )
+    return samples
+
+
+def main():
+    from utils.tfrecord_conversion import convert_to_tfrecords, estimate_record_sizes
+
+    timing = TimingLogger()
+    timing.start()
+    timing.start("convert")
+    LOGGER.info("--- Loading Metadata ---")
+    samples = _load_metadata()
+
+    LOGGER.info("--- Converting DeepGlint Asian celebrities ---")
+    tasks = []
+    for image in list_images(BASE_DATA_DIR):
+        label = tuple(get_image_parts(image)[-2:])
+        if label not in samples:
+            LOGGER.warning(f" No metadata for {image}, skipping it.")
+            continue
+        class_id, landmarks = samples[label]
+        tasks.append((image, class_id, label[1], landmarks))
+
+    duplicate_index = get_duplicate_index(OUTPUT_NAME, PREPROCESS_SETTINGS)
+    converter = LandmarksImageConverter(image_hashes=duplicate_index is not None)
+    record_sizes = estimate_record_sizes(tasks, converter)
+    keys = [task[0] for task in tasks]
+    tasks_by_key = dict(zip(keys, tasks))
+    groups = ConversionManifest.load(BASE_OUTPUT_PATH).plan_shards(
+        keys, record_sizes, SHARD_BYTES
+    )
+    n_shards = len(groups)
+    shards = [
+        (
+            f"{OUTPUT_NAME}_{shard:03d}-of-{(n_shards - 1):03d}.tfrecords",
+            [tasks_by_key[key] for key in group],
+        )
+        for shard, group in enumerate(groups)
+    ]
+
+    dataset_index = DatasetIndex()
+    dataset_index.set_metadata(
+        "shard_plan", get_plan_metadata(groups, keys, record_sizes, SHARD_BYTES)
+    )
+    convert_to_tfrecords(
+        shards,
+        converter,
+        BASE_OUTPUT_PATH,
+        dataset_index,
+        duplicate_index=duplicate_index,
+        skip_duplicates=SKIP_DUPLICATES,
+    )
+    dataset_index.save(BASE_OUTPUT_PATH)
+    if duplicate_index is not None:
+        duplicate_index.close()
+
+    timing.end("convert")
+
+
+if __name__ == "__main__":
+    main()
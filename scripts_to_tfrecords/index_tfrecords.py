@@ -0,0 +1,61 @@
+"""Writes the dataset index of TFRecord shards that were converted before the\
+ converters started writing it, or writes it again.
+
+The metadata of an existing index, e.g. the labels and excluded classes, is\
+ kept. Without an index, the labels of records converted with stored labels\
+ are recovered from the records, though only for the classes left in them.
+
+Usage: python scripts_to_tfrecords/index_tfrecords.py <shards_directory>
+"""
+import sys, os  # isort:skip
+
+sys.path.append(os.path.abspath("."))  # isort:skip
+
+import logging
+from pathlib import Path
+
+import tensorflow as tf
+from tqdm import tqdm
+
+from utils.class_labels import UNKNOWN_LABEL
+from utils.dataset_index import DatasetIndex
+
+logging.basicConfig(filename="index_tfrecords.txt", level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+
+FEATURES = {
+    "class_id": tf.io.FixedLenFeature([], tf.string),
+    "label": tf.io.FixedLenFeature([], tf.int64, default_value=UNKNOWN_LABEL),
+}
+
+
+def index_shards(directory: Path) -> DatasetIndex:
+    previous_index = DatasetIndex.load(directory)
+    metadata = {} if previous_index is None else previous_index.get_all_metadata()
+    dataset_index = DatasetIndex(metadata=metadata)
+    labels = {}
+    for shard_path in tqdm(sorted(directory.glob("*.tfrecords"))):
+        class_ids = []
+        record_lengths = []
+        for record in tf.data.TFRecordDataset(str(shard_path)):
+            # Only the class id and label are parsed, images are not decoded.
+            example = tf.io.parse_single_example(record, FEATURES)
+            class_id = example["class_id"].numpy().decode("utf-8")
+            label = int(example["label"].numpy())
+            if label != UNKNOWN_LABEL:
+                labels[class_id] = label
+            class_ids.append(class_id)
+            record_lengths.append(len(record.numpy()))
+
+        LOGGER.info(f" {shard_path.name}: {len(class_ids)} records.")
+        dataset_index.add_shard(shard_path.name, class_ids, record_lengths)
+
+    if labels and dataset_index.get_metadata("labels") is None:
+        LOGGER.info(f" Recovered the labels of {len(labels)} classes from the records.")
+        dataset_index.set_metadata("labels", labels)
+    dataset_index.save(directory)
+    return dataset_index
+
+
+if __name__ == "__main__":
+    index_shards(Path(sys.argv[1]))
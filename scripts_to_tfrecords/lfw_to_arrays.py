@@ -0,0 +1,23 @@
+"""Packs the decoded LFW pairs into a memory-mapped file, read by\
+ `repositories.lfw.LFW`.
+"""
+import os
+import sys
+
+sys.path.append(os.path.abspath("."))
+
+import logging
+
+from repositories.lfw import LFW
+from utils.timing import TimingLogger
+
+logging.basicConfig(filename="lfw_to_arrays.txt", level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+
+timing = TimingLogger()
+timing.start()
+
+for resolution in ("lr", "hr"):
+    timing.start(resolution)
+    LOGGER.info(f" Packed LFW pairs in {LFW(resolution=resolution).pack()}.")
+    timing.end(resolution)
@@ -5,97 +5,106 @@ sys.path.append(os.path.abspath("."))  # isort:skip
 import logging
 from pathlib import Path
 
-import cv2
-import tensorflow as tf
-
-from utils.input_data import InputData, parseConfigsFile
+from utils.class_labels import load_class_pairs, load_overlapping_identities
+from utils.config import get_config
+from utils.dataset_index import DatasetIndex
+from utils.duplicate_index import get_duplicate_index
+from utils.image_conversion import FaceImageConverter
+from utils.image_sources import list_images, split_image_path
 from utils.timing import TimingLogger
 
 logging.basicConfig(filename="vgg_to_tfrecords.txt", level=logging.INFO)
 LOGGER = logging.getLogger(__name__)
 
-timing = TimingLogger()
-timing.start()
-
-LOGGER.info("--- Setting Functions ---")
-
-SHAPE = tuple(parseConfigsFile(["preprocess"])["image_shape_low_resolution"][:2])
-
+# The conversion workers are spawned and import this module, so it doesn't
+# import TensorFlow: only the main process does, in main().
+PREPROCESS_SETTINGS = get_config().get_sections(["preprocess"])
+SHAPE = tuple(PREPROCESS_SETTINGS["image_shape_low_resolution"][:2])
+STORE_LOW_RESOLUTION = PREPROCESS_SETTINGS["low_resolution_source"] == "stored"
+IMAGE_FORMAT = PREPROCESS_SETTINGS["image_format"]
+STORE_LABELS = PREPROCESS_SETTINGS["stored_labels"]
+SKIP_DUPLICATES = PREPROCESS_SETTINGS["duplicates"] == "skip"
+
+# Each split is either a directory of images or a zip or uncompressed tar
+# archive of it, e.g. train.tar. Compressed tar archives, e.g. train.tar.gz,
+# have to be decompressed first.
 BASE_DATA_DIR = Path("/datasets/VGGFace2_LR/Images")
 BASE_OUTPUT_PATH = Path("/workspace/datasets/VGGFace2")
-
-
-def _reduce_resolution(high_resolution_image):
-    low_resolution_image = cv2.cvtColor(
-        cv2.resize(high_resolution_image, SHAPE, interpolation=cv2.INTER_CUBIC),
-        cv2.COLOR_BGR2RGB,
+DATASET_NAME = "VGGFace2_LR"
+_NUM_IMAGES = 5000
+SPLITS = (
+    ("test", "Test_Low_Resolution_5k.tfrecords"),
+    ("train", "Train_Low_Resolution_5k.tfrecords"),
+)
+
+
+def _get_split_source(split):
+    for source in (
+        BASE_DATA_DIR.joinpath(split),
+        BASE_DATA_DIR.joinpath(f"{split}.tar"),
+        BASE_DATA_DIR.joinpath(f"{split}.zip"),
+    ):
+        if source.exists():
+            return source
+    raise FileNotFoundError(f"No images of the {split} split in {BASE_DATA_DIR}.")
+
+
+def _list_images(source, overlaps):
+    return [
+        image
+        for image in list_images(source)
+        if split_image_path(image)[0] not in overlaps
+    ]
+
+
+def main():
+    from utils.tfrecord_conversion import convert_to_tfrecords
+
+    timing = TimingLogger()
+    timing.start()
+    LOGGER.info("--- Converting VGGFace2_LR ---")
+
+    dataset_index = DatasetIndex()
+    class_pairs = None
+    overlaps = set()
+    if STORE_LABELS:
+        class_pairs = load_class_pairs(DATASET_NAME)
+        overlaps = set(load_overlapping_identities(DATASET_NAME))
+        dataset_index.set_metadata("labels", class_pairs)
+        dataset_index.set_metadata("excluded_classes", sorted(overlaps))
+
+    timing.start("convert")
+    shards = [
+        (
+            file_name,
+            _list_images(_get_split_source(split), overlaps)[:_NUM_IMAGES],
+        )
+        for split, file_name in SPLITS
+    ]
+    duplicate_index = get_duplicate_index(DATASET_NAME, PREPROCESS_SETTINGS)
+    converter = FaceImageConverter(
+        SHAPE,
+        STORE_LOW_RESOLUTION,
+        IMAGE_FORMAT,
+        interpolation="cubic",
+        sample_ids=True,
+        class_pairs=class_pairs,
+        image_hashes=duplicate_index is not None,
     )
-    high_resolution_image = cv2.cvtColor(high_resolution_image, cv2.COLOR_BGR2RGB)
-    return (
-        tf.image.encode_png(low_resolution_image),
-        tf.image.encode_png(high_resolution_image),
+    convert_to_tfrecords(
+        shards,
+        converter,
+        BASE_OUTPUT_PATH,
+        dataset_index,
+        duplicate_index=duplicate_index,
+        skip_duplicates=SKIP_DUPLICATES,
     )
+    dataset_index.save(BASE_OUTPUT_PATH)
+    if duplicate_index is not None:
+        duplicate_index.close()
 
+    timing.end("convert")
 
-def _bytes_feature(value):
-    if isinstance(value, type(tf.constant(0))):
-        value = value.numpy()  # BytesList won't unpack a string from an EagerTensor.
-    try:
-        value = value.encode("utf-8")
-    except Exception:
-        pass
-    return tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
-
-
-def _int64_feature(value):
-    return tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
-
-
-def image_example(
-    image_string_low_resolution, image_string_high_resolution, _class_id, _sample_id
-):
-    feature = {
-        "class_id": _bytes_feature(_class_id),
-        "sample_id": _bytes_feature(_sample_id),
-        "image_low_resolution": _bytes_feature(image_string_low_resolution),
-        "image_high_resolution": _bytes_feature(image_string_high_resolution),
-    }
-    return tf.train.Example(features=tf.train.Features(feature=feature))
-
-
-def preprocess_image(image_path):
-    class_id, sample_id = InputData.split_path(str(image_path))
-    high_resolution_image = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
-    low_resolution, high_resolution_image = _reduce_resolution(high_resolution_image)
-    return image_example(low_resolution, high_resolution_image, class_id, sample_id)
-
-
-_NUM_IMAGES = 5000
 
-timing.start("test")
-
-data_dir = list(BASE_DATA_DIR.joinpath("test").glob("*/*.jpg"))[:_NUM_IMAGES]
-partial = 1
-output_path = str(BASE_OUTPUT_PATH.joinpath("Test_Low_Resolution_5k.tfrecords"))
-with tf.io.TFRecordWriter(output_path) as writer:
-    for image in data_dir:
-        LOGGER.info(f" Test Image {partial}/{_NUM_IMAGES}")
-        tf_example = preprocess_image(image)
-        writer.write(tf_example.SerializeToString())
-        partial += 1
-
-timing.end("test")
-
-timing.start("train")
-
-data_dir = list(BASE_DATA_DIR.joinpath("train").glob("*/*.jpg"))[:_NUM_IMAGES]
-partial = 1
-output_path = str(BASE_OUTPUT_PATH.joinpath("Train_Low_Resolution_5k.tfrecords"))
-with tf.io.TFRecordWriter(output_path) as writer:
-    for image in data_dir:
-        LOGGER.info(f" Train Image {partial}/{_NUM_IMAGES}")
-        tf_example = preprocess_image(image)
-        writer.write(tf_example.SerializeToString())
-        partial += 1
-
-timing.end("train")
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@ from training.metrics import (
     distributed_sum_over_batch_size,
 )
 from training.vgg import create_vgg_model
+from utils.common import normalize_uint8_tensor
 
 
 class Loss:
@@ -58,8 +59,8 @@ class Loss:
 
     @tf.function
     def _compute_perceptual_loss(self, super_resolution, ground_truth) -> float:
-        fake = self.vgg(super_resolution)
-        real = self.vgg(ground_truth)
+        fake = self.vgg(normalize_uint8_tensor(super_resolution))
+        real = self.vgg(normalize_uint8_tensor(ground_truth))
         return compute_euclidean_distance(fake, real)
 
     @tf.function
@@ -4,6 +4,7 @@ import logging
 import tensorflow as tf
 
 from services.losses import Loss
+from utils.common import normalize_uint8_tensor
 
 LOGGER = logging.getLogger(__name__)
 
@@ -136,6 +137,9 @@ class Train:
     def _step_function(
         self, low_resolution_batch, groud_truth_batch, ground_truth_classes, step
     ):
+        # The losses compare against the ground truth, so uint8 batches are
+        # normalized here, on the device.
+        groud_truth_batch = normalize_uint8_tensor(groud_truth_batch)
         with tf.GradientTape() as srfr_tape, tf.GradientTape() as discriminator_tape:
             (super_resolution_images, embeddings, predictions) = self.srfr_model(
                 low_resolution_batch
@@ -1,5 +1,5 @@
 import tensorflow as tf
-from utils.common import denormalize_tensor, tensor_to_uint8
+from utils.common import denormalize_tensor, normalize_uint8_tensor, tensor_to_uint8
 
 from services.train import Train
 
@@ -106,6 +106,9 @@ class TrainSrOnly(Train):
 
     @tf.function
     def _step_function(self, low_resolution_batch, groud_truth_batch, step):
+        # The losses compare against the ground truth, so uint8 batches are
+        # normalized here, on the device.
+        groud_truth_batch = normalize_uint8_tensor(groud_truth_batch)
         with tf.GradientTape() as srfr_tape, tf.GradientTape() as discriminator_tape:
             super_resolution_images = self.srfr_model(low_resolution_batch)
             discriminator_sr_predictions = self.discriminator_model(
@@ -180,7 +183,9 @@ class TrainSrOnly(Train):
         super_resolution_images = tensor_to_uint8(
             denormalize_tensor(super_resolution_images)
         )
-        groud_truth_images = tensor_to_uint8(denormalize_tensor(groud_truth_images))
+        groud_truth_images = tensor_to_uint8(
+            denormalize_tensor(normalize_uint8_tensor(groud_truth_images))
+        )
 
         psnr_values = self.losses.calculate_psnr(
             super_resolution_images, groud_truth_images
@@ -0,0 +1,55 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from repositories.array_repository import ArrayRepository  # noqa: E402
+
+CLASS_IDS = ["a", "a", "b", "b", "c", "c", "c", "d", "d", "d"]
+
+
+def _write_arrays(path):
+    num_samples = len(CLASS_IDS)
+    images = np.arange(num_samples, dtype=np.uint8)[:, None, None, None]
+    np.save(str(path.joinpath("images_high_resolution.npy")), images)
+    np.save(str(path.joinpath("images_low_resolution.npy")), images)
+    np.save(str(path.joinpath("labels.npy")), np.arange(num_samples, dtype=np.int32))
+    np.save(str(path.joinpath("class_ids.npy")), np.array(CLASS_IDS, dtype=np.str_))
+    with path.joinpath(ArrayRepository.METADATA_FILE_NAME).open("w") as obj:
+        json.dump({"num_samples": num_samples, "number_of_classes": 4}, obj)
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    _write_arrays(tmp_path)
+    monkeypatch.setattr(
+        ArrayRepository, "_get_overlapping_identities", lambda self, name: ("b",)
+    )
+    return ArrayRepository("CASIA", tmp_path, remove_overlaps=True)
+
+
+def test_overlapping_identities_are_excluded(repository):
+    kept = np.concatenate([repository._train_indices, repository._test_indices])
+
+    assert sorted(kept) == [0, 1, 4, 5, 6, 7, 8, 9]
+
+
+def test_split_is_disjoint_and_repeatable(repository, tmp_path):
+    train_indices = repository._train_indices
+    test_indices = repository._test_indices
+
+    assert not set(train_indices) & set(test_indices)
+    assert len(train_indices) + len(test_indices) == repository.get_full_dataset_len()
+    other = ArrayRepository("CASIA", tmp_path, remove_overlaps=True)
+    assert list(other._test_indices) == list(test_indices)
+
+
+def test_gather_keeps_the_shuffled_order(repository):
+    indices = np.array([9, 0, 5, 1], dtype=np.int64)
+
+    _, images_hr, labels = repository._gather(indices)
+
+    assert list(labels) == [9, 0, 5, 1]
+    assert list(images_hr[:, 0, 0, 0]) == [9, 0, 5, 1]
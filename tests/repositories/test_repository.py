@@ -0,0 +1,19 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from repositories.repository import BaseRepository  # noqa: E402
+
+
+def test_split_shards_keeps_a_train_shard():
+    repository = BaseRepository()
+    shards = [Path(f"shard_{shard:03d}-of-001.tfrecords") for shard in range(2)]
+
+    train_shards, test_shards = repository._split_shards(shards)
+
+    assert len(train_shards) == 1
+    assert len(test_shards) == 1
+    with pytest.raises(ValueError):
+        repository._split_shards(shards[:1])
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from utils.config import get_config, thaw
+
+
+def _write_config(path, batch_size):
+    path.write_text(f"train:\n  batch_size: {batch_size}\n  shape: [1, 2]\n")
+
+
+def test_get_sections_is_memoized(tmp_path):
+    path = tmp_path.joinpath("config.yaml")
+    _write_config(path, 8)
+    config = get_config(path)
+
+    assert config.get_sections(["train"]) is config.get_sections(["train"])
+    assert get_config(path) is config
+
+
+def test_get_sections_reloads_changed_file(tmp_path):
+    path = tmp_path.joinpath("config.yaml")
+    _write_config(path, 8)
+    config = get_config(path)
+    assert config.get_sections(["train"])["batch_size"] == 8
+
+    _write_config(path, 16)
+    stat = path.stat()
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert config.get_sections(["train"])["batch_size"] == 16
+
+
+def test_sections_are_frozen(tmp_path):
+    path = tmp_path.joinpath("config.yaml")
+    _write_config(path, 8)
+    train_settings = get_config(path).get_sections(["train"])
+
+    with pytest.raises(TypeError):
+        train_settings["batch_size"] = 4
+    assert train_settings["shape"] == (1, 2)
+    assert thaw(train_settings) == {"batch_size": 8, "shape": [1, 2]}
@@ -0,0 +1,50 @@
+from utils.conversion_manifest import ConversionManifest, get_sources_digest
+
+
+def _finish_shard(manifest, tmp_path, file_name, sources):
+    tmp_path.joinpath(file_name).write_bytes("".join(sources).encode("utf-8"))
+    manifest.add_shard(file_name, sources, ["a"] * len(sources), [1] * len(sources))
+
+
+def test_find_shard(tmp_path):
+    manifest = ConversionManifest(tmp_path)
+    _finish_shard(manifest, tmp_path, "shard_000.tfrecords", ["a/0", "a/1"])
+    manifest.save()
+
+    manifest = ConversionManifest.load(tmp_path)
+    digest = get_sources_digest(["a/0", "a/1"])
+    assert manifest.find_shard(digest) == "shard_000.tfrecords"
+    assert manifest.find_shard(get_sources_digest(["a/0"])) is None
+
+    tmp_path.joinpath("shard_000.tfrecords").write_bytes(b"b/0b/1")
+    assert manifest.find_shard(digest) is None
+
+
+def test_plan_shards_keeps_finished_shards(tmp_path):
+    manifest = ConversionManifest(tmp_path)
+    _finish_shard(manifest, tmp_path, "shard_000.tfrecords", ["a/0", "a/1"])
+    _finish_shard(manifest, tmp_path, "shard_001.tfrecords", ["c/0", "c/1"])
+
+    keys = ["a/0", "a/1", "b/0", "b/1", "b/2", "b/3", "c/0", "c/1"]
+    groups = manifest.plan_shards(keys, [1] * len(keys), 2)
+
+    assert groups == [["a/0", "a/1"], ["b/0", "b/1"], ["b/2", "b/3"], ["c/0", "c/1"]]
+
+
+def test_records_follow_renamed_shards(tmp_path):
+    manifest = ConversionManifest(tmp_path)
+    _finish_shard(manifest, tmp_path, "shard_000.tfrecords", ["a/0"])
+    _finish_shard(manifest, tmp_path, "shard_001.tfrecords", ["b/0", "b/1"])
+
+    manifest.rename_shards(
+        {
+            "shard_000.tfrecords": "shard_001.tfrecords",
+            "shard_001.tfrecords": "shard_000.tfrecords",
+        }
+    )
+
+    assert "class_ids" not in manifest.get_shards()["shard_000.tfrecords"]
+    assert manifest.load_records("shard_000.tfrecords")["record_lengths"] == [1, 1]
+    assert manifest.load_records("shard_001.tfrecords")["class_ids"] == ["a"]
+    manifest.remove_shard("shard_001.tfrecords")
+    assert not tmp_path.joinpath("shard_001.tfrecords.records.json").exists()
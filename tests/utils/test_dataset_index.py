@@ -0,0 +1,60 @@
+from utils.dataset_index import DatasetIndex
+
+
+def _create_index(tmp_path):
+    dataset_index = DatasetIndex()
+    dataset_index.add_shard("shard_000-of-001.tfrecords", ["a", "b", "a"], [10, 20, 30])
+    dataset_index.add_shard("shard_001-of-001.tfrecords", ["c"], [5])
+    dataset_index.save(tmp_path)
+    return DatasetIndex.load(tmp_path)
+
+
+def test_load_without_index(tmp_path):
+    assert DatasetIndex.load(tmp_path) is None
+
+
+def test_get_num_records(tmp_path):
+    dataset_index = _create_index(tmp_path)
+
+    assert dataset_index.get_num_records() == 4
+    assert dataset_index.get_num_records(excluded_classes=("a",)) == 2
+    assert dataset_index.get_num_records(files=["shard_001-of-001.tfrecords"]) == 1
+
+
+def test_get_number_of_classes(tmp_path):
+    dataset_index = _create_index(tmp_path)
+
+    assert dataset_index.get_number_of_classes() == 3
+
+
+def test_load_records(tmp_path):
+    records = _create_index(tmp_path).load_records()
+
+    assert records["shard"].tolist() == [0, 0, 0, 1]
+    # Each record is framed by 16 bytes of length and CRCs.
+    assert records["offset"].tolist() == [0, 26, 62, 0]
+    assert records["class_id"].tolist() == ["a", "b", "a", "c"]
+
+
+def test_metadata(tmp_path):
+    dataset_index = DatasetIndex()
+    dataset_index.set_metadata("labels", {"a": 0})
+    dataset_index.save(tmp_path)
+
+    dataset_index = DatasetIndex.load(tmp_path)
+    assert dataset_index.get_metadata("labels") == {"a": 0}
+    assert dataset_index.get_metadata("excluded_classes", []) == []
+    assert dataset_index.get_all_metadata() == {"labels": {"a": 0}}
+
+
+def test_number_of_labels_counts_excluded_classes(tmp_path):
+    dataset_index = DatasetIndex()
+    dataset_index.add_shard("shard_000-of-000.tfrecords", ["a", "c", "a"], [1, 1, 1])
+    dataset_index.set_metadata("labels", {"a": 0, "b": 1, "c": 2})
+    dataset_index.set_metadata("excluded_classes", ["b"])
+    dataset_index.save(tmp_path)
+
+    dataset_index = DatasetIndex.load(tmp_path)
+    assert dataset_index.get_number_of_classes() == 2
+    assert dataset_index.get_number_of_labels() == 3
+    assert DatasetIndex().get_number_of_labels() is None
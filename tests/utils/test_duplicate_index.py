@@ -0,0 +1,48 @@
+import pytest
+
+from utils.duplicate_index import DuplicateIndex
+
+HASH = 0xF0F0_0000_FFFF_1234
+
+
+def test_exact_duplicates_are_found_across_datasets(tmp_path):
+    path = tmp_path.joinpath("hashes.sqlite")
+    first_index = DuplicateIndex(path, "MS-Celeb-1M")
+    first_index.add_image("a.jpg", "content", HASH)
+    first_index.commit()
+
+    index = DuplicateIndex(path, "VGGFace2")
+
+    assert index.find_duplicate("b.jpg", "content", 0) == (
+        "MS-Celeb-1M",
+        "a.jpg",
+        True,
+    )
+    assert index.find_duplicate("b.jpg", "other content", HASH) is None
+
+
+def test_near_duplicates_are_found_within_distance(tmp_path):
+    index = DuplicateIndex(tmp_path.joinpath("hashes.sqlite"), "CASIA", 2)
+    index.add_image("a.jpg", "a", HASH)
+
+    assert index.find_duplicate("b.jpg", "b", HASH ^ 0b11) == (
+        "CASIA",
+        "a.jpg",
+        False,
+    )
+    assert index.find_duplicate("b.jpg", "b", HASH ^ 0b111) is None
+    # An image converted again is not its own duplicate.
+    assert index.find_duplicate("a.jpg", "a", HASH) is None
+
+
+def test_removed_dataset_has_no_duplicates(tmp_path):
+    index = DuplicateIndex(tmp_path.joinpath("hashes.sqlite"), "CASIA", 3)
+    index.add_image("a.jpg", "a", HASH)
+    index.remove_dataset()
+
+    assert index.find_duplicate("b.jpg", "a", HASH) is None
+
+
+def test_distance_is_limited_by_the_bands(tmp_path):
+    with pytest.raises(ValueError):
+        DuplicateIndex(tmp_path.joinpath("hashes.sqlite"), "CASIA", 4)
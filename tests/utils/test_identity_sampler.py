@@ -0,0 +1,56 @@
+import struct
+
+from utils.dataset_index import DatasetIndex
+from utils.identity_sampler import TFRecordIdentitySampler
+
+
+def _write_shard(path, records):
+    # Same framing as TFRecords, with zeroed CRCs.
+    with path.open("wb") as shard:
+        for record in records:
+            shard.write(struct.pack("<QI", len(record), 0) + record + b"\0" * 4)
+
+
+def _create_index(tmp_path):
+    dataset_index = DatasetIndex()
+    shards = {
+        "shard_000-of-001.tfrecords": [(b"a0", "a"), (b"b0", "b"), (b"a1", "a")],
+        "shard_001-of-001.tfrecords": [(b"c0", "c"), (b"b1", "b"), (b"c1", "c")],
+    }
+    for file_name, records in shards.items():
+        _write_shard(tmp_path.joinpath(file_name), [record for record, _ in records])
+        dataset_index.add_shard(
+            file_name,
+            [class_id for _, class_id in records],
+            [len(record) for record, _ in records],
+        )
+    dataset_index.save(tmp_path)
+    return DatasetIndex.load(tmp_path)
+
+
+def test_sample_batch(tmp_path):
+    sampler = TFRecordIdentitySampler.from_index(_create_index(tmp_path), 2, 2, seed=0)
+
+    records = sampler.read_records(sampler.sample_batch())
+    classes = [record[:1] for record in records]
+
+    assert len(records) == 4
+    assert classes[0] == classes[1] and classes[2] == classes[3]
+    assert classes[0] != classes[2]
+    assert len(sampler) == 1
+    sampler.close()
+
+
+def test_excluded_classes_and_files(tmp_path):
+    sampler = TFRecordIdentitySampler.from_index(
+        _create_index(tmp_path),
+        1,
+        3,
+        files=["shard_001-of-001.tfrecords"],
+        excluded_classes=("c",),
+        seed=0,
+    )
+
+    assert sampler.get_num_records() == 1
+    assert sampler.read_records(sampler.sample_batch()).tolist() == [b"b1"] * 3
+    sampler.close()
@@ -0,0 +1,72 @@
+import tarfile
+import zipfile
+
+import pytest
+
+from utils import image_sources
+from utils.image_sources import (
+    get_archive_indexes,
+    get_image_size,
+    list_images,
+    read_image,
+    set_archive_indexes,
+    split_image_path,
+)
+
+IMAGES = {"m.01/0001.jpg": b"first", "m.02/0002.jpg": b"second image"}
+
+
+def _write_images(directory):
+    for name, content in IMAGES.items():
+        path = directory.joinpath("images", name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    directory.joinpath("images", "m.01", "notes.txt").write_text("skipped")
+    return directory.joinpath("images")
+
+
+@pytest.mark.parametrize("archive_format", ["directory", "zip", "tar"])
+def test_images_are_read_from_any_source(tmp_path, archive_format):
+    source = _write_images(tmp_path)
+    if archive_format == "zip":
+        with zipfile.ZipFile(tmp_path.joinpath("images.zip"), "w") as archive:
+            for path in sorted(source.rglob("*.*")):
+                archive.write(path, path.relative_to(tmp_path))
+        source = tmp_path.joinpath("images.zip")
+    elif archive_format == "tar":
+        with tarfile.open(tmp_path.joinpath("images.tar"), "w") as archive:
+            archive.add(source, "images")
+        source = tmp_path.joinpath("images.tar")
+
+    images = list_images(source)
+
+    assert [split_image_path(image) for image in images] == [
+        ("m.01", "0001"),
+        ("m.02", "0002"),
+    ]
+    assert [read_image(image) for image in images] == list(IMAGES.values())
+    assert [get_image_size(image) for image in images] == [5, 12]
+
+
+def test_compressed_tar_is_rejected(tmp_path):
+    source = _write_images(tmp_path)
+    with tarfile.open(tmp_path.joinpath("images.tar.gz"), "w:gz") as archive:
+        archive.add(source, "images")
+
+    with pytest.raises(ValueError):
+        list_images(tmp_path.joinpath("images.tar.gz"))
+
+
+def test_workers_reuse_the_tar_index(tmp_path, monkeypatch):
+    source = _write_images(tmp_path)
+    with tarfile.open(tmp_path.joinpath("images.tar"), "w") as archive:
+        archive.add(source, "images")
+    images = list_images(tmp_path.joinpath("images.tar"))
+    indexes = get_archive_indexes()
+
+    # A worker process starts with no archive open, and must not scan it.
+    monkeypatch.setattr(image_sources, "_archives", {})
+    monkeypatch.setattr(image_sources._TarArchive, "_index_members", None)
+    set_archive_indexes(indexes)
+
+    assert [read_image(image) for image in images] == list(IMAGES.values())
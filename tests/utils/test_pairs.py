@@ -0,0 +1,22 @@
+import numpy as np
+from utils.pairs import deduplicate_pairs, expand_pairs
+
+
+def test_deduplicate_pairs():
+    left_keys = np.array([b"a", b"b", b"a"])
+    right_keys = np.array([b"b", b"c", b"c"])
+
+    positions, left_indices, right_indices = deduplicate_pairs(left_keys, right_keys)
+
+    keys = np.concatenate([left_keys, right_keys])
+    assert keys[positions].tolist() == [b"a", b"b", b"c"]
+    assert keys[positions][left_indices].tolist() == left_keys.tolist()
+    assert keys[positions][right_indices].tolist() == right_keys.tolist()
+
+
+def test_expand_pairs():
+    embeddings = np.array([[0.0], [1.0], [2.0]])
+
+    pairs = expand_pairs(embeddings, np.array([0, 2]), np.array([1, 1]))
+
+    assert pairs[:, 0].tolist() == [0.0, 1.0, 2.0, 1.0]
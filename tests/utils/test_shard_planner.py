@@ -0,0 +1,16 @@
+from utils.shard_planner import split_by_bytes
+
+
+def test_split_by_bytes_keeps_every_key():
+    keys = list(range(10))
+
+    shards = split_by_bytes(keys, [10] * 10, 30)
+
+    assert [key for shard in shards for key in shard] == keys
+    assert [len(shard) for shard in shards] == [3, 2, 3, 2]
+
+
+def test_split_by_bytes_balances_sizes():
+    shards = split_by_bytes(["a", "b", "c", "d"], [50, 50, 10, 90], 120)
+
+    assert shards == [["a", "b"], ["c", "d"]]
@@ -30,7 +30,7 @@ from tensorflow_addons.optimizers import NovoGrad
 
 from models.discriminator import DiscriminatorNetwork
 from models.srfr import SRFR
-from repositories.casia import CasiaWebface
+from repositories.casia import create_casia_webface
 from services.losses import Loss
 from use_cases.train.train_model_joint_learn import TrainModelJointLearnUseCase
 from utils.input_data import parseConfigsFile
@@ -203,30 +203,15 @@ def _instantiate_metrics(strategy):
 def _get_datasets(batch_size, strategy):
     LOGGER.info(" -------- Importing Datasets --------")
 
-    casia_dataset = CasiaWebface()
-    synthetic_train = casia_dataset.get_train_dataset()
-    synthetic_train = casia_dataset.augment_dataset(synthetic_train)
-    synthetic_train = casia_dataset.normalize_dataset(synthetic_train)
-
-    synthetic_train = synthetic_train.cache(str(CACHE_PATH.joinpath("train")))
-    synthetic_dataset_len = casia_dataset.get_dataset_size(synthetic_train)
-    synthetic_train = (
-        synthetic_train.shuffle(buffer_size=2_048)
-        .batch(batch_size, drop_remainder=True)
-        .prefetch(AUTOTUNE)
+    casia_dataset = create_casia_webface(CACHE_PATH)
+    synthetic_train = _distribute_dataset(
+        strategy, partial(_get_train_dataset, casia_dataset, batch_size)
     )
-    synthetic_train = strategy.experimental_distribute_dataset(synthetic_train)
-
-    synthetic_test = casia_dataset.get_test_dataset()
-    synthetic_test = casia_dataset.normalize_dataset(synthetic_test)
-    synthetic_test = synthetic_test.cache(str(CACHE_PATH.joinpath("test")))
-    synthetic_test = (
-        synthetic_test.shuffle(buffer_size=2_048)
-        .batch(batch_size, drop_remainder=True)
-        .prefetch(AUTOTUNE)
+    synthetic_test = _distribute_dataset(
+        strategy, partial(_get_test_dataset, casia_dataset, batch_size)
     )
-    synthetic_test = strategy.experimental_distribute_dataset(synthetic_test)
 
+    synthetic_dataset_len = casia_dataset.get_train_dataset_len()
     synthetic_num_classes = casia_dataset.get_number_of_classes()
 
     return (
@@ -237,6 +222,69 @@ def _get_datasets(batch_size, strategy):
     )
 
 
+def _distribute_dataset(strategy, dataset_fn):
+    """Distributes the dataset built by `dataset_fn(input_context=None)`.
+
+    In "per_worker" mode each worker builds its own pipeline over its share of\
+ the shards, batched with the per replica batch size. In "global" mode a single\
+ pipeline is built and split across the replicas.
+    """
+    if parseConfigsFile(["input_pipeline"])["distribution"] == "per_worker":
+        return strategy.experimental_distribute_datasets_from_function(dataset_fn)
+    return strategy.experimental_distribute_dataset(dataset_fn())
+
+
+def _get_cache_name(name, input_context=None):
+    if input_context is None:
+        return name
+    return f"{name}_{input_context.input_pipeline_id}"
+
+
+def _get_train_dataset(casia_dataset, batch_size, input_context=None):
+    if input_context is not None:
+        batch_size = input_context.get_per_replica_batch_size(batch_size)
+
+    if casia_dataset.use_identity_sampler():
+        # The sampler yields whole P x K batches, which a shuffle or a cache
+        # would break up or freeze.
+        synthetic_train = casia_dataset.get_identity_sampled_dataset(
+            batch_size, input_context
+        )
+    else:
+        synthetic_train = casia_dataset.get_train_dataset(input_context)
+        synthetic_train = casia_dataset.cache_dataset(
+            synthetic_train,
+            _get_cache_name("train", input_context),
+            casia_dataset.get_dataset_files("train"),
+            input_context,
+        )
+    synthetic_train = casia_dataset.augment_dataset(synthetic_train)
+    synthetic_train = casia_dataset.normalize_dataset(synthetic_train)
+
+    if not casia_dataset.use_identity_sampler():
+        synthetic_train = synthetic_train.shuffle(buffer_size=2_048)
+    return synthetic_train.batch(batch_size, drop_remainder=True).prefetch(AUTOTUNE)
+
+
+def _get_test_dataset(casia_dataset, batch_size, input_context=None):
+    if input_context is not None:
+        batch_size = input_context.get_per_replica_batch_size(batch_size)
+
+    synthetic_test = casia_dataset.get_test_dataset(input_context)
+    synthetic_test = casia_dataset.cache_dataset(
+        synthetic_test,
+        _get_cache_name("test", input_context),
+        casia_dataset.get_dataset_files("test"),
+        input_context,
+    )
+    synthetic_test = casia_dataset.normalize_dataset(synthetic_test)
+    return (
+        synthetic_test.shuffle(buffer_size=2_048)
+        .batch(batch_size, drop_remainder=True)
+        .prefetch(AUTOTUNE)
+    )
+
+
 def _instantiate_learning_rate(learning_rate: float, learning_rate_decay_steps: int):
     return tf.keras.experimental.CosineDecay(learning_rate, learning_rate_decay_steps)
 
@@ -179,22 +179,15 @@ class TrainingFrOnly(BaseTraining):
 
     def _get_validation_dataset(self, BATCH_SIZE: int):
         lfw = LFW(resolution="hr")
-        left_pairs, right_pairs, is_same_list = lfw.get_dataset()
-        left_pairs = (
-            left_pairs.batch(BATCH_SIZE)
-            .cache(str(self._CACHE_PATH.joinpath("left_pairs")))
+        images, left_indices, right_indices, is_same_list = lfw.get_unique_dataset()
+        images = (
+            images.batch(BATCH_SIZE)
+            .cache(str(self._CACHE_PATH.joinpath("unique_pairs_images")))
             .prefetch(AUTOTUNE)
         )
-        left_pairs = self.strategy.experimental_distribute_dataset(left_pairs)
+        images = self.strategy.experimental_distribute_dataset(images)
 
-        right_pairs = (
-            right_pairs.batch(BATCH_SIZE)
-            .cache(str(self._CACHE_PATH.joinpath("right_pairs")))
-            .prefetch(AUTOTUNE)
-        )
-        right_pairs = self.strategy.experimental_distribute_dataset(right_pairs)
-
-        return left_pairs, right_pairs, is_same_list
+        return images, left_indices, right_indices, is_same_list
 
     def _instantiate_models(
         self,
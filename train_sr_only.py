@@ -11,7 +11,7 @@ from skopt.space import Integer, Real
 from skopt.utils import use_named_args
 from tensorboard.plugins.hparams import api as hp
 
-from repositories.casia import CasiaWebface
+from repositories.casia import create_casia_webface
 from utils.timing import TimingLogger
 
 AUTOTUNE = tf.data.experimental.AUTOTUNE
@@ -177,12 +177,14 @@ class TrainingSrOnly(BaseTraining):
     def _get_datasets(self, batch_size):
         self.logger.info(" -------- Importing Datasets --------")
 
-        casia_dataset = CasiaWebface(self._CACHE_PATH)
+        casia_dataset = create_casia_webface(self._CACHE_PATH)
         synthetic_train = casia_dataset.get_train_dataset()
+        synthetic_train = casia_dataset.cache_dataset(
+            synthetic_train, "train", casia_dataset.get_dataset_files("train")
+        )
         synthetic_train = casia_dataset.augment_dataset(synthetic_train)
         synthetic_train = casia_dataset.normalize_dataset(synthetic_train)
 
-        synthetic_train = synthetic_train.cache(str(self._CACHE_PATH.joinpath("train")))
         synthetic_dataset_len = casia_dataset.get_train_dataset_len()
         synthetic_train = (
             synthetic_train.shuffle(buffer_size=2_048)
@@ -192,8 +194,10 @@ class TrainingSrOnly(BaseTraining):
         synthetic_train = self.strategy.experimental_distribute_dataset(synthetic_train)
 
         synthetic_test = casia_dataset.get_test_dataset()
+        synthetic_test = casia_dataset.cache_dataset(
+            synthetic_test, "test", casia_dataset.get_dataset_files("test")
+        )
         synthetic_test = casia_dataset.normalize_dataset(synthetic_test)
-        synthetic_test = synthetic_test.cache(str(self._CACHE_PATH.joinpath("test")))
         synthetic_test = (
             synthetic_test.shuffle(buffer_size=2_048)
             .batch(batch_size, drop_remainder=True)
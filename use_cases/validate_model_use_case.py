@@ -13,7 +13,7 @@ class ValidateModelUseCase:
         self.logger = logger
 
     def execute(self, model, dataset, BATCH_SIZE: int, checkpoint):
-        left_pairs, right_pairs, is_same_list = dataset
+        images, left_indices, right_indices, is_same_list = dataset
 
         self.timing.start(validate_model_on_lfw.__name__)
         (
@@ -27,11 +27,12 @@ class ValidateModelUseCase:
         ) = validate_model_on_lfw(
             self.strategy,
             model,
-            left_pairs,
-            right_pairs,
+            images,
+            left_indices,
+            right_indices,
             is_same_list,
         )
-        lr_images, sr_images = get_images(self.strategy, model, left_pairs)
+        lr_images, sr_images = get_images(self.strategy, model, images)
         elapsed_time = self.timing.end(validate_model_on_lfw.__name__, True)
         self._save_validation_data(
             checkpoint,
@@ -0,0 +1,52 @@
+"""Class pairs and overlapping identities of the datasets, shared by the\
+ repositories and the converters.
+
+The class pairs files map each class id string to its integer label, and the\
+ overlapping identities files list the classes that also appear in the\
+ validation datasets.
+"""
+from pathlib import Path
+from typing import Dict, Tuple
+
+UNKNOWN_LABEL = -1
+
+
+def get_class_pairs_path(dataset_name: str, file_name: str = "concatenated") -> Path:
+    return Path.cwd().joinpath("data", "class_pairs", dataset_name, f"{file_name}.txt")
+
+
+def load_class_pairs(
+    dataset_name: str,
+    file_name: str = "concatenated",
+) -> Dict[str, int]:
+    """Loads the class pairs file of a dataset.
+
+    ### Parameters
+        dataset_name: Name of the dataset.
+        file_name: Name of the class pairs file, without extension.
+
+    ### Returns
+        Dict from class id to integer label.
+    """
+    with get_class_pairs_path(dataset_name, file_name).open("r") as obj:
+        pairs = (line.strip().split(",") for line in obj if line.strip())
+        return {class_id: int(label) for class_id, label in pairs}
+
+
+def load_overlapping_identities(dataset_name: str) -> Tuple[str, ...]:
+    """Loads overlapping identities files for a given dataset.
+
+    ### Parameters
+        dataset_name: Name of the dataset.
+
+    ### Returns
+        Tuple with the identities to be cleaned.
+    """
+    overlapping = set()
+    path = Path.cwd().joinpath("data", "overlapping_identities", dataset_name)
+    for file_path in path.glob("*"):
+        with file_path.open("r") as _file:
+            for line in _file.readlines():
+                overlapping.add(line.replace("\n", ""))
+
+    return tuple(overlapping)
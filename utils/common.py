@@ -6,6 +6,17 @@ def tensor_to_image(tensor):
     return (np.squeeze(tensor.numpy()).clip(0, 1) * 255).astype(np.uint8)
 
 
+def normalize_uint8_tensor(tensor):
+    """Normalizes uint8 images in format [0, 255] to (-1, 1), as\
+ `BaseRepository.normalize_image` does on the host. Tensors of any other dtype\
+ are already normalized and are returned unchanged.
+    """
+    if tensor.dtype != tf.uint8:
+        return tensor
+    tensor = tf.subtract(tf.cast(tensor, dtype=tf.float32), 127.5)
+    return tf.divide(tensor, 128)
+
+
 @tf.function
 def denormalize_tensor(tensor):
     tensor = tf.math.multiply(tensor, 128)
@@ -0,0 +1,127 @@
+"""Process-wide, memoized access to the configuration files.
+
+Each file is parsed once per process and only parsed again when its mtime or
+size change. The settings are returned frozen, with mappings as read-only
+MappingProxyType and lists as tuples, so that callers can't change each
+other's settings.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Tuple, Union
+
+import yaml
+
+CONFIG_FILE_NAME = "config.yaml"
+
+
+def freeze(value: Any) -> Any:
+    """Recursively converts dicts to MappingProxyType and lists to tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Recursively converts frozen settings back to dicts and lists."""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def _load_yaml(stream) -> Dict:
+    return yaml.safe_load(stream)
+
+
+class ConfigFile:
+    """Memoized, frozen contents of a configuration file.
+
+    ### Methods
+        get: Frozen contents of the file.
+        get_sections: Frozen top level sections of the file.
+    """
+
+    def __init__(self, path: Path, loader: Callable = _load_yaml):
+        self._path = Path(path)
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._signature = None
+        self._settings = None
+
+    def _get_signature(self) -> Tuple[int, int]:
+        stat = self._path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self) -> Mapping[str, Any]:
+        """Frozen contents of the file, parsed again if it changed on disk."""
+        signature = self._get_signature()
+        with self._lock:
+            if signature != self._signature:
+                with self._path.open("r") as stream:
+                    self._settings = freeze(self._loader(stream))
+                self._signature = signature
+            return self._settings
+
+    def get_sections(
+        self,
+        names: List[str],
+    ) -> Union[Mapping[str, Any], List[Mapping[str, Any]]]:
+        """Frozen top level sections of the file.
+
+        ### Parameters
+            names: Names of the sections.
+
+        ### Returns
+            The section if a single name is given, otherwise a list with the\
+ sections in the given order.
+        """
+        settings = self.get()
+        sections = [settings[name] for name in names]
+        return sections[0] if len(sections) == 1 else sections
+
+
+_config_files = {}
+_config_files_lock = threading.Lock()
+_config_files_pid = os.getpid()
+
+
+def get_config_file(path: Path, loader: Callable = _load_yaml) -> ConfigFile:
+    """Process-wide ConfigFile of a path.
+
+    ### Parameters
+        path: Path of the configuration file.
+        loader: Function parsing the opened file, YAML by default.
+
+    ### Returns
+        The ConfigFile, shared by every caller in the process.
+    """
+    global _config_files, _config_files_lock, _config_files_pid
+
+    if os.getpid() != _config_files_pid:
+        # A forked worker may have inherited a held lock, so it starts anew.
+        _config_files = {}
+        _config_files_lock = threading.Lock()
+        _config_files_pid = os.getpid()
+
+    key = str(Path(path).resolve())
+    with _config_files_lock:
+        if key not in _config_files:
+            _config_files[key] = ConfigFile(Path(path), loader)
+        return _config_files[key]
+
+
+def get_config(path: Path = None) -> ConfigFile:
+    """Process-wide ConfigFile of config.yaml, in the working directory by\
+ default.
+    """
+    return get_config_file(path or Path.cwd().joinpath(CONFIG_FILE_NAME))
+
+
+def get_json_config(path: Path) -> ConfigFile:
+    return get_config_file(path, json.load)
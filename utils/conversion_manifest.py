@@ -0,0 +1,248 @@
+"""Manifest of the shards finished by a converter, so that an interrupted or\
+ repeated conversion only writes the shards that are missing or changed.
+
+Each finished shard is recorded with a digest of its sources, i.e. the tasks\
+ it was converted from, its checksum, size and number of records. The class id\
+ and length of its records, so that the dataset index can be written without\
+ reading it, and the duplicated images found in it are saved in a records file\
+ next to the shard, so that the manifest saved after each shard stays small.
+"""
+import bisect
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from utils.shard_planner import split_by_bytes
+
+MANIFEST_FILE_NAME = "conversion_manifest.json"
+RECORDS_SUFFIX = ".records.json"
+
+
+def get_file_checksum(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with Path(path).open("rb") as obj:
+        for chunk in iter(lambda: obj.read(2 ** 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def get_sources_digest(sources: Sequence, settings: str = "") -> str:
+    """Digest of the tasks of a shard and of the settings they are converted\
+ with, e.g. a fingerprint of the converter.
+    """
+    sha256 = hashlib.sha256(settings.encode("utf-8"))
+    for source in sources:
+        sha256.update(repr(source).encode("utf-8"))
+        sha256.update(b"\n")
+    return sha256.hexdigest()
+
+
+def get_source_key(task) -> str:
+    """Key of a conversion task, its path, which is either the task itself or\
+ its first item.
+    """
+    return str(task if isinstance(task, (str, Path)) else task[0])
+
+
+def _write_json(path: Path, value) -> None:
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    with temporary_path.open("w") as obj:
+        json.dump(value, obj)
+        obj.flush()
+        os.fsync(obj.fileno())
+    # A crash leaves either the previous or the new file, never half.
+    temporary_path.replace(path)
+
+
+class ConversionManifest:
+    """Finished shards of a conversion, saved in the output directory.
+
+    ### Methods
+        load: Loads the manifest of a directory, or an empty one.
+        save: Writes the manifest, atomically.
+        find_shard: Finished shard converted from the given sources.
+        add_shard: Records a finished shard.
+        load_records: Class ids, record lengths and duplicates of a shard.
+        remove_shard: Forgets a shard.
+        rename_shards: Renames shards.
+        plan_shards: Groups sources in shards, keeping finished ones intact.
+    """
+
+    def __init__(self, directory: Path, shards: Dict[str, Dict] = None):
+        self._directory = Path(directory)
+        self._shards = shards or {}
+
+    @classmethod
+    def load(cls, directory: Path) -> "ConversionManifest":
+        path = Path(directory).joinpath(MANIFEST_FILE_NAME)
+        if not path.is_file():
+            return cls(directory)
+        with path.open("r") as obj:
+            return cls(directory, json.load(obj)["shards"])
+
+    def save(self) -> None:
+        _write_json(
+            self._directory.joinpath(MANIFEST_FILE_NAME), {"shards": self._shards}
+        )
+
+    def _get_records_path(self, file_name: str) -> Path:
+        return self._directory.joinpath(f"{file_name}{RECORDS_SUFFIX}")
+
+    def get_shards(self) -> Dict[str, Dict]:
+        return self._shards
+
+    def find_shard(self, sources_digest: str, verify: bool = True) -> Optional[str]:
+        """Finds a finished shard converted from the given sources, whose file\
+ is still intact.
+
+        ### Parameters
+            sources_digest: Digest of the sources of the shard.
+            verify: If True, the checksum of the file is checked as well as its\
+ size.
+
+        ### Returns
+            The file name of the shard, or None if there is no such shard.
+        """
+        for file_name, shard in self._shards.items():
+            if shard["sources_digest"] != sources_digest:
+                continue
+            path = self._directory.joinpath(file_name)
+            if not path.is_file() or path.stat().st_size != shard["size"]:
+                continue
+            if not self._get_records_path(file_name).is_file():
+                continue
+            if verify and get_file_checksum(path) != shard["checksum"]:
+                continue
+            return file_name
+        return None
+
+    def add_shard(
+        self,
+        file_name: str,
+        sources: Sequence,
+        class_ids: List[str],
+        record_lengths: List[int],
+        settings: str = "",
+        duplicates: List[List[str]] = None,
+    ) -> None:
+        """Records a shard once its file is complete, and writes its records\
+ file.
+
+        ### Parameters
+            file_name: Name of the shard file, in the manifest directory.
+            sources: Tasks the shard was converted from.
+            class_ids: Class id of each record.
+            record_lengths: Length in bytes of each serialized record.
+            settings: Settings the tasks were converted with.
+            duplicates: [image, dataset_name, duplicate, exact] of each\
+ duplicated image of the shard.
+        """
+        path = self._directory.joinpath(file_name)
+        _write_json(
+            self._get_records_path(file_name),
+            {
+                "class_ids": class_ids,
+                "record_lengths": record_lengths,
+                "duplicates": duplicates or [],
+            },
+        )
+        keys = [get_source_key(source) for source in sources]
+        self._shards[file_name] = {
+            "sources_digest": get_sources_digest(sources, settings),
+            "first_source": min(keys) if keys else None,
+            "last_source": max(keys) if keys else None,
+            "num_records": len(record_lengths),
+            "size": path.stat().st_size,
+            "checksum": get_file_checksum(path),
+        }
+
+    def load_records(self, file_name: str) -> Dict[str, List]:
+        """Loads the records file of a shard, with the "class_ids",\
+ "record_lengths" and "duplicates" given to `add_shard`.
+        """
+        with self._get_records_path(file_name).open("r") as obj:
+            return json.load(obj)
+
+    def remove_shard(self, file_name: str) -> Dict:
+        records_path = self._get_records_path(file_name)
+        if records_path.is_file():
+            records_path.unlink()
+        return self._shards.pop(file_name)
+
+    def rename_shards(self, renames: Dict[str, str]) -> None:
+        """Renames shards and their records files, given the new name of each\
+ old name.
+        """
+        # In two steps, in case a shard takes the old name of another one.
+        for file_name in renames:
+            os.replace(
+                self._get_records_path(file_name),
+                self._get_records_path(f"{file_name}.rename"),
+            )
+        for file_name, new_file_name in renames.items():
+            os.replace(
+                self._get_records_path(f"{file_name}.rename"),
+                self._get_records_path(new_file_name),
+            )
+        shards = {
+            new_file_name: self._shards.pop(file_name)
+            for file_name, new_file_name in renames.items()
+        }
+        self._shards.update(shards)
+
+    def plan_shards(
+        self,
+        keys: Sequence[str],
+        sizes: Sequence[int],
+        shard_bytes: int,
+    ) -> List[List[str]]:
+        """Groups sorted source keys in shards of about `shard_bytes`. The keys\
+ in the range of a finished shard stay together, so that the finished shard\
+ is reused when its range is unchanged, and added keys only make new shards.
+
+        ### Parameters
+            keys: Sorted keys of the sources, e.g. their paths.
+            sizes: Estimated size in bytes of the record of each source.
+            shard_bytes: Target size of the new shards.
+
+        ### Returns
+            The keys of each shard, with the shards in key order.
+        """
+        keys = list(keys)
+        groups = []
+        taken = [False] * len(keys)
+        ranges = sorted(
+            (shard["first_source"], shard["last_source"])
+            for shard in self._shards.values()
+            if shard["first_source"] is not None
+        )
+        for first_source, last_source in ranges:
+            start = bisect.bisect_left(keys, first_source)
+            end = bisect.bisect_right(keys, last_source)
+            positions = [
+                position for position in range(start, end) if not taken[position]
+            ]
+            if positions:
+                groups.append([keys[position] for position in positions])
+                for position in positions:
+                    taken[position] = True
+
+        # Each run of new keys between finished shards is split on its own.
+        new_positions = []
+        for position in range(len(keys) + 1):
+            if position < len(keys) and not taken[position]:
+                new_positions.append(position)
+                continue
+            if new_positions:
+                groups.extend(
+                    split_by_bytes(
+                        [keys[new_position] for new_position in new_positions],
+                        [sizes[new_position] for new_position in new_positions],
+                        shard_bytes,
+                    )
+                )
+                new_positions = []
+
+        return sorted(groups, key=lambda group: group[0])
@@ -0,0 +1,214 @@
+"""Sidecar index written next to the TFRecord shards of a dataset.
+
+The index holds the number of records of each shard, the number of records of
+each class and the byte offset of every record, so that the repositories can
+get dataset sizes and class numbers without iterating over the dataset. The
+converters may also store metadata on how the records were written, such as
+the integer labels of the classes.
+"""
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+INDEX_FILE_NAME = "dataset_index.json"
+RECORDS_FILE_NAME = "dataset_index_records.npz"
+
+# Each TFRecord is framed by a uint64 length, a uint32 length CRC and a uint32
+# data CRC.
+_TFRECORD_FRAMING_BYTES = 16
+
+
+class DatasetIndex:
+    """Index of a dataset stored as one or more TFRecord shards.
+
+    ### Methods
+        add_shard: Adds a shard to the index.
+        save: Writes the index files to a directory.
+        load: Loads the index files from a directory.
+        get_num_records: Number of records, optionally excluding some classes.
+        get_number_of_classes: Number of classes in the dataset.
+        load_records: Loads the per-record shard, offset, length and class.
+        set_metadata: Stores a JSON serializable value in the index.
+        get_metadata: Value stored in the index.
+        get_all_metadata: All the values stored in the index.
+    """
+
+    def __init__(
+        self,
+        shards: List[Dict] = None,
+        directory: Path = None,
+        metadata: Dict = None,
+    ):
+        self._shards = shards or []
+        self._directory = directory
+        self._metadata = metadata or {}
+        self._records = []
+
+    def add_shard(
+        self,
+        file_name: str,
+        class_ids: List[str],
+        record_lengths: List[int],
+    ) -> None:
+        """Adds a shard to the index.
+
+        ### Parameters
+            file_name: Name of the shard file.
+            class_ids: Class id of each record, in the order they were written.
+            record_lengths: Length in bytes of each serialized record.
+        """
+        offsets = np.cumsum(
+            [0] + [length + _TFRECORD_FRAMING_BYTES for length in record_lengths]
+        )
+        shard_number = len(self._shards)
+        self._shards.append(
+            {
+                "file": file_name,
+                "num_records": len(record_lengths),
+                "size": int(offsets[-1]),
+                "classes": dict(Counter(class_ids)),
+            }
+        )
+        self._records.append(
+            (
+                np.full(len(record_lengths), shard_number, dtype=np.int32),
+                offsets[:-1].astype(np.int64),
+                np.array(record_lengths, dtype=np.int64),
+                np.array(class_ids, dtype=np.str_),
+            )
+        )
+
+    def save(self, directory: Path) -> None:
+        """Writes the index files to a directory.
+
+        ### Parameters
+            directory: Directory where the shards were written.
+        """
+        classes = Counter()
+        for shard in self._shards:
+            classes.update(shard["classes"])
+
+        with directory.joinpath(INDEX_FILE_NAME).open("w") as index_file:
+            json.dump(
+                {
+                    "num_records": sum(shard["num_records"] for shard in self._shards),
+                    "classes": dict(classes),
+                    "shards": self._shards,
+                    "metadata": self._metadata,
+                },
+                index_file,
+            )
+
+        if self._records:
+            shard, offset, length, class_id = (
+                np.concatenate(arrays) for arrays in zip(*self._records)
+            )
+            np.savez(
+                str(directory.joinpath(RECORDS_FILE_NAME)),
+                shard=shard,
+                offset=offset,
+                length=length,
+                class_id=class_id,
+            )
+        self._directory = directory
+
+    @classmethod
+    def load(cls, directory: Path) -> Optional["DatasetIndex"]:
+        """Loads the index of a dataset.
+
+        ### Parameters
+            directory: Directory holding the shards and the index files.
+
+        ### Returns
+            The DatasetIndex, or None if the directory has no index.
+        """
+        path = Path(directory).joinpath(INDEX_FILE_NAME)
+        if not path.is_file():
+            return None
+
+        with path.open("r") as index_file:
+            index = json.load(index_file)
+        return cls(index["shards"], Path(directory), index.get("metadata"))
+
+    def set_metadata(self, key: str, value) -> None:
+        self._metadata[key] = value
+
+    def get_metadata(self, key: str, default=None):
+        return self._metadata.get(key, default)
+
+    def get_all_metadata(self) -> Dict:
+        return self._metadata
+
+    def get_shards(self) -> List[Dict]:
+        return self._shards
+
+    def get_directory(self) -> Optional[Path]:
+        return self._directory
+
+    def get_classes(self, files: Iterable[str] = None) -> Counter:
+        """Number of records of each class.
+
+        ### Parameters
+            files: Names of the shards to be considered. If None, all shards\
+ are considered.
+
+        ### Returns
+            Counter from class id to number of records.
+        """
+        files = set(files) if files is not None else None
+        classes = Counter()
+        for shard in self._shards:
+            if files is None or shard["file"] in files:
+                classes.update(shard["classes"])
+        return classes
+
+    def get_num_records(
+        self,
+        files: Iterable[str] = None,
+        excluded_classes: Iterable[str] = (),
+    ) -> int:
+        """Number of records in the dataset.
+
+        ### Parameters
+            files: Names of the shards to be considered. If None, all shards\
+ are considered.
+            excluded_classes: Classes whose records are not counted, e.g. the\
+ overlapping identities.
+
+        ### Returns
+            Number of records.
+        """
+        classes = self.get_classes(files)
+        for class_id in excluded_classes or ():
+            classes.pop(class_id, None)
+        return sum(classes.values())
+
+    def get_number_of_classes(self, files: Iterable[str] = None) -> int:
+        return len(self.get_classes(files))
+
+    def get_number_of_labels(self) -> Optional[int]:
+        """Number of integer labels of the stored "labels" metadata, i.e. the\
+ largest label plus one, which also counts the classes excluded from the\
+ shards.
+
+        ### Returns
+            The number of labels, or None if no labels were stored.
+        """
+        labels = self.get_metadata("labels")
+        if not labels:
+            return None
+        return max(labels.values()) + 1
+
+    def load_records(self) -> Dict[str, np.ndarray]:
+        """Loads the per-record arrays of the index.
+
+        ### Returns
+            Dict with the 'shard', 'offset', 'length' and 'class_id' arrays,\
+ with one entry per record, where 'shard' is the position of the record's\
+ shard in `get_shards()`.
+        """
+        with np.load(str(self._directory.joinpath(RECORDS_FILE_NAME))) as records:
+            return {key: records[key] for key in records.files}
@@ -0,0 +1,196 @@
+"""Persistent index of the hashes of the converted images, shared by the\
+ converters of all datasets, to find the images that were already converted\
+ from the same or another dataset, e.g. the identities that MS-Celeb-1M,\
+ DeepGlint and VGGFace2 share.
+
+Exact duplicates have the same content hash, the SHA-256 of their pixels.\
+ Near duplicates have difference hashes within a small Hamming distance: the\
+ 64 bit hashes are split in 4 bands of 16 bits, and two hashes that differ in\
+ at most 3 bits share at least one band, so only the images sharing a band\
+ are compared.
+"""
+import sqlite3
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+HASH_BITS = 64
+NUM_BANDS = 4
+BAND_BITS = HASH_BITS // NUM_BANDS
+MAX_DISTANCE = NUM_BANDS - 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    image TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    difference_hash INTEGER NOT NULL,
+    UNIQUE (dataset, image)
+);
+CREATE INDEX IF NOT EXISTS images_content_hash ON images (content_hash);
+CREATE TABLE IF NOT EXISTS bands (
+    image_id INTEGER NOT NULL,
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_value ON bands (band, value);
+CREATE INDEX IF NOT EXISTS bands_image_id ON bands (image_id);
+"""
+
+
+def _to_signed(difference_hash: int) -> int:
+    # SQLite integers are signed 64 bit.
+    if difference_hash >> (HASH_BITS - 1):
+        return difference_hash - (1 << HASH_BITS)
+    return difference_hash
+
+
+def _to_unsigned(difference_hash: int) -> int:
+    return difference_hash & ((1 << HASH_BITS) - 1)
+
+
+def _get_bands(difference_hash: int):
+    mask = (1 << BAND_BITS) - 1
+    return [
+        (difference_hash >> (band * BAND_BITS)) & mask for band in range(NUM_BANDS)
+    ]
+
+
+def get_hamming_distance(first_hash: int, second_hash: int) -> int:
+    return bin(first_hash ^ second_hash).count("1")
+
+
+class DuplicateIndex:
+    """Hashes of the images kept by the converters, in a SQLite database.
+
+    ### Parameters
+        path: Path of the database, created if it doesn't exist.
+        dataset_name: Dataset being converted, whose images are added.
+        max_distance: Largest Hamming distance, up to 3, between the\
+ difference hashes of near duplicates. If 0, only exact duplicates are found.
+
+    ### Methods
+        find_duplicate: Image of the index that duplicates an image.
+        add_image: Adds an image of the dataset to the index.
+        remove_dataset: Removes the images of the dataset from the index.
+        commit: Writes the added images to the database.
+        close: Closes the database.
+    """
+
+    def __init__(self, path: Path, dataset_name: str, max_distance: int = 0):
+        if not 0 <= max_distance <= MAX_DISTANCE:
+            raise ValueError(
+                f"The near duplicate distance must be between 0 and {MAX_DISTANCE},"
+                f" not {max_distance}."
+            )
+        self._dataset_name = dataset_name
+        self._max_distance = max_distance
+        self._connection = sqlite3.connect(str(path), timeout=60)
+        self._connection.executescript(_SCHEMA)
+
+    def find_duplicate(
+        self,
+        image: str,
+        content_hash: str,
+        difference_hash: int,
+    ) -> Optional[Tuple[str, str, bool]]:
+        """Finds the first image added to the index that duplicates an image,\
+ other than the image itself, looking for exact duplicates first.
+
+        ### Parameters
+            image: Name of the image in the dataset.
+            content_hash: Hex SHA-256 of the pixels of the image.
+            difference_hash: 64 bit difference hash of the image.
+
+        ### Returns
+            (dataset_name, image, exact) of the duplicate, where exact tells\
+ whether it has the same content hash, or None if there is none.
+        """
+        duplicate = self._connection.execute(
+            "SELECT dataset, image FROM images WHERE content_hash = ?"
+            " AND NOT (dataset = ? AND image = ?) ORDER BY id LIMIT 1",
+            (content_hash, self._dataset_name, image),
+        ).fetchone()
+        if duplicate is not None:
+            return (*duplicate, True)
+        if not self._max_distance:
+            return None
+
+        candidates = self._connection.execute(
+            "SELECT DISTINCT images.id, dataset, image, difference_hash FROM bands"
+            " JOIN images ON images.id = bands.image_id"
+            f" WHERE ({' OR '.join(['(band = ? AND value = ?)'] * NUM_BANDS)})"
+            " AND NOT (dataset = ? AND image = ?) ORDER BY images.id",
+            (
+                *(
+                    value
+                    for band in enumerate(_get_bands(difference_hash))
+                    for value in band
+                ),
+                self._dataset_name,
+                image,
+            ),
+        )
+        for _, dataset_name, candidate, candidate_hash in candidates:
+            distance = get_hamming_distance(
+                difference_hash, _to_unsigned(candidate_hash)
+            )
+            if distance <= self._max_distance:
+                return dataset_name, candidate, False
+        return None
+
+    def add_image(self, image: str, content_hash: str, difference_hash: int) -> None:
+        """Adds an image of the dataset, replacing its previous hashes."""
+        self._remove(
+            "SELECT id FROM images WHERE dataset = ? AND image = ?",
+            (self._dataset_name, image),
+        )
+        image_id = self._connection.execute(
+            "INSERT INTO images (dataset, image, content_hash, difference_hash)"
+            " VALUES (?, ?, ?, ?)",
+            (self._dataset_name, image, content_hash, _to_signed(difference_hash)),
+        ).lastrowid
+        self._connection.executemany(
+            "INSERT INTO bands (image_id, band, value) VALUES (?, ?, ?)",
+            [
+                (image_id, band, value)
+                for band, value in enumerate(_get_bands(difference_hash))
+            ],
+        )
+
+    def remove_dataset(self) -> None:
+        """Removes the images of the dataset, before converting it again."""
+        self._remove("SELECT id FROM images WHERE dataset = ?", (self._dataset_name,))
+
+    def _remove(self, query: str, parameters: Tuple) -> None:
+        self._connection.execute(
+            f"DELETE FROM bands WHERE image_id IN ({query})", parameters
+        )
+        self._connection.execute(
+            f"DELETE FROM images WHERE id IN ({query})", parameters
+        )
+
+    def commit(self) -> None:
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def get_duplicate_index(dataset_name: str, settings: Dict) -> Optional[DuplicateIndex]:
+    """Opens the duplicate index set in the preprocess settings.
+
+    ### Parameters
+        dataset_name: Dataset being converted.
+        settings: Preprocess settings of the config.
+
+    ### Returns
+        The DuplicateIndex, or None if duplicates aren't searched.
+    """
+    if settings["duplicate_index"] is None:
+        return None
+    return DuplicateIndex(
+        Path.cwd().joinpath(settings["duplicate_index"]),
+        dataset_name,
+        settings["near_duplicate_distance"],
+    )
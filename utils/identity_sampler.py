@@ -0,0 +1,195 @@
+"""Identity-aware batch samplers.
+
+Each batch holds P identities with K records each. TFRecordIdentitySampler
+reads the sampled records by byte offset straight from the shards, so no
+shuffle buffer is needed and the memory used is bounded by the per-record
+index arrays.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy as np
+
+from utils.dataset_index import DatasetIndex
+
+# The serialized record follows its uint64 length and the uint32 length CRC.
+_TFRECORD_HEADER_BYTES = 12
+
+
+class IdentitySampler:
+    """Samples batches of `identities_per_batch` identities times\
+ `samples_per_identity` records, given the class of each record.
+
+    ### Methods
+        sample_batch: Positions of the records of a new batch.
+    """
+
+    def __init__(
+        self,
+        class_id: np.ndarray,
+        identities_per_batch: int,
+        samples_per_identity: int,
+        seed: int = None,
+    ):
+        self._num_records = len(class_id)
+        self._identities_per_batch = identities_per_batch
+        self._samples_per_identity = samples_per_identity
+        self._random = np.random.RandomState(seed)
+
+        order = np.argsort(class_id, kind="stable")
+        _, starts = np.unique(class_id[order], return_index=True)
+        self._class_records = np.split(order, starts[1:]) if len(order) else []
+
+    def get_batch_size(self) -> int:
+        return self._identities_per_batch * self._samples_per_identity
+
+    def get_num_records(self) -> int:
+        return self._num_records
+
+    def __len__(self) -> int:
+        """Number of batches in an epoch, so that an epoch draws about as many\
+ records as the sampler holds.
+        """
+        return self.get_num_records() // self.get_batch_size()
+
+    def __iter__(self):
+        for _ in range(len(self)):
+            yield self.sample_batch()
+
+    def sample_batch(self) -> np.ndarray:
+        """Draws P identities without replacement and K records of each one,\
+ without replacement unless the identity has fewer than K records.
+
+        ### Returns
+            Array with the positions of the P x K records, grouped by identity.
+        """
+        num_classes = len(self._class_records)
+        classes = self._random.choice(
+            num_classes,
+            self._identities_per_batch,
+            replace=num_classes < self._identities_per_batch,
+        )
+        return np.concatenate(
+            [
+                self._random.choice(
+                    self._class_records[class_number],
+                    self._samples_per_identity,
+                    replace=len(self._class_records[class_number])
+                    < self._samples_per_identity,
+                )
+                for class_number in classes
+            ]
+        )
+
+
+class TFRecordIdentitySampler(IdentitySampler):
+    """IdentitySampler over TFRecord shards, reading the sampled records by\
+ byte offset.
+
+    ### Methods
+        from_index: Creates the sampler from a DatasetIndex.
+        read_records: Reads the serialized records at the given positions.
+        close: Closes the opened shards.
+    """
+
+    def __init__(
+        self,
+        shard_paths: List[Path],
+        shard: np.ndarray,
+        offset: np.ndarray,
+        length: np.ndarray,
+        class_id: np.ndarray,
+        identities_per_batch: int,
+        samples_per_identity: int,
+        seed: int = None,
+    ):
+        super().__init__(class_id, identities_per_batch, samples_per_identity, seed)
+        self._shard_paths = [str(path) for path in shard_paths]
+        self._shard = shard
+        self._offset = offset
+        self._length = length
+
+        self._files = {}
+        self._files_lock = threading.Lock()
+
+    @classmethod
+    def from_index(
+        cls,
+        dataset_index: DatasetIndex,
+        identities_per_batch: int,
+        samples_per_identity: int,
+        files: Iterable[str] = None,
+        excluded_classes: Iterable[str] = (),
+        seed: int = None,
+    ) -> "TFRecordIdentitySampler":
+        """Creates the sampler from the index written next to the shards.
+
+        ### Parameters
+            dataset_index: Index of the dataset.
+            identities_per_batch: Number of identities (P) in each batch.
+            samples_per_identity: Number of records (K) of each identity.
+            files: Names of the shards to be sampled. If None, all shards\
+ are sampled.
+            excluded_classes: Classes that are never sampled, e.g. the\
+ overlapping identities.
+            seed: Seed of the sampling, or None for a random one.
+
+        ### Returns
+            The TFRecordIdentitySampler.
+        """
+        records = dataset_index.load_records()
+        shards = dataset_index.get_shards()
+        selected = np.ones(len(records["shard"]), dtype=bool)
+        if files is not None:
+            files = set(files)
+            selected_shards = [
+                number for number, shard in enumerate(shards) if shard["file"] in files
+            ]
+            selected &= np.isin(records["shard"], selected_shards)
+        if excluded_classes:
+            selected &= ~np.isin(records["class_id"], list(excluded_classes))
+
+        return cls(
+            [dataset_index.get_directory().joinpath(shard["file"]) for shard in shards],
+            records["shard"][selected],
+            records["offset"][selected],
+            records["length"][selected],
+            records["class_id"][selected],
+            identities_per_batch,
+            samples_per_identity,
+            seed,
+        )
+
+    def _get_file(self, shard_number: int) -> int:
+        with self._files_lock:
+            if shard_number not in self._files:
+                self._files[shard_number] = os.open(
+                    self._shard_paths[shard_number], os.O_RDONLY
+                )
+            return self._files[shard_number]
+
+    def read_records(self, positions: np.ndarray) -> np.ndarray:
+        """Reads serialized records from the shards.
+
+        ### Parameters
+            positions: Positions of the records, as given by `sample_batch`.
+
+        ### Returns
+            Object array with the serialized records, as bytes.
+        """
+        records = np.empty(len(positions), dtype=object)
+        for number, position in enumerate(positions):
+            records[number] = os.pread(
+                self._get_file(self._shard[position]),
+                int(self._length[position]),
+                int(self._offset[position]) + _TFRECORD_HEADER_BYTES,
+            )
+        return records
+
+    def close(self) -> None:
+        with self._files_lock:
+            for file_descriptor in self._files.values():
+                os.close(file_descriptor)
+            self._files = {}
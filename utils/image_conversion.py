@@ -0,0 +1,197 @@
+"""Image side of the dataset converters, run by the worker processes of\
+ `utils.tfrecord_conversion`.
+
+The workers are spawned, so this module must not import TensorFlow: each\
+ worker only reads, resizes and encodes images with OpenCV, and returns the\
+ features of the record as plain Python values.
+"""
+import hashlib
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.class_labels import UNKNOWN_LABEL
+from utils.image_sources import read_image, set_archive_indexes, split_image_path
+
+_INTERPOLATIONS = {"area": cv2.INTER_AREA, "cubic": cv2.INTER_CUBIC}
+
+_converter = None
+
+
+def initialize_worker(
+    converter: Callable,
+    archive_indexes: Dict[str, Dict[str, Tuple[int, int]]] = None,
+) -> None:
+    """Sets the converter of a worker process, sent once instead of with\
+ every chunk of tasks, and the members of the tar archives indexed by the main\
+ process, so that the worker doesn't scan them again.
+    """
+    global _converter
+    # The images are already converted in parallel by the processes.
+    cv2.setNumThreads(1)
+    set_archive_indexes(archive_indexes)
+    _converter = converter
+
+
+def run_converter(task):
+    return _converter(task)
+
+
+def encode_image(image: np.ndarray, image_format: str) -> bytes:
+    """Encodes a BGR image, as read by OpenCV.
+
+    ### Parameters
+        image: uint8 BGR image.
+        image_format: "png", "jpeg" or "raw", the fixed size uint8 RGB tensor.
+
+    ### Returns
+        The encoded image, decoded to RGB by tf.io.decode_png, decode_jpeg or\
+ decode_raw.
+    """
+    if image_format == "raw":
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB).tobytes()
+    if image_format == "jpeg":
+        return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def hash_image(image: np.ndarray) -> Tuple[str, int]:
+    """Hashes an image, to find its duplicates in a `DuplicateIndex`.
+
+    ### Parameters
+        image: uint8 image, as read by OpenCV.
+
+    ### Returns
+        (content_hash, difference_hash) - the hex SHA-256 of the shape and\
+ pixels of the image, and the 64 bit difference hash of its gray levels,\
+ which is robust to resizing and compression.
+    """
+    content_hash = hashlib.sha256(str(image.shape).encode("utf-8"))
+    content_hash.update(np.ascontiguousarray(image).tobytes())
+
+    if image.ndim == 3 and image.shape[2] == 1:
+        image = image[..., 0]
+    elif image.ndim == 3:
+        conversion = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        image = cv2.cvtColor(image, conversion)
+    image = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (image[:, 1:] > image[:, :-1]).flatten()
+    difference_hash = int(np.packbits(bits).view(">u8")[0])
+    return content_hash.hexdigest(), difference_hash
+
+
+class FaceImageConverter:
+    """Converts the face images of datasets stored as <class_id>/<sample>.jpg,\
+ in a directory or an archive, to the features read by the repositories.
+
+    ### Parameters
+        shape: (width, height) of the low resolution images.
+        store_low_resolution: If True, the low resolution image is stored,\
+ otherwise the input pipeline generates it.
+        image_format: Encoding of the images.
+        interpolation: "area" or "cubic", used to downscale the images.
+        sample_ids: If True, the sample id is stored as well.
+        class_pairs: Integer label of each class id, stored as "label". If\
+ None, no label is stored.
+        image_hashes: If True, the hashes of the high resolution image are\
+ returned as well, for `convert_to_tfrecords` to find duplicates.
+    """
+
+    def __init__(
+        self,
+        shape: Tuple[int, int],
+        store_low_resolution: bool,
+        image_format: str,
+        interpolation: str = "area",
+        sample_ids: bool = False,
+        class_pairs: Dict[str, int] = None,
+        image_hashes: bool = False,
+    ):
+        self._shape = tuple(shape)
+        self._store_low_resolution = store_low_resolution
+        self._image_format = image_format
+        self._interpolation = _INTERPOLATIONS[interpolation]
+        self._sample_ids = sample_ids
+        self._class_pairs = class_pairs
+        self._image_hashes = image_hashes
+
+    def __call__(self, image_path: str) -> Optional[Tuple]:
+        """Converts an image.
+
+        ### Parameters
+            image_path: Name of the image, given by `list_images`.
+
+        ### Returns
+            (class_id, features), followed by the hashes of the image if\
+ `image_hashes`, or None if the image can't be read.
+        """
+        class_id, sample_id = split_image_path(image_path)
+        high_resolution_image = cv2.imdecode(
+            np.frombuffer(read_image(image_path), dtype=np.uint8), cv2.IMREAD_COLOR
+        )
+        if high_resolution_image is None:
+            return None
+
+        features = {
+            "class_id": class_id,
+            "image_high_resolution": encode_image(
+                high_resolution_image, self._image_format
+            ),
+        }
+        if self._sample_ids:
+            features["sample_id"] = sample_id
+        if self._store_low_resolution:
+            low_resolution_image = cv2.resize(
+                high_resolution_image, self._shape, interpolation=self._interpolation
+            )
+            features["image_low_resolution"] = encode_image(
+                low_resolution_image, self._image_format
+            )
+        if self._class_pairs is not None:
+            features["label"] = self._class_pairs.get(class_id, UNKNOWN_LABEL)
+        if self._image_hashes:
+            return class_id, features, hash_image(high_resolution_image)
+        return class_id, features
+
+
+class LandmarksImageConverter:
+    """Converts the images of the DeepGlint datasets, stored encoded as they\
+ are, with their shape and face landmarks.
+
+    Each task is (image_path, class_id, sample, landmarks), where image_path\
+ is given by `list_images` and landmarks holds the (name, value) of each\
+ landmark coordinate.
+
+    ### Parameters
+        image_hashes: If True, the hashes of the image are returned as well,\
+ for `convert_to_tfrecords` to find duplicates.
+    """
+
+    def __init__(self, image_hashes: bool = False):
+        self._image_hashes = image_hashes
+
+    def __call__(
+        self, task: Tuple[str, int, str, Iterable[Tuple[str, float]]]
+    ) -> Optional[Tuple]:
+        image_path, class_id, sample, landmarks = task
+        image_string = read_image(image_path)
+        image = cv2.imdecode(
+            np.frombuffer(image_string, dtype=np.uint8), cv2.IMREAD_UNCHANGED
+        )
+        if image is None:
+            return None
+
+        height, width = image.shape[:2]
+        features = {
+            "height": height,
+            "width": width,
+            "depth": image.shape[2] if image.ndim == 3 else 1,
+            "class_id": int(class_id),
+            "sample": sample,
+        }
+        features.update((name, float(value)) for name, value in landmarks)
+        features["image_raw"] = image_string
+        if self._image_hashes:
+            return str(class_id), features, hash_image(image)
+        return str(class_id), features
@@ -0,0 +1,180 @@
+"""Images of the raw datasets, read from directories or straight from the\
+ members of tar and zip archives, with no extraction step.
+
+An image is named by its path or, inside an archive, by\
+ `<archive path>::<member name>`, and its class and sample ids are derived\
+ from the last two parts of the name, as `InputData.split_path` does.
+
+Tar archives must be uncompressed: the members of a .tar.gz, .tar.bz2 or\
+ .tar.xz archive can only be reached by decompressing everything before them,\
+ so they are rejected with a ValueError, and have to be decompressed first,\
+ e.g. with `gunzip`, which needs no extraction. The members of a tar archive\
+ are indexed once, by `list_images` in the main process, and the worker\
+ processes get the index with `set_archive_indexes` instead of scanning the\
+ archive again.
+"""
+import os
+import tarfile
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Sequence, Tuple
+
+ARCHIVE_SEPARATOR = "::"
+
+# Archives opened by this process, with the members indexed by name.
+_archives = {}
+
+
+class _TarArchive:
+    """Uncompressed tar archive, whose members are read at their offsets.
+
+    ### Parameters
+        path: Path of the archive.
+        members: (offset, size) of the data of each member, given by\
+ `get_members`. If None, the archive is scanned to index them.
+    """
+
+    def __init__(self, path: str, members: Dict[str, Tuple[int, int]] = None):
+        if members is None:
+            members = self._index_members(path)
+        self._members = members
+        self._file = open(path, "rb")
+
+    @staticmethod
+    def _index_members(path: str) -> Dict[str, Tuple[int, int]]:
+        try:
+            archive = tarfile.open(path, "r:")
+        except tarfile.ReadError:
+            raise ValueError(
+                f"{path} is not an uncompressed tar archive. The members of a"
+                " compressed tar archive can't be read one by one, decompress"
+                " it first, which needs no extraction."
+            )
+        with archive:
+            return {
+                member.name: (member.offset_data, member.size)
+                for member in archive.getmembers()
+                if member.isreg()
+            }
+
+    def get_members(self) -> Dict[str, Tuple[int, int]]:
+        return self._members
+
+    def get_sizes(self) -> Dict[str, int]:
+        return {name: size for name, (_, size) in self._members.items()}
+
+    def read(self, name: str) -> bytes:
+        offset, size = self._members[name]
+        self._file.seek(offset)
+        return self._file.read(size)
+
+
+class _ZipArchive:
+    def __init__(self, path: str):
+        self._file = zipfile.ZipFile(path)
+
+    def get_sizes(self) -> Dict[str, int]:
+        return {
+            info.filename: info.file_size
+            for info in self._file.infolist()
+            if not info.is_dir()
+        }
+
+    def read(self, name: str) -> bytes:
+        return self._file.read(name)
+
+
+def get_archive_indexes() -> Dict[str, Dict[str, Tuple[int, int]]]:
+    """Members of the tar archives opened by this process, to be sent to the\
+ worker processes.
+    """
+    return {
+        path: archive.get_members()
+        for path, archive in _archives.items()
+        if isinstance(archive, _TarArchive)
+    }
+
+
+def set_archive_indexes(
+    indexes: Optional[Dict[str, Dict[str, Tuple[int, int]]]]
+) -> None:
+    """Sets the members of tar archives, given by `get_archive_indexes`, so\
+ that they are not scanned again by this process.
+    """
+    for path, members in (indexes or {}).items():
+        if path not in _archives:
+            _archives[path] = _TarArchive(path, members)
+
+
+def _get_archive(path: str):
+    if path not in _archives:
+        if zipfile.is_zipfile(path):
+            _archives[path] = _ZipArchive(path)
+        else:
+            _archives[path] = _TarArchive(path)
+    return _archives[path]
+
+
+def _split_key(image_path: str) -> Tuple[str, str]:
+    archive_path, _, member_name = str(image_path).rpartition(ARCHIVE_SEPARATOR)
+    return archive_path, member_name
+
+
+def list_images(source: Path, extensions: Sequence[str] = (".jpg",)) -> List[str]:
+    """Lists the images of a dataset.
+
+    ### Parameters
+        source: Directory with the images in <class_id>/<sample> folders, or a\
+ tar or zip archive with the images in such folders at any depth.
+        extensions: Extensions of the images.
+
+    ### Returns
+        Sorted names of the images, to be read by `read_image`.
+    """
+    source = Path(source)
+    if source.is_dir():
+        return sorted(
+            str(path)
+            for path in source.glob("*/*")
+            if path.suffix in extensions
+        )
+    return sorted(
+        f"{source}{ARCHIVE_SEPARATOR}{name}"
+        for name in _get_archive(str(source)).get_sizes()
+        if PurePosixPath(name).suffix in extensions
+    )
+
+
+def get_image_parts(image_path: str) -> Tuple[str, ...]:
+    """Parts of the path of an image, given by `list_images`, in its directory\
+ or archive.
+    """
+    return PurePosixPath(_split_key(image_path)[1]).parts
+
+
+def split_image_path(image_path: str) -> Tuple[str, str]:
+    """Class id and sample id of an image, given by `list_images`.
+
+    ### Returns
+        (class_id, sample_id) - the name of the image's folder and the name of\
+ the image up to its first dot.
+    """
+    parts = get_image_parts(image_path)
+    return parts[-2], parts[-1].split(".")[0]
+
+
+def read_image(image_path: str) -> bytes:
+    """Encoded bytes of an image, given by `list_images`."""
+    archive_path, member_name = _split_key(image_path)
+    if not archive_path:
+        with open(member_name, "rb") as image_file:
+            return image_file.read()
+    return _get_archive(archive_path).read(member_name)
+
+
+def get_image_size(image_path: str) -> int:
+    """Size in bytes of an encoded image, given by `list_images`."""
+    archive_path, member_name = _split_key(image_path)
+    if not archive_path:
+        return os.path.getsize(member_name)
+    return _get_archive(archive_path).get_sizes()[member_name]
@@ -6,9 +6,10 @@ from typing import Dict, List, Tuple, Union
 
 import numpy as np
 import tensorflow as tf
-import yaml
 from tqdm import tqdm
 
+from utils.config import get_config, get_json_config
+
 # Checar se o filter de overlaps no loading do dataset esta funcionando corretamente
 # Terminar checagem do get_lfw
 
@@ -802,6 +803,10 @@ def parseConfigsFile(
 ) -> Union[Dict, List[Dict]]:
     """Loads settings from config YAML file.
 
+    The file is only parsed again when it changes, and the settings are frozen:\
+ mappings are read-only and lists are tuples. Use `utils.config.thaw` to get a\
+ mutable copy.
+
     ### Parameters
         settings_list: List of selected settings to return.
 
@@ -809,17 +814,11 @@ def parseConfigsFile(
         If settings_list were provided, returns the selected settings,\
  otherwise returns the full file settings.
     """
-    path = Path().cwd()
-    path = path.joinpath("config.yaml")
-    with path.open("r") as yaml_filestream:
-        settings = yaml.safe_load(yaml_filestream)
+    config = get_config()
     if settings_list:
-        returns = []
-        for setting in settings_list:
-            returns.append(settings[setting])
-        return returns[0] if len(returns) == 1 else returns
+        return config.get_sections(settings_list)
 
-    return settings
+    return config.get()
 
 
 def load_json(path):
@@ -829,5 +828,4 @@ def load_json(path):
 
 def load_resnet_config() -> List[Dict]:
     path = Path().cwd().joinpath("models", "resnet_config.txt")
-    configs = load_json(path)
-    return configs["network_config"], configs["layer_config"]
+    return get_json_config(path).get_sections(["network_config", "layer_config"])
@@ -0,0 +1,49 @@
+"""Helpers for pair-based verification benchmarks, such as LFW."""
+from typing import Tuple
+
+import numpy as np
+
+
+def deduplicate_pairs(
+    left_keys: np.ndarray,
+    right_keys: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Builds the table of unique images of a pair list, so that each image is\
+ embedded once and the embeddings are expanded to the pairs by index.
+
+    ### Parameters
+        left_keys: Key of the left image of each pair, equal for copies of the\
+ same image, e.g. a digest of its bytes.
+        right_keys: Key of the right image of each pair.
+
+    ### Returns
+        (positions, left_indices, right_indices) - the position of each unique\
+ image in the left keys followed by the right keys, and the position in the\
+ unique images of the left and right image of each pair.
+    """
+    keys = np.concatenate([left_keys, right_keys])
+    _, positions, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return positions, inverse[: len(left_keys)], inverse[len(left_keys) :]
+
+
+def expand_pairs(
+    embeddings: np.ndarray,
+    left_indices: np.ndarray,
+    right_indices: np.ndarray,
+) -> np.ndarray:
+    """Expands the embeddings of the unique images to the pairs.
+
+    ### Parameters
+        embeddings: Embeddings of the unique images.
+        left_indices: Position of the left image of each pair.
+        right_indices: Position of the right image of each pair.
+
+    ### Returns
+        Array with the left and right embeddings of each pair, interleaved.
+    """
+    pairs = np.empty(
+        (2 * len(left_indices), *embeddings.shape[1:]), dtype=embeddings.dtype
+    )
+    pairs[0::2] = embeddings[left_indices]
+    pairs[1::2] = embeddings[right_indices]
+    return pairs
@@ -0,0 +1,64 @@
+"""Splits the images of a converter in shards of about the same number of\
+ bytes, so that the interleaved reads of the shards are balanced.
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+def get_number_of_shards(total_bytes: int, shard_bytes: int) -> int:
+    return max(1, -(-int(total_bytes) // int(shard_bytes)))
+
+
+def split_by_bytes(
+    keys: Sequence,
+    sizes: Sequence[int],
+    shard_bytes: int,
+) -> List[List]:
+    """Splits consecutive keys in the fewest shards of at most about\
+ `shard_bytes`, all of about the same size.
+
+    ### Parameters
+        keys: Keys of the images, in the order they are written.
+        sizes: Estimated size in bytes of the record of each key.
+        shard_bytes: Target size of the shards.
+
+    ### Returns
+        The keys of each shard, with every key in exactly one shard.
+    """
+    if not len(keys):
+        return []
+
+    cumulative_sizes = np.cumsum(np.asarray(sizes, dtype=np.float64))
+    num_shards = get_number_of_shards(cumulative_sizes[-1], shard_bytes)
+    # Each shard ends at the first record that reaches its share of the bytes.
+    targets = cumulative_sizes[-1] * np.arange(1, num_shards) / num_shards
+    ends = np.searchsorted(cumulative_sizes, targets, side="left") + 1
+    bounds = [0, *sorted(set(int(end) for end in ends) - {len(keys)}), len(keys)]
+    return [list(keys[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def get_plan_metadata(
+    groups: Sequence[Sequence],
+    keys: Sequence,
+    sizes: Sequence[int],
+    shard_bytes: int,
+) -> Dict:
+    """Description of a shard plan, to be stored in the dataset index.
+
+    ### Parameters
+        groups: Keys of each shard.
+        keys: Keys of all images.
+        sizes: Estimated size in bytes of the record of each key.
+        shard_bytes: Target size of the shards.
+
+    ### Returns
+        Dict with the target size and the estimated size of each shard.
+    """
+    sizes_by_key = dict(zip(keys, sizes))
+    return {
+        "shard_bytes": int(shard_bytes),
+        "estimated_bytes": [
+            int(sum(sizes_by_key[key] for key in group)) for group in groups
+        ],
+    }
@@ -0,0 +1,319 @@
+"""Parallel conversion of image datasets to TFRecord shards, shared by the\
+ `scripts_to_tfrecords` converters.
+
+The images are read, resized and encoded by a pool of spawned processes,\
+ running a converter from `utils.image_conversion`, and the main process\
+ serializes the returned features and writes the shards, in order, so that\
+ the output does not depend on the number of processes. Finished shards are\
+ recorded in a `utils.conversion_manifest.ConversionManifest`, so that a\
+ conversion can be resumed, and the images already converted from the same or\
+ another dataset can be found with a `utils.duplicate_index.DuplicateIndex`.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import pickle
+import random
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import tensorflow as tf
+from tqdm import tqdm
+
+from utils.conversion_manifest import (
+    ConversionManifest,
+    get_source_key,
+    get_sources_digest,
+)
+from utils.dataset_index import DatasetIndex
+from utils.duplicate_index import DuplicateIndex
+from utils.image_conversion import initialize_worker, run_converter
+from utils.image_sources import get_archive_indexes, get_image_size
+
+LOGGER = logging.getLogger(__name__)
+
+_TEMPORARY_SUFFIX = ".tmp"
+
+
+def _to_feature(value) -> tf.train.Feature:
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    if isinstance(value, bytes):
+        return tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
+    if isinstance(value, float):
+        return tf.train.Feature(float_list=tf.train.FloatList(value=[value]))
+    return tf.train.Feature(int64_list=tf.train.Int64List(value=[int(value)]))
+
+
+def serialize_example(features: Dict) -> bytes:
+    """Serializes a tf.train.Example, with str and bytes values stored as\
+ bytes, float values as floats and int values as int64.
+    """
+    return tf.train.Example(
+        features=tf.train.Features(
+            feature={name: _to_feature(value) for name, value in features.items()}
+        )
+    ).SerializeToString()
+
+
+def estimate_record_sizes(
+    tasks: Sequence,
+    converter: Callable,
+    sample_size: int = 64,
+    seed: int = 0,
+) -> List[int]:
+    """Estimates the size of the record of each task from the size of its\
+ image, with the ratio of record to image bytes of a sample of the tasks.
+
+    ### Parameters
+        tasks: Tasks to be converted.
+        converter: Converter of the tasks, run in this process on the sample.
+        sample_size: Number of tasks converted to measure the ratio.
+        seed: Seed of the sample.
+
+    ### Returns
+        Estimated size in bytes of the record of each task.
+    """
+    source_sizes = [get_image_size(get_source_key(task)) for task in tasks]
+    sample = random.Random(seed).sample(
+        range(len(tasks)), min(sample_size, len(tasks))
+    )
+    record_bytes = 0
+    source_bytes = 0
+    for position in sample:
+        result = converter(tasks[position])
+        if result is not None:
+            record_bytes += len(serialize_example(result[1]))
+            source_bytes += source_sizes[position]
+    ratio = record_bytes / source_bytes if source_bytes else 1.0
+    return [int(ratio * size) for size in source_sizes]
+
+
+def convert_to_tfrecords(
+    shards: Sequence[Tuple[str, List]],
+    converter: Callable,
+    output_path: Path,
+    dataset_index: DatasetIndex = None,
+    processes: int = None,
+    chunksize: int = 64,
+    resume: bool = True,
+    verify: bool = True,
+    duplicate_index: DuplicateIndex = None,
+    skip_duplicates: bool = False,
+) -> DatasetIndex:
+    """Converts the images of each shard and writes the shards, skipping the\
+ shards that a previous conversion already finished from the same tasks.
+
+    ### Parameters
+        shards: (file_name, tasks) of each shard, where each task is given to\
+ the converter to build one record. A task is either the path of an image or\
+ a tuple starting with it.
+        converter: Picklable callable returning (class_id, features) for a\
+ task, followed by the hashes of its image if `duplicate_index` is given, or\
+ None to skip it. It is run by the worker processes, so it must not need\
+ TensorFlow.
+        output_path: Directory where the shards are written.
+        dataset_index: Index where the shards are added. If None, a new index\
+ is created.
+        processes: Number of worker processes. If None, one per CPU.
+        chunksize: Number of tasks sent to a worker at a time.
+        resume: If True, the finished shards recorded in the manifest of the\
+ output directory are reused, otherwise every shard is written.
+        verify: If True, the checksum of the reused shards is checked.
+        duplicate_index: Index of the images converted so far, where the images\
+ of this conversion are looked up and added. If None, duplicates aren't\
+ searched.
+        skip_duplicates: If True, the exact duplicates are not written.\
+ Otherwise they are written, and only listed in the dataset index like the near\
+ duplicates, which are always written since they may be distinct photos of\
+ the same person.
+
+    ### Returns
+        The DatasetIndex with the written shards, to be saved by the caller.
+    """
+    dataset_index = dataset_index if dataset_index is not None else DatasetIndex()
+    manifest = (
+        ConversionManifest.load(output_path)
+        if resume
+        else ConversionManifest(output_path)
+    )
+    for temporary_path in output_path.glob(f"*{_TEMPORARY_SUFFIX}"):
+        # Partial shards of an interrupted conversion.
+        temporary_path.unlink()
+
+    # Shards converted with other settings are written again.
+    fingerprint = pickle.dumps(converter)
+    if duplicate_index is not None:
+        fingerprint += pickle.dumps(skip_duplicates)
+        if not resume:
+            duplicate_index.remove_dataset()
+            duplicate_index.commit()
+    settings = hashlib.sha256(fingerprint).hexdigest()
+    renames = {}
+    for file_name, shard_tasks in shards:
+        finished_file_name = manifest.find_shard(
+            get_sources_digest(shard_tasks, settings), verify
+        )
+        if finished_file_name is not None and finished_file_name not in renames:
+            renames[finished_file_name] = file_name
+    _update_finished_shards(manifest, renames, output_path)
+
+    pending = [
+        (file_name, shard_tasks)
+        for file_name, shard_tasks in shards
+        if file_name not in renames.values()
+    ]
+    LOGGER.info(
+        f" Reusing {len(shards) - len(pending)} finished shards, writing"
+        f" {len(pending)} shards."
+    )
+    if pending:
+        _write_shards(
+            pending,
+            converter,
+            settings,
+            output_path,
+            manifest,
+            processes,
+            chunksize,
+            duplicate_index,
+            skip_duplicates,
+        )
+
+    duplicates = []
+    for file_name, _ in shards:
+        records = manifest.load_records(file_name)
+        dataset_index.add_shard(
+            file_name, records["class_ids"], records["record_lengths"]
+        )
+        duplicates.extend(records["duplicates"])
+    if duplicate_index is not None:
+        dataset_index.set_metadata(
+            "duplicates", {"exact_skipped": skip_duplicates, "images": duplicates}
+        )
+    return dataset_index
+
+
+def _update_finished_shards(
+    manifest: ConversionManifest,
+    renames: Dict[str, str],
+    output_path: Path,
+) -> None:
+    """Deletes the finished shards that are no longer planned, and renames the\
+ reused ones to their planned names.
+    """
+    for file_name in list(manifest.get_shards()):
+        if file_name not in renames:
+            manifest.remove_shard(file_name)
+            path = output_path.joinpath(file_name)
+            if path.is_file():
+                path.unlink()
+
+    # In two steps, in case a shard takes the old name of another one.
+    moves = {
+        file_name: new_file_name
+        for file_name, new_file_name in renames.items()
+        if file_name != new_file_name
+    }
+    for file_name in moves:
+        os.replace(
+            output_path.joinpath(file_name),
+            output_path.joinpath(f"{file_name}.rename"),
+        )
+    for file_name, new_file_name in moves.items():
+        os.replace(
+            output_path.joinpath(f"{file_name}.rename"),
+            output_path.joinpath(new_file_name),
+        )
+    manifest.rename_shards(moves)
+    manifest.save()
+
+
+def _write_shards(
+    shards: Sequence[Tuple[str, List]],
+    converter: Callable,
+    settings: str,
+    output_path: Path,
+    manifest: ConversionManifest,
+    processes: int,
+    chunksize: int,
+    duplicate_index: DuplicateIndex,
+    skip_duplicates: bool,
+) -> None:
+    tasks = (task for _, shard_tasks in shards for task in shard_tasks)
+    num_tasks = sum(len(shard_tasks) for _, shard_tasks in shards)
+
+    # Spawned workers don't inherit the TensorFlow runtime of this process.
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(
+        processes or os.cpu_count(),
+        initializer=initialize_worker,
+        initargs=(converter, get_archive_indexes()),
+    ) as pool:
+        results = iter(
+            tqdm(pool.imap(run_converter, tasks, chunksize), total=num_tasks)
+        )
+        for file_name, shard_tasks in shards:
+            shard_path = output_path.joinpath(file_name)
+            temporary_path = output_path.joinpath(f"{file_name}{_TEMPORARY_SUFFIX}")
+            class_ids, record_lengths, duplicates = _write_shard(
+                temporary_path,
+                ((task, next(results)) for task in shard_tasks),
+                duplicate_index,
+                skip_duplicates,
+            )
+            # Only complete shards have their final name and are recorded.
+            temporary_path.replace(shard_path)
+            if duplicate_index is not None:
+                duplicate_index.commit()
+            manifest.add_shard(
+                file_name, shard_tasks, class_ids, record_lengths, settings, duplicates
+            )
+            manifest.save()
+
+
+def _write_shard(
+    shard_path: Path,
+    results: Iterable,
+    duplicate_index: DuplicateIndex = None,
+    skip_duplicates: bool = False,
+) -> Tuple[List, List, List]:
+    class_ids = []
+    record_lengths = []
+    duplicates = []
+    skipped = 0
+    skipped_duplicates = 0
+    with tf.io.TFRecordWriter(str(shard_path)) as writer:
+        for task, result in results:
+            if result is None:
+                skipped += 1
+                continue
+            class_id, features = result[:2]
+            if duplicate_index is not None:
+                image = get_source_key(task)
+                duplicate = duplicate_index.find_duplicate(image, *result[2])
+                if duplicate is None:
+                    # Only the first of the duplicated images is indexed.
+                    duplicate_index.add_image(image, *result[2])
+                else:
+                    dataset_name, duplicate_image, exact = duplicate
+                    duplicates.append([image, dataset_name, duplicate_image, exact])
+                    if exact and skip_duplicates:
+                        LOGGER.info(
+                            f" Skipping {image}, a duplicate of {duplicate_image}"
+                            f" of {dataset_name}."
+                        )
+                        skipped_duplicates += 1
+                        continue
+            record = serialize_example(features)
+            writer.write(record)
+            class_ids.append(class_id)
+            record_lengths.append(len(record))
+
+    LOGGER.info(
+        f" {shard_path.name}: {len(class_ids)} records, {skipped} unreadable images"
+        f" skipped, {len(duplicates)} duplicates found, {skipped_duplicates} of"
+        " them skipped."
+    )
+    return class_ids, record_lengths, duplicates
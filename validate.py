@@ -18,8 +18,9 @@ import logging
 from pathlib import Path
 
 from repositories.lfw import LFW
+from repositories.vggface2 import VggFace2
 from use_cases.validate_model_use_case import ValidateModelUseCase
-from utils.input_data import VggFace2, parseConfigsFile
+from utils.input_data import parseConfigsFile
 from utils.timing import TimingLogger
 
 logging.basicConfig(
@@ -43,7 +44,8 @@ def main():
 
     LOGGER.info(" -------- Importing Datasets --------")
 
-    vgg_dataset = VggFace2(mode="concatenated")
+    # Only the number of classes is needed, so no dataset is built.
+    vgg_dataset = VggFace2()
     synthetic_num_classes = vgg_dataset.get_number_of_classes()
     validation_dataset = _instantiate_dataset(strategy, BATCH_SIZE)
     # synthetic_num_classes = 8529
@@ -95,14 +97,11 @@ def _instantiate_models(
 
 def _instantiate_dataset(strategy, BATCH_SIZE: int):
     lfw = LFW(resolution="hr")
-    left_pairs, right_pairs, is_same_list = lfw.get_dataset()
-    left_pairs = left_pairs.batch(BATCH_SIZE).cache().prefetch(AUTOTUNE)
-    left_pairs = strategy.experimental_distribute_dataset(left_pairs)
+    images, left_indices, right_indices, is_same_list = lfw.get_unique_dataset()
+    images = images.batch(BATCH_SIZE).cache().prefetch(AUTOTUNE)
+    images = strategy.experimental_distribute_dataset(images)
 
-    right_pairs = right_pairs.batch(BATCH_SIZE).cache().prefetch(AUTOTUNE)
-    right_pairs = strategy.experimental_distribute_dataset(right_pairs)
-
-    return left_pairs, right_pairs, is_same_list
+    return images, left_indices, right_indices, is_same_list
 
 
 def _create_checkpoint_and_manager(srfr_model):
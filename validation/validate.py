@@ -1,4 +1,5 @@
 import logging
+from functools import partial
 
 import numpy as np
 import tensorflow as tf
@@ -7,14 +8,25 @@ from scipy.optimize import brentq
 from sklearn import metrics
 from sklearn.preprocessing import normalize
 
+from utils.input_data import parseConfigsFile
+from utils.pairs import expand_pairs
+
 from validation.lfw_helper import evaluate
 
 LOGGER = logging.getLogger(__name__)
 
 
-def _predict(images_batch, images_aug_batch, model):
-    _, embeddings = model(images_batch, training=False)
-    _, embeddings_augmented = model(images_aug_batch, training=False)
+def _predict(images_batch, images_aug_batch, model, single_pass: bool = True):
+    if single_pass:
+        # One forward pass on the images and their flipped copies, instead of
+        # two passes at half the batch size.
+        _, embeddings = model(
+            tf.concat([images_batch, images_aug_batch], axis=0), training=False
+        )
+        embeddings, embeddings_augmented = tf.split(embeddings, 2, axis=0)
+    else:
+        _, embeddings = model(images_batch, training=False)
+        _, embeddings_augmented = model(images_aug_batch, training=False)
     embeddings = embeddings + embeddings_augmented
 
     if tf.math.reduce_all(tf.math.equal(embeddings, 0)):
@@ -33,9 +45,13 @@ def _predict(images_batch, images_aug_batch, model):
 
 def _predict_on_batch(strategy, model, dataset):
     embeddings = np.array([])
+    predict = partial(
+        _predict,
+        single_pass=parseConfigsFile(["validation"])["tta"] == "single_pass",
+    )
     for images_batch, images_aug_batch in dataset:
         embedding_per_replica = strategy.run(
-            _predict, args=(images_batch, images_aug_batch, model)
+            predict, args=(images_batch, images_aug_batch, model)
         )
         # `embedding_per_replica` is a tuple of EagerTensors, and each tensor
         # has a shape of [batch_size, 512], so we need to get each EagerTensor
@@ -68,35 +84,34 @@ def _predict_on_batch(strategy, model, dataset):
 def _get_embeddings(
     strategy,
     model,
-    left_pairs,
-    right_pairs,
+    images,
+    left_indices,
+    right_indices,
     is_same_list,
 ):
-    left_pairs = _predict_on_batch(strategy, model, left_pairs)
-    right_pairs = _predict_on_batch(strategy, model, right_pairs)
-
-    embeddings = []
-    for left, right in zip(left_pairs, right_pairs):
-        embeddings.append(left)
-        embeddings.append(right)
-
-    return np.array(embeddings), is_same_list
+    # Each unique image is embedded once, and its embedding is reused by every
+    # pair holding it.
+    embeddings = _predict_on_batch(strategy, model, images)
+    return expand_pairs(embeddings, left_indices, right_indices), is_same_list
 
 
 def validate_model_on_lfw(
     strategy,
     model,
-    left_pairs,
-    right_pairs,
+    images,
+    left_indices,
+    right_indices,
     is_same_list,
 ) -> float:
     """Validates the given model on the Labeled Faces in the Wild dataset.
 
     ### Parameters
         model: The model to be tested.
-        dataset: The Labeled Faces in the Wild dataset, loaded from load_lfw\
- function.
-        pairs: List of LFW pairs, loaded from load_lfw_pairs function.
+        images: The unique images of the pairs, loaded from\
+ LFW.get_unique_dataset.
+        left_indices: Position in the images of the left image of each pair.
+        right_indices: Position in the images of the right image of each pair.
+        is_same_list: Whether the images of each pair are of the same person.
 
     ### Returns
         (accuracy_mean, accuracy_std, validation_rate, validation_std, far,\
@@ -107,8 +122,9 @@ def validate_model_on_lfw(
     embeddings, is_same_list = _get_embeddings(
         strategy,
         model,
-        left_pairs,
-        right_pairs,
+        images,
+        left_indices,
+        right_indices,
         is_same_list,
     )
 